@@ -0,0 +1,99 @@
+# bench_contact_search.py - Medir la búsqueda de contactos en el servidor
+#
+# Carga N contactos de prueba y mide, para varias búsquedas, la primera
+# página de la tabla (get_contacts_page) y el conteo de resultados
+# (get_contact_count) como los pide la ventana de contactos. Requiere el
+# índice FULLTEXT de migrations/004_contact_search.sql.
+#
+# Uso:
+#   python benchmarks/bench_contact_search.py --rows 1000000
+#   python benchmarks/bench_contact_search.py --rows 1000000 --keep   # reutilizar en otra corrida
+#
+# Usar solo contra una base de datos de desarrollo: los contactos de prueba
+# (empresa '__bench__') se eliminan al terminar salvo con --keep.
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+BENCH_COMPANY = '__bench__'
+FIRST_NAMES = ['Ana', 'Carlos', 'María', 'José', 'Lucía', 'Pedro', 'Sofía', 'Jorge', 'Elena', 'Luis']
+LAST_NAMES = ['García', 'López', 'Martínez', 'Pérez', 'Gómez', 'Díaz', 'Castillo', 'Morales']
+SEARCHES = ['+1997000123', '1997000', 'Carlos', 'maría gómez', 'cont', 'example.com', 'zzzz']
+
+
+def seed(contact_model, count: int, chunk: int):
+    """Crear los contactos de prueba que falten"""
+    db = contact_model.db
+    existing = db.execute_query(
+        "SELECT COUNT(*) as count FROM contacts WHERE company = %s", (BENCH_COMPANY,), fetch_one=True
+    )['count']
+    for start in range(existing, count, chunk):
+        contact_model.upsert_contacts([
+            {
+                'phone_number': f"+1997{i:07d}",
+                'name': f"{FIRST_NAMES[i % 10]} {LAST_NAMES[i // 10 % 8]} {i}",
+                'email': f"contacto{i}@example.com",
+                'company': BENCH_COMPANY
+            }
+            for i in range(start, min(count, start + chunk))
+        ], None)
+        print(f"  {min(count, start + chunk)}/{count} contactos")
+
+
+def measure(call, repeat: int) -> list:
+    """Duración de cada repetición en milisegundos"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return sorted(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de contactos")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--search', nargs='+', default=SEARCHES)
+    parser.add_argument('--chunk', type=int, default=Config.IMPORT_CHUNK_SIZE)
+    parser.add_argument('--keep', action='store_true', help="No borrar los contactos de prueba")
+    args = parser.parse_args()
+
+    from database import DatabaseManager, ContactModel, contact_search_condition
+    contact_model = ContactModel(DatabaseManager())
+    db = contact_model.db
+
+    print(f"Preparando {args.rows} contactos de prueba...")
+    seed(contact_model, args.rows, args.chunk)
+
+    print("=" * 90)
+    print(f"{'búsqueda':<16} {'resultados':>10} {'página p50':>11} {'p95':>8} "
+          f"{'conteo p50':>11} {'p95':>8}  índice")
+    for text in args.search:
+        page = measure(lambda: contact_model.get_contacts_page(limit=args.page_size, search=text),
+                       args.repeat)
+        count = measure(lambda: contact_model.get_contact_count(text), args.repeat)
+        total = contact_model.get_contact_count(text)
+
+        condition = contact_search_condition(text)
+        plan = db.execute_query(f"EXPLAIN SELECT id FROM contacts WHERE {condition[0]}",
+                                condition[1], fetch_one=True) if condition else None
+        index = (plan or {}).get('key') or '-'
+
+        p95 = int(0.95 * (args.repeat - 1))
+        print(f"{text[:16]:<16} {total:>10} {page[len(page) // 2]:>9.1f}ms {page[p95]:>6.1f}ms "
+              f"{count[len(count) // 2]:>9.1f}ms {count[p95]:>6.1f}ms  {index}")
+
+    if not args.keep:
+        db.execute_update("DELETE FROM contacts WHERE company = %s", (BENCH_COMPANY,))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# bench_contact_upsert.py - Comparar la carga masiva de contactos
+#
+# Para cada tamaño carga N contactos nuevos y luego los vuelve a cargar
+# (todos actualizados) con:
+#   - executemany: el INSERT ... ON DUPLICATE KEY UPDATE anterior en una
+#     sola transacción
+#   - multirow:    INSERT multi-fila por max_allowed_packet (upsert_contacts)
+#   - loaddata:    LOAD DATA LOCAL INFILE a tabla temporal (requiere
+#                  local_infile=1 en el servidor)
+#
+# Uso:
+#   python benchmarks/bench_contact_upsert.py --rows 10000 100000 1000000
+#   python benchmarks/bench_contact_upsert.py --rows 100000 --modes multirow loaddata
+#
+# Usar solo contra una base de datos de desarrollo: los contactos de prueba
+# (empresa '__bench__') se eliminan al terminar cada corrida.
+
+import sys
+import os
+import argparse
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+BENCH_COMPANY = '__bench__'
+MODES = ('executemany', 'multirow', 'loaddata')
+
+LEGACY_QUERY = """
+    INSERT INTO contacts (phone_number, name, email, company, extra_data, created_by)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        name = VALUES(name),
+        email = VALUES(email),
+        company = VALUES(company),
+        extra_data = VALUES(extra_data),
+        updated_at = NOW()
+"""
+
+
+def build_contacts(count: int, version: int) -> list:
+    """Contactos sintéticos (la versión cambia los datos entre pasadas)"""
+    return [
+        {
+            'phone_number': f"+1998{i:08d}",
+            'name': f"Contacto {i} v{version}",
+            'email': f"contacto{i}@example.com",
+            'company': BENCH_COMPANY,
+            'extra_data': json.dumps({'columna_5': f"dato {i}", 'version': version})
+        }
+        for i in range(count)
+    ]
+
+
+def load(contact_model, mode: str, contacts: list, chunk: int) -> dict:
+    """Cargar los contactos en bloques de `chunk` como lo hace la importación"""
+    totals = {'inserted': 0, 'updated': 0}
+    for start in range(0, len(contacts), chunk):
+        block = contacts[start:start + chunk]
+        if mode == 'executemany':
+            contact_model.db.execute_many(LEGACY_QUERY, [
+                (c['phone_number'], c['name'], c['email'], c['company'], c['extra_data'], None)
+                for c in block
+            ])
+        else:
+            result = contact_model.upsert_contacts(block, None, use_load_data=(mode == 'loaddata'))
+            totals['inserted'] += result['inserted']
+            totals['updated'] += result['updated']
+    return totals
+
+
+def run(contact_model, mode: str, count: int, chunk: int):
+    db = contact_model.db
+    db.execute_update("DELETE FROM contacts WHERE company = %s", (BENCH_COMPANY,))
+
+    for label, version in (('insertar', 1), ('actualizar', 2)):
+        contacts = build_contacts(count, version)
+        db.metrics.reset()
+        start = time.perf_counter()
+        totals = load(contact_model, mode, contacts, chunk)
+        elapsed = time.perf_counter() - start
+        statements = db.get_metrics()['queries']
+        counts = (f"{totals['inserted']} nuevos, {totals['updated']} actualizados"
+                  if mode != 'executemany' else "sin conteo")
+        print(f"{mode:<12} {count:>9} {label:<11} {elapsed:>8.2f} s "
+              f"{count / elapsed if elapsed > 0 else 0:>10.0f} filas/s "
+              f"{statements:>6} operaciones  {counts}")
+
+    db.execute_update("DELETE FROM contacts WHERE company = %s", (BENCH_COMPANY,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga masiva de contactos")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--chunk', type=int, default=Config.IMPORT_CHUNK_SIZE,
+                        help="Contactos por llamada (como IMPORT_CHUNK_SIZE)")
+    args = parser.parse_args()
+
+    # LOAD DATA necesita allow_local_infile en las conexiones
+    Config.CONTACT_UPSERT_LOAD_DATA = 'loaddata' in args.modes
+
+    from database import DatabaseManager, ContactModel
+    contact_model = ContactModel(DatabaseManager())
+    print(f"max_allowed_packet: {contact_model.db.get_max_allowed_packet():,} bytes")
+    print("=" * 90)
+
+    for count in args.rows:
+        for mode in args.modes:
+            run(contact_model, mode, count, args.chunk)
+        print("-" * 90)
+
+
+if __name__ == '__main__':
+    main()
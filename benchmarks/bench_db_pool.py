@@ -0,0 +1,112 @@
+# bench_db_pool.py - Comparar consultas por segundo con y sin pool de conexiones
+#
+# Reproduce el patrón de acceso de un ciclo del scheduler:
+#   1 consulta de mensajes pendientes
+#   1 consulta de adjuntos por mensaje
+#   1 actualización de estado por resultado de envío
+#
+# Uso:
+#   python benchmarks/bench_db_pool.py --ticks 50 --batch 10 --threads 2
+
+import sys
+import os
+import argparse
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from config import Config
+
+
+def run_tick(db: DatabaseManager, batch: int) -> int:
+    """Ejecutar un ciclo del scheduler y devolver el número de consultas"""
+    queries = 0
+
+    messages = db.execute_query(
+        """
+        SELECT m.id, m.template_id
+        FROM messages m
+        ORDER BY m.id DESC
+        LIMIT %s
+        """,
+        (batch,)
+    )
+    queries += 1
+
+    for message in messages:
+        db.execute_query(
+            "SELECT * FROM attachments WHERE template_id = %s ORDER BY created_at ASC",
+            (message['template_id'],)
+        )
+        queries += 1
+
+    for message in messages:
+        # Actualización sin cambios reales, solo para medir el costo del viaje
+        db.execute_update(
+            "UPDATE messages SET retry_count = retry_count WHERE id = %s",
+            (message['id'],)
+        )
+        queries += 1
+
+    return queries
+
+
+def run_benchmark(use_pool: bool, ticks: int, batch: int, threads: int) -> dict:
+    """Ejecutar los ciclos en varios hilos (scheduler + cola de envío)"""
+    db = DatabaseManager(use_pool=use_pool)
+    counts = [0] * threads
+
+    def worker(index):
+        for _ in range(ticks):
+            counts[index] += run_tick(db, batch)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts)
+    return {
+        'queries': total,
+        'seconds': elapsed,
+        'qps': total / elapsed if elapsed > 0 else 0,
+        'pool_stats': db.get_pool_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de conexiones")
+    parser.add_argument('--ticks', type=int, default=50, help="Ciclos por hilo")
+    parser.add_argument('--batch', type=int, default=10, help="Mensajes por ciclo")
+    parser.add_argument('--threads', type=int, default=2, help="Hilos concurrentes")
+    args = parser.parse_args()
+
+    print("=== Benchmark de conexiones a MySQL ===")
+    print(f"Servidor: {Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}")
+    print(f"Ciclos: {args.ticks} x {args.threads} hilos, lote de {args.batch} mensajes\n")
+
+    results = {}
+    for label, use_pool in (("Sin pool", False), ("Con pool", True)):
+        result = run_benchmark(use_pool, args.ticks, args.batch, args.threads)
+        results[label] = result
+        print(f"{label}:")
+        print(f"   - Consultas: {result['queries']}")
+        print(f"   - Tiempo: {result['seconds']:.2f}s")
+        print(f"   - Consultas/segundo: {result['qps']:.1f}")
+        if result['pool_stats']:
+            print(f"   - Estadísticas del pool: {result['pool_stats']}")
+        print()
+
+    before = results["Sin pool"]['qps']
+    after = results["Con pool"]['qps']
+    if before > 0:
+        print(f"Mejora: {after / before:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+# bench_end_to_end.py - Medir el envío de una campaña de punta a punta
+#
+# Ejecuta el MessageScheduler real contra la base de datos MySQL local y la
+# API de Twilio emulada (fake_twilio_server.py):
+#   1. Crea una plantilla, N contactos de prueba y un segmento con ellos
+#   2. Programa la campaña para ahora y deja que el scheduler la ejecute
+#      (creación de mensajes, reservas, envío y escritura de resultados)
+#   3. Espera a que no queden mensajes pendientes
+#
+# Reporta mensajes por segundo, latencia p50/p99 de cada envío a la API y
+# consultas a la base de datos por mensaje.
+#
+# Uso:
+#   python benchmarks/bench_end_to_end.py --messages 5000 --latency-ms 150
+#   python benchmarks/bench_end_to_end.py --messages 5000 --async
+#
+# Usar solo contra una base de datos de desarrollo: los datos de prueba
+# (empresa '__bench__') se eliminan al terminar salvo con --keep.
+
+import sys
+import os
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+BENCH_COMPANY = '__bench__'
+BENCH_ACCOUNT_SID = 'AC' + '0' * 32
+BENCH_AUTH_TOKEN = 'bench-token'
+
+
+class LatencyRecorder:
+    """Duración de cada llamada a send_whatsapp_message"""
+
+    def __init__(self):
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def record(self, elapsed: float):
+        with self.lock:
+            self.samples.append(elapsed)
+
+    def wrap(self, send):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return send(*args, **kwargs)
+            finally:
+                self.record(time.perf_counter() - started)
+        return timed
+
+    def wrap_async(self, send):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await send(*args, **kwargs)
+            finally:
+                self.record(time.perf_counter() - started)
+        return timed
+
+    def percentile(self, p: float) -> float:
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+
+def configure(args, base_url: str):
+    """Apuntar Twilio al servidor emulado y ajustar el envío"""
+    Config.TWILIO_ACCOUNT_SID = BENCH_ACCOUNT_SID
+    Config.TWILIO_AUTH_TOKEN = BENCH_AUTH_TOKEN
+    Config.TWILIO_API_BASE_URL = base_url
+    Config.TWILIO_STATUS_CALLBACK_URL = args.status_callback_url or ''
+    Config.MESSAGES_PER_SECOND = args.mps
+    Config.RATE_LIMIT_BURST = args.mps
+    Config.DISPATCH_WORKERS = args.workers
+    Config.TWILIO_ASYNC_TRANSPORT = args.use_async
+    Config.MESSAGE_BATCH_SIZE = args.batch
+    # Sin pasadas de conciliación durante la medición
+    Config.STATUS_RECONCILE_INTERVAL_MINUTES = 24 * 60
+
+
+def create_fixtures(db, count: int) -> dict:
+    """Plantilla, contactos y segmento de prueba"""
+    from database import ContactModel, SegmentModel, TemplateModel
+
+    user = db.execute_query("SELECT id FROM users ORDER BY id LIMIT 1", fetch_one=True)
+    user_id = user['id'] if user else None
+
+    template_id = TemplateModel(db).create_template(
+        f"{BENCH_COMPANY} {datetime.now():%H%M%S}",
+        "Hola {nombre}, este es un mensaje de prueba de {empresa}.",
+        "nombre,empresa",
+        user_id
+    )
+
+    contact_model = ContactModel(db)
+    for start in range(0, count, 5000):
+        contact_model.create_contacts([
+            {
+                'phone_number': f"+1999{i:07d}",
+                'name': f"Contacto {i}",
+                'company': BENCH_COMPANY
+            }
+            for i in range(start, min(count, start + 5000))
+        ], user_id)
+
+    segment_id = SegmentModel(db).create_segment(
+        f"{BENCH_COMPANY} {datetime.now():%H%M%S}",
+        [{'field': 'company', 'op': 'equals', 'value': BENCH_COMPANY}],
+        user_id
+    )
+    return {'user_id': user_id, 'template_id': template_id, 'segment_id': segment_id}
+
+
+def cleanup(db, fixtures: dict, campaign_id: int = None):
+    """Eliminar los datos de prueba"""
+    if campaign_id:
+        db.execute_update("DELETE FROM messages WHERE campaign_id = %s", (campaign_id,))
+        db.execute_update("DELETE FROM campaigns WHERE id = %s", (campaign_id,))
+    db.execute_update("DELETE FROM segments WHERE id = %s", (fixtures['segment_id'],))
+    db.execute_update("DELETE FROM templates WHERE id = %s", (fixtures['template_id'],))
+    db.execute_update("DELETE FROM contacts WHERE company = %s", (BENCH_COMPANY,))
+
+
+def wait_for_campaign(poll_db, campaign_id: int, expected: int, timeout: float) -> dict:
+    """Esperar a que la campaña no tenga mensajes pendientes (según sus contadores)"""
+    from database import CampaignModel
+    campaign_model = CampaignModel(poll_db)
+
+    deadline = time.time() + timeout
+    last_report = 0
+    while True:
+        row = campaign_model.get_campaign_counters([campaign_id]).get(campaign_id) or {}
+        progress = {key: int(row.get(key) or 0) for key in ('total', 'pending', 'sent', 'failed')}
+        if progress['total'] >= expected and progress['pending'] == 0:
+            return progress
+        if time.time() > deadline:
+            print(f"Tiempo agotado con {progress['pending']} mensajes pendientes")
+            return progress
+        if time.time() - last_report >= 5:
+            print(f"  {progress['total'] - progress['pending']}/{expected} mensajes procesados")
+            last_report = time.time()
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envío de punta a punta contra Twilio emulado")
+    parser.add_argument('--messages', type=int, default=2000, help="Contactos/mensajes de la campaña")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Usar el transporte asyncio (TWILIO_ASYNC_TRANSPORT)")
+    parser.add_argument('--workers', type=int, default=Config.DISPATCH_WORKERS,
+                        help="Hilos de envío (transporte síncrono)")
+    parser.add_argument('--mps', type=int, default=1000, help="Límite de envíos por segundo del RateLimiter")
+    parser.add_argument('--batch', type=int, default=max(Config.MESSAGE_BATCH_SIZE, 100),
+                        help="Mensajes reservados por ciclo (MESSAGE_BATCH_SIZE)")
+    parser.add_argument('--timeout', type=float, default=600, help="Espera máxima en segundos")
+    parser.add_argument('--keep', action='store_true', help="No borrar los datos de prueba")
+    parser.add_argument('--twilio-url', default=None,
+                        help="URL de un fake_twilio_server.py ya iniciado (por defecto se inicia uno)")
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--status-callback-url', default=None,
+                        help="URL de StatusCallback enviada a Twilio (opcional)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server = None
+    base_url = args.twilio_url
+    if not base_url:
+        from fake_twilio_server import FakeTwilioServer
+        server = FakeTwilioServer(
+            port=args.port, auth_token=BENCH_AUTH_TOKEN, latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate
+        )
+        server.start()
+        base_url = server.url
+
+    configure(args, base_url)
+
+    from database import DatabaseManager
+    from message_scheduler import MessageScheduler
+    from twilio_async import AsyncTwilioService
+
+    db = DatabaseManager()
+    poll_db = DatabaseManager(use_pool=False)
+
+    print(f"Preparando {args.messages} contactos de prueba...")
+    fixtures = create_fixtures(db, args.messages)
+    campaign_id = None
+
+    scheduler = MessageScheduler(db)
+    latencies = LatencyRecorder()
+    scheduler.twilio_service.send_whatsapp_message = latencies.wrap(
+        scheduler.twilio_service.send_whatsapp_message
+    )
+    AsyncTwilioService.send_whatsapp_message = latencies.wrap_async(
+        AsyncTwilioService.send_whatsapp_message
+    )
+
+    transport = 'asyncio' if args.use_async else f"{args.workers} hilos"
+    print(f"Enviando con transporte {transport} contra {base_url}")
+
+    try:
+        # Solo se cuentan las consultas del scheduler
+        db.metrics.reset()
+        scheduler.start()
+        started = time.perf_counter()
+        campaign_id = scheduler.schedule_campaign(
+            f"{BENCH_COMPANY} campaña", fixtures['template_id'], datetime.now(),
+            fixtures['user_id'], segment_id=fixtures['segment_id']
+        )
+
+        progress = wait_for_campaign(poll_db, campaign_id, args.messages, args.timeout)
+        elapsed = time.perf_counter() - started
+        scheduler.stop()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        raise
+    finally:
+        if server:
+            server.stop()
+
+    metrics = db.get_metrics(top=5)
+    processed = progress['sent'] + progress['failed']
+
+    print("=" * 70)
+    print(f"Mensajes procesados:   {processed} ({progress['sent']} enviados, {progress['failed']} fallidos)")
+    print(f"Tiempo total:          {elapsed:.2f} s")
+    print(f"Mensajes por segundo:  {processed / elapsed if elapsed > 0 else 0:.1f}")
+    print(f"Latencia de envío:     p50 {latencies.percentile(50) * 1000:.1f} ms, "
+          f"p99 {latencies.percentile(99) * 1000:.1f} ms")
+    print(f"Consultas a MySQL:     {metrics['queries']} "
+          f"({metrics['queries'] / processed if processed else 0:.3f} por mensaje)")
+    print("Sentencias más costosas:")
+    for item in metrics['statements']:
+        print(f"  {item['calls']:>6} llamadas {item['total_ms']:>9.1f} ms  {item['statement'][:60]}")
+    if server:
+        print(f"Servidor emulado:      {server.get_stats()}")
+
+    if args.keep:
+        print(f"Datos de prueba conservados (campaña {campaign_id})")
+    else:
+        cleanup(poll_db, fixtures, campaign_id)
+
+
+if __name__ == '__main__':
+    main()
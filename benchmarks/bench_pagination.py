@@ -0,0 +1,105 @@
+# bench_pagination.py - Comparar OFFSET y cursor (keyset) según la profundidad
+#
+# Carga N contactos de prueba y, para cada profundidad, mide una página de
+# contactos ordenada por created_at DESC, id DESC pedida con:
+#   - offset: LIMIT n OFFSET profundidad (la forma anterior de get_contacts)
+#   - keyset: get_contacts(after=(created_at, id)) con el cursor de la fila
+#             anterior a esa profundidad
+# Requiere los índices de migrations/005_pagination_indexes.sql.
+#
+# Uso:
+#   python benchmarks/bench_pagination.py --rows 1000000
+#   python benchmarks/bench_pagination.py --rows 1000000 --depths 0 10000 500000 --keep
+#
+# Usar solo contra una base de datos de desarrollo: los contactos de prueba
+# (empresa '__bench__') se eliminan al terminar salvo con --keep.
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+BENCH_COMPANY = '__bench__'
+
+
+def seed(contact_model, count: int, chunk: int):
+    """Crear los contactos de prueba que falten"""
+    existing = contact_model.db.execute_query(
+        "SELECT COUNT(*) as count FROM contacts WHERE company = %s", (BENCH_COMPANY,), fetch_one=True
+    )['count']
+    for start in range(existing, count, chunk):
+        contact_model.upsert_contacts([
+            {
+                'phone_number': f"+1996{i:07d}",
+                'name': f"Contacto {i}",
+                'company': BENCH_COMPANY
+            }
+            for i in range(start, min(count, start + chunk))
+        ], None)
+        print(f"  {min(count, start + chunk)}/{count} contactos")
+
+
+def median_ms(call, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de paginación OFFSET vs keyset")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1000, 10000, 50000, 90000])
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--chunk', type=int, default=Config.IMPORT_CHUNK_SIZE)
+    parser.add_argument('--keep', action='store_true', help="No borrar los contactos de prueba")
+    args = parser.parse_args()
+
+    from database import DatabaseManager, ContactModel
+    contact_model = ContactModel(DatabaseManager())
+    db = contact_model.db
+
+    print(f"Preparando {args.rows} contactos de prueba...")
+    seed(contact_model, args.rows, args.chunk)
+
+    offset_query = "SELECT * FROM contacts ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
+
+    print("=" * 70)
+    print(f"{'profundidad':>12} {'offset':>12} {'keyset':>12} {'mejora':>10}")
+    for depth in args.depths:
+        after = None
+        if depth:
+            # Cursor de la fila anterior a la página (no se mide)
+            row = db.execute_query(
+                "SELECT created_at, id FROM contacts ORDER BY created_at DESC, id DESC "
+                "LIMIT 1 OFFSET %s", (depth - 1,), fetch_one=True
+            )
+            if row is None:
+                print(f"{depth:>12} sin filas a esa profundidad")
+                continue
+            after = (row['created_at'], row['id'])
+
+        offset_ms = median_ms(
+            lambda: db.execute_query(offset_query, (args.page_size, depth)), args.repeat
+        )
+        keyset_ms = median_ms(
+            lambda: contact_model.get_contacts(limit=args.page_size, after=after)
+            if after else contact_model.get_contacts(limit=args.page_size),
+            args.repeat
+        )
+        print(f"{depth:>12} {offset_ms:>10.1f}ms {keyset_ms:>10.1f}ms "
+              f"{offset_ms / keyset_ms if keyset_ms else 0:>9.1f}x")
+
+    if not args.keep:
+        db.execute_update("DELETE FROM contacts WHERE company = %s", (BENCH_COMPANY,))
+
+
+if __name__ == '__main__':
+    main()
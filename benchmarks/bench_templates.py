@@ -0,0 +1,98 @@
+# bench_templates.py - Comparar el formateo de mensajes con y sin plantillas precompiladas
+#
+# Renderiza la misma plantilla para N contactos con:
+#   - el método anterior (str.replace por cada dato del contacto + re.sub)
+#   - el motor de plantillas compiladas (template_engine.py)
+#
+# Uso:
+#   python benchmarks/bench_templates.py --renders 100000
+
+import sys
+import os
+import argparse
+import re
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from template_engine import TemplateCache
+
+
+def legacy_format_message(template: str, contact_data: dict) -> str:
+    """Formateo anterior de TwilioService.format_message"""
+    message = template
+    for key, value in contact_data.items():
+        placeholder = f"{{{key}}}"
+        if placeholder in message:
+            message = message.replace(placeholder, str(value) if value else "")
+    message = re.sub(r'\{[^}]+\}', '', message)
+    return message.strip()
+
+
+def build_template(variables: int) -> str:
+    """Plantilla con el número de variables indicado"""
+    lines = ["Hola {nombre}, te escribimos de parte de {empresa}."]
+    for i in range(variables):
+        lines.append(f"Dato {i}: {{campo_{i}}}")
+    lines.append("Responde a este mensaje o escribe a {email}. ¡Gracias!")
+    return "\n".join(lines)
+
+
+def build_contacts(count: int, extra_fields: int) -> list:
+    """Contactos sintéticos con datos base y extra_data"""
+    contacts = []
+    for i in range(count):
+        data = {
+            'nombre': f"Contacto {i}",
+            'email': f"contacto{i}@example.com",
+            'empresa': f"Empresa {i % 50}",
+            'telefono': f"+502{50000000 + i}"
+        }
+        for j in range(extra_fields):
+            data[f"campo_{j}"] = f"valor {i}-{j}"
+        contacts.append(data)
+    return contacts
+
+
+def run(label: str, render, template: str, contacts: list) -> float:
+    """Renderizar la plantilla para todos los contactos y medir el tiempo"""
+    start = time.perf_counter()
+    for contact in contacts:
+        render(template, contact)
+    elapsed = time.perf_counter() - start
+    rate = len(contacts) / elapsed if elapsed > 0 else 0
+    print(f"   {label:<12} {elapsed:8.3f}s  {rate:12,.0f} mensajes/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formateo de plantillas")
+    parser.add_argument('--renders', type=int, default=100000, help="Mensajes por escenario")
+    parser.add_argument('--variables', type=int, nargs='+', default=[0, 5, 20, 50],
+                        help="Variables extra por plantilla en cada escenario")
+    args = parser.parse_args()
+
+    print("=== Benchmark de plantillas ===")
+    print(f"Mensajes por escenario: {args.renders:,}\n")
+
+    for variables in args.variables:
+        template = build_template(variables)
+        contacts = build_contacts(args.renders, variables)
+        cache = TemplateCache()
+
+        def compiled(source, contact):
+            return cache.get(1, None, source).render(contact)
+
+        # Ambos métodos deben producir el mismo texto
+        for contact in contacts[:100]:
+            assert legacy_format_message(template, contact) == compiled(template, contact)
+
+        print(f"Plantilla con {variables + 3} variables:")
+        before = run("Anterior", legacy_format_message, template, contacts)
+        after = run("Compilada", compiled, template, contacts)
+        if after > 0:
+            print(f"   Mejora: {before / after:.1f}x\n")
+
+
+if __name__ == '__main__':
+    main()
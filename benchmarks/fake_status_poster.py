@@ -0,0 +1,133 @@
+# fake_status_poster.py - Simular los StatusCallback de Twilio contra el servidor local
+#
+# Toma mensajes enviados (con twilio_sid) de la base de datos y publica, para
+# cada uno, los eventos que enviaría Twilio (delivered y luego read, o failed)
+# firmados con TWILIO_AUTH_TOKEN, en varios hilos. Al final compara los
+# estados en la base de datos.
+#
+# Uso (con la aplicación o el servidor local en ejecución):
+#   python benchmarks/fake_status_poster.py --limit 1000 --threads 8
+#   python benchmarks/fake_status_poster.py --sids SMxxx SMyyy --url http://localhost:8888
+
+import sys
+import os
+import argparse
+import random
+import threading
+import time
+
+import requests
+from twilio.request_validator import RequestValidator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from status_callbacks import STATUS_CALLBACK_PATH
+
+
+def build_events(sids: list, failure_rate: float, read_rate: float) -> list:
+    """Eventos a publicar por SID, en el orden en que los enviaría Twilio"""
+    events = []
+    for sid in sids:
+        if random.random() < failure_rate:
+            events.append({'MessageSid': sid, 'MessageStatus': 'failed',
+                           'ErrorCode': '63016', 'ErrorMessage': 'Fuera de la ventana de 24 horas'})
+            continue
+        events.append({'MessageSid': sid, 'MessageStatus': 'delivered'})
+        if random.random() < read_rate:
+            events.append({'MessageSid': sid, 'MessageStatus': 'read'})
+    return events
+
+
+def post_events(events: list, url: str, public_url: str, auth_token: str, threads: int) -> dict:
+    """Publicar los eventos firmados y contar las respuestas por código HTTP"""
+    validator = RequestValidator(auth_token)
+    counts = {}
+    lock = threading.Lock()
+    index = iter(range(len(events)))
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(index, None)
+            if i is None:
+                return
+            params = dict(events[i], AccountSid=Config.TWILIO_ACCOUNT_SID,
+                          From=Config.TWILIO_WHATSAPP_FROM)
+            signature = validator.compute_signature(public_url, params)
+            response = session.post(url, data=params,
+                                    headers={'X-Twilio-Signature': signature}, timeout=5)
+            with lock:
+                counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de StatusCallback de Twilio")
+    parser.add_argument('--url', default='http://localhost:8888', help="Servidor local")
+    parser.add_argument('--public-url', default=None,
+                        help="URL base que firma Twilio (ngrok); por defecto la de --url")
+    parser.add_argument('--sids', nargs='*', help="SIDs a usar (por defecto, de la base de datos)")
+    parser.add_argument('--limit', type=int, default=1000, help="Mensajes enviados a tomar")
+    parser.add_argument('--threads', type=int, default=8, help="Hilos publicando")
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--read-rate', type=float, default=0.6)
+    parser.add_argument('--wait', type=float, default=3, help="Segundos antes de verificar")
+    args = parser.parse_args()
+
+    if not Config.TWILIO_AUTH_TOKEN:
+        print("Configure TWILIO_AUTH_TOKEN en .env para firmar los eventos")
+        return
+
+    db = None
+    sids = args.sids
+    if not sids:
+        from database import get_database
+        db = get_database()
+        rows = db.execute_query(
+            "SELECT twilio_sid FROM messages WHERE status = 'sent' AND twilio_sid IS NOT NULL "
+            "ORDER BY id DESC LIMIT %s",
+            (args.limit,)
+        )
+        sids = [row['twilio_sid'] for row in rows]
+
+    if not sids:
+        print("No hay mensajes enviados con SID para simular")
+        return
+
+    events = build_events(sids, args.failure_rate, args.read_rate)
+    url = args.url.rstrip('/') + STATUS_CALLBACK_PATH
+    public_url = (args.public_url or args.url).rstrip('/') + STATUS_CALLBACK_PATH
+
+    print("=== Simulador de StatusCallback ===")
+    print(f"Endpoint: {url} ({len(sids)} mensajes, {len(events)} eventos)\n")
+
+    start = time.perf_counter()
+    counts = post_events(events, url, public_url, Config.TWILIO_AUTH_TOKEN, args.threads)
+    elapsed = time.perf_counter() - start
+
+    print(f"Respuestas: {counts}")
+    print(f"Tiempo: {elapsed:.2f}s ({len(events) / elapsed:.0f} eventos/s)")
+
+    if db:
+        time.sleep(args.wait)
+        placeholders = ', '.join(['%s'] * len(sids))
+        rows = db.execute_query(
+            f"SELECT status, COUNT(*) as count FROM messages "
+            f"WHERE twilio_sid IN ({placeholders}) GROUP BY status",
+            tuple(sids)
+        )
+        print("Estados en la base de datos:")
+        for row in rows:
+            print(f"   - {row['status']}: {row['count']}")
+
+
+if __name__ == '__main__':
+    main()
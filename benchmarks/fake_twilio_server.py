@@ -0,0 +1,419 @@
+# fake_twilio_server.py - Servidor local que emula la API de Mensajes de Twilio
+#
+# Sirve para medir el envío sin una cuenta real de Twilio. Emula:
+#   POST /2010-04-01/Accounts/<AC>/Messages.json        crear mensaje
+#   GET  /2010-04-01/Accounts/<AC>/Messages/<SM>.json   consultar estado
+#   GET  /2010-04-01/Accounts/<AC>/Messages.json        listado paginado
+#                                                        (From, DateSent>, DateSent<)
+#   GET  /stats                                         contadores del servidor
+#
+# Con latencia configurable, errores aleatorios, respuestas 429 (aleatorias o
+# por superar un límite de mensajes por segundo) y transiciones de estado
+# queued -> sent -> delivered -> read (o failed). Si el mensaje trae
+# StatusCallback, publica cada transición firmada con el auth token.
+#
+# Uso:
+#   python benchmarks/fake_twilio_server.py --port 9999 --latency-ms 150 --throttle-rate 0.01
+# y en .env:
+#   TWILIO_API_BASE_URL=http://localhost:9999
+
+import argparse
+import base64
+import hashlib
+import hmac
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+API_PREFIX = '/2010-04-01/Accounts/'
+
+
+def twilio_signature(auth_token: str, url: str, params: dict) -> str:
+    """Firma X-Twilio-Signature (HMAC-SHA1 de la URL y los parámetros ordenados)"""
+    data = url + ''.join(f"{key}{params[key]}" for key in sorted(params))
+    digest = hmac.new(auth_token.encode('utf-8'), data.encode('utf-8'), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def parse_date(value: str) -> datetime:
+    """Fecha de los filtros DateSent (YYYY-MM-DD o ISO 8601)"""
+    value = value.replace('Z', '+00:00')
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class FakeTwilioServer:
+    """Servidor HTTP en un hilo con el estado de los mensajes en memoria"""
+
+    def __init__(self, port: int = 9999, auth_token: str = 'fake-token',
+                 latency_ms: float = 100, jitter_ms: float = 50,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 mps_limit: float = 0, failure_rate: float = 0.02,
+                 read_rate: float = 0.6, transition_seconds: tuple = (0.5, 2, 5)):
+        self.port = port
+        self.auth_token = auth_token
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.mps_limit = mps_limit
+        self.failure_rate = failure_rate
+        self.read_rate = read_rate
+        self.sent_after, self.delivered_after, self.read_after = transition_seconds
+
+        self.messages = {}
+        self.lock = threading.Lock()
+        self.recent_sends = {}  # remitente -> deque de horas de envío
+        self.stats = {'created': 0, 'errors': 0, 'throttled': 0, 'fetches': 0,
+                      'lists': 0, 'callbacks': 0, 'callback_errors': 0}
+
+        self._callbacks = []
+        self._callback_sequence = itertools.count()
+        self._callback_condition = threading.Condition()
+        self._running = False
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self.port}"
+
+    # -- Ciclo de vida --------------------------------------------------------
+
+    def start(self):
+        """Iniciar el servidor y el hilo de StatusCallback"""
+        handler = type('Handler', (FakeTwilioHandler,), {'fake': self})
+        self.server = ThreadingHTTPServer(('0.0.0.0', self.port), handler)
+        self.server.daemon_threads = True
+        self._running = True
+        threading.Thread(target=self.server.serve_forever, name="fake-twilio", daemon=True).start()
+        threading.Thread(target=self._run_callbacks, name="fake-twilio-callbacks", daemon=True).start()
+
+    def stop(self):
+        with self._callback_condition:
+            self._running = False
+            self._callback_condition.notify_all()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {**self.stats, 'messages': len(self.messages)}
+
+    # -- Mensajes -------------------------------------------------------------
+
+    def _latency(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _over_limit(self, sender: str, now: float) -> bool:
+        """Indicar si el remitente superó mps_limit en el último segundo"""
+        if not self.mps_limit:
+            return False
+        window = self.recent_sends.setdefault(sender, deque())
+        while window and window[0] <= now - 1:
+            window.popleft()
+        if len(window) >= self.mps_limit:
+            return True
+        window.append(now)
+        return False
+
+    def create_message(self, account_sid: str, params: dict):
+        """POST Messages.json: devuelve (código HTTP, cuerpo)"""
+        self._latency()
+        now = time.time()
+        sender = params.get('From', '')
+
+        with self.lock:
+            if random.random() < self.throttle_rate or self._over_limit(sender, now):
+                self.stats['throttled'] += 1
+                return 429, error_body(20429, 'Too Many Requests', 429)
+            if not params.get('To') or random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 400, error_body(21211, "The 'To' number is not a valid phone number.", 400)
+
+            fate = 'failed' if random.random() < self.failure_rate else (
+                'read' if random.random() < self.read_rate else 'delivered')
+            sid = 'SM' + uuid.uuid4().hex
+            message = {
+                'sid': sid,
+                'account_sid': account_sid,
+                'to': params['To'],
+                'from': sender,
+                'body': params.get('Body', ''),
+                'num_media': len(params.get('MediaUrl', [])) if isinstance(params.get('MediaUrl'), list)
+                else (1 if params.get('MediaUrl') else 0),
+                'created': now,
+                'fate': fate,
+                'status_callback': params.get('StatusCallback')
+            }
+            self.messages[sid] = message
+            self.stats['created'] += 1
+
+        if message['status_callback']:
+            self._schedule_callbacks(message)
+        return 201, self.message_json(message, now)
+
+    def message_status(self, message: dict, now: float) -> str:
+        """Estado del mensaje según el tiempo transcurrido y su destino"""
+        age = now - message['created']
+        if age < self.sent_after:
+            return 'queued'
+        if age < self.delivered_after:
+            return 'sent'
+        if message['fate'] == 'failed':
+            return 'failed'
+        if message['fate'] == 'read' and age >= self.read_after:
+            return 'read'
+        return 'delivered'
+
+    def message_json(self, message: dict, now: float) -> dict:
+        status = self.message_status(message, now)
+        created = datetime.fromtimestamp(message['created'], timezone.utc)
+        return {
+            'sid': message['sid'],
+            'account_sid': message['account_sid'],
+            'api_version': '2010-04-01',
+            'body': message['body'],
+            'direction': 'outbound-api',
+            'from': message['from'],
+            'to': message['to'],
+            'status': status,
+            'num_media': str(message['num_media']),
+            'num_segments': '1',
+            'error_code': 63016 if status == 'failed' else None,
+            'error_message': 'Fuera de la ventana de 24 horas' if status == 'failed' else None,
+            'price': None,
+            'price_unit': 'USD',
+            'messaging_service_sid': None,
+            'date_created': format_datetime(created),
+            'date_sent': format_datetime(created),
+            'date_updated': format_datetime(datetime.fromtimestamp(now, timezone.utc)),
+            'uri': f"{API_PREFIX}{message['account_sid']}/Messages/{message['sid']}.json",
+            'subresource_uris': {}
+        }
+
+    def fetch_message(self, sid: str):
+        """GET Messages/<SM>.json"""
+        self._latency()
+        with self.lock:
+            self.stats['fetches'] += 1
+            message = self.messages.get(sid)
+        if not message:
+            return 404, error_body(20404, 'The requested resource was not found', 404)
+        return 200, self.message_json(message, time.time())
+
+    def list_messages(self, account_sid: str, query: dict):
+        """GET Messages.json con filtros y paginación por índice"""
+        self._latency()
+        page_size = min(1000, int(query.get('PageSize', 50)))
+        page = int(query.get('Page', 0))
+        sender = query.get('From')
+        after = parse_date(query['DateSent>']).timestamp() if 'DateSent>' in query else None
+        before = parse_date(query['DateSent<']).timestamp() if 'DateSent<' in query else None
+
+        with self.lock:
+            self.stats['lists'] += 1
+            matches = [
+                m for m in self.messages.values()
+                if (not sender or m['from'] == sender)
+                and (after is None or m['created'] >= after)
+                and (before is None or m['created'] < before)
+            ]
+        matches.sort(key=lambda m: m['created'], reverse=True)
+
+        now = time.time()
+        chunk = matches[page * page_size:(page + 1) * page_size]
+        base_query = {k: v for k, v in query.items() if k not in ('Page', 'PageToken')}
+        base_uri = f"{API_PREFIX}{account_sid}/Messages.json"
+        next_page = None
+        if (page + 1) * page_size < len(matches):
+            next_page = f"{base_uri}?{urlencode({**base_query, 'Page': page + 1, 'PageToken': f'PA{page + 1}'})}"
+
+        return 200, {
+            'messages': [self.message_json(m, now) for m in chunk],
+            'page': page,
+            'page_size': page_size,
+            'uri': f"{base_uri}?{urlencode({**base_query, 'Page': page})}",
+            'first_page_uri': f"{base_uri}?{urlencode({**base_query, 'Page': 0})}",
+            'next_page_uri': next_page,
+            'previous_page_uri': None,
+            'start': page * page_size,
+            'end': page * page_size + len(chunk) - 1
+        }
+
+    # -- StatusCallback -------------------------------------------------------
+
+    def _schedule_callbacks(self, message: dict):
+        created = message['created']
+        events = [(created + self.sent_after, 'sent')]
+        if message['fate'] == 'failed':
+            events.append((created + self.delivered_after, 'failed'))
+        else:
+            events.append((created + self.delivered_after, 'delivered'))
+            if message['fate'] == 'read':
+                events.append((created + self.read_after, 'read'))
+
+        with self._callback_condition:
+            for due, status in events:
+                heapq.heappush(self._callbacks, (due, next(self._callback_sequence),
+                                                 message['sid'], status))
+            self._callback_condition.notify()
+
+    def _run_callbacks(self):
+        while True:
+            with self._callback_condition:
+                while self._running:
+                    now = time.time()
+                    if self._callbacks and self._callbacks[0][0] <= now:
+                        break
+                    timeout = self._callbacks[0][0] - now if self._callbacks else None
+                    self._callback_condition.wait(timeout)
+                if not self._running:
+                    return
+                _, _, sid, status = heapq.heappop(self._callbacks)
+
+            self._post_callback(self.messages[sid], status)
+
+    def _post_callback(self, message: dict, status: str):
+        url = message['status_callback']
+        params = {
+            'MessageSid': message['sid'],
+            'SmsSid': message['sid'],
+            'AccountSid': message['account_sid'],
+            'From': message['from'],
+            'To': message['to'],
+            'MessageStatus': status,
+            'SmsStatus': status
+        }
+        if status == 'failed':
+            params['ErrorCode'] = '63016'
+        request = Request(url, data=urlencode(params).encode('utf-8'), method='POST', headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-Twilio-Signature': twilio_signature(self.auth_token, url, params)
+        })
+        try:
+            urlopen(request, timeout=5).close()
+            key = 'callbacks'
+        except Exception:
+            key = 'callback_errors'
+        with self.lock:
+            self.stats[key] += 1
+
+
+def error_body(code: int, message: str, status: int) -> dict:
+    return {
+        'code': code,
+        'message': message,
+        'more_info': f"https://www.twilio.com/docs/errors/{code}",
+        'status': status
+    }
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """Rutas de la API emulada (conexiones keep-alive HTTP/1.1)"""
+
+    protocol_version = 'HTTP/1.1'
+    fake = None  # FakeTwilioServer, asignado al crear el servidor
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """Obtener (cuenta, recurso) de la ruta /2010-04-01/Accounts/<AC>/<recurso>"""
+        path = urlparse(self.path).path
+        if not path.startswith(API_PREFIX):
+            return None, None
+        account_sid, _, resource = path[len(API_PREFIX):].partition('/')
+        return account_sid, resource
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        params = {key: values if key == 'MediaUrl' else values[0] for key, values in form.items()}
+
+        account_sid, resource = self._route()
+        if resource == 'Messages.json':
+            self._send_json(*self.fake.create_message(account_sid, params))
+        else:
+            self._send_json(404, error_body(20404, 'Not found', 404))
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/stats':
+            self._send_json(200, self.fake.get_stats())
+            return
+
+        account_sid, resource = self._route()
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        if resource == 'Messages.json':
+            self._send_json(*self.fake.list_messages(account_sid, query))
+        elif resource.startswith('Messages/') and resource.endswith('.json'):
+            self._send_json(*self.fake.fetch_message(resource[len('Messages/'):-len('.json')]))
+        else:
+            self._send_json(404, error_body(20404, 'Not found', 404))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que emula la API de Twilio")
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--auth-token', default=None,
+                        help="Token para firmar los StatusCallback (por defecto TWILIO_AUTH_TOKEN)")
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de 400")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fracción de 429")
+    parser.add_argument('--mps-limit', type=float, default=0, help="Mensajes/s por remitente (0 = sin límite)")
+    parser.add_argument('--failure-rate', type=float, default=0.02, help="Fracción que termina en 'failed'")
+    parser.add_argument('--read-rate', type=float, default=0.6, help="Fracción que llega a 'read'")
+    args = parser.parse_args()
+
+    auth_token = args.auth_token
+    if auth_token is None:
+        import os
+        import sys
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from config import Config
+        auth_token = Config.TWILIO_AUTH_TOKEN or 'fake-token'
+
+    server = FakeTwilioServer(
+        port=args.port, auth_token=auth_token, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, mps_limit=args.mps_limit,
+        failure_rate=args.failure_rate, read_rate=args.read_rate
+    )
+    server.start()
+    print(f"API de Twilio emulada en {server.url} (Ctrl+C para detener)")
+    print(f"Configure TWILIO_API_BASE_URL={server.url}")
+
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Estadísticas: {server.get_stats()}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
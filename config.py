@@ -16,24 +16,70 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'whatsapp_manager')
     
+    # Pool de conexiones
+    DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'true').lower() == 'true'
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Segundos esperando conexión libre
+    DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))  # Cerrar conexiones ociosas
+    DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))  # Ping si estuvo ociosa
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 64))  # Sentencias preparadas por conexión (0 = sin preparar)
+    
     # Configuración de Twilio
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
     TWILIO_WHATSAPP_FROM = os.getenv('TWILIO_WHATSAPP_FROM', 'whatsapp:+14155238886')
+    TWILIO_STATUS_CALLBACK_URL = os.getenv('TWILIO_STATUS_CALLBACK_URL', '')  # Vacío = URL del servidor local
+    TWILIO_VALIDATE_SIGNATURES = os.getenv('TWILIO_VALIDATE_SIGNATURES', 'true').lower() == 'true'
+    TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL', '')  # Vacío = https://api.twilio.com
     
     # Configuración de archivos
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx'}
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
     
+    # Importación de contactos
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 5000))  # Filas leídas y guardadas por bloque
+    IMPORT_PREVIEW_ROWS = int(os.getenv('IMPORT_PREVIEW_ROWS', 200))  # Filas para vista previa y detección
+    CONTACT_UPSERT_LOAD_DATA = os.getenv('CONTACT_UPSERT_LOAD_DATA', 'false').lower() == 'true'  # LOAD DATA LOCAL INFILE
+    
+    # Búsqueda de contactos
+    CONTACT_SEARCH_DEBOUNCE_MS = int(os.getenv('CONTACT_SEARCH_DEBOUNCE_MS', 300))  # Espera tras la última tecla
+    CONTACT_BULK_CHUNK_SIZE = int(os.getenv('CONTACT_BULK_CHUNK_SIZE', 1000))  # Contactos por transacción en operaciones masivas
+    
     # Configuración de logs
     LOG_FOLDER = os.path.join(os.path.dirname(__file__), 'logs')
     LOG_FILE = os.path.join(LOG_FOLDER, 'app.log')
     
     # Configuración de envíos
-    MESSAGES_PER_SECOND = 1  # Límite de Twilio
+    MESSAGES_PER_SECOND = int(os.getenv('MESSAGES_PER_SECOND', 1))  # Límite de Twilio por número
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 1))  # Envíos permitidos en ráfaga
+    RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv('RATE_LIMIT_BACKOFF_SECONDS', 1))  # Pausa inicial ante 429
+    RATE_LIMIT_MAX_BACKOFF_SECONDS = float(os.getenv('RATE_LIMIT_MAX_BACKOFF_SECONDS', 60))
+    DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', 4))  # Hilos enviando en paralelo
+    TWILIO_ASYNC_TRANSPORT = os.getenv('TWILIO_ASYNC_TRANSPORT', 'false').lower() == 'true'  # Envíos con asyncio
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', 200))  # Envíos simultáneos con asyncio
+    TWILIO_MAX_CONNECTIONS = int(os.getenv('TWILIO_MAX_CONNECTIONS', 100))  # Conexiones keep-alive a la API
+    TWILIO_KEEPALIVE_SECONDS = float(os.getenv('TWILIO_KEEPALIVE_SECONDS', 30))
+    MESSAGE_QUEUE_MAX_SIZE = int(os.getenv('MESSAGE_QUEUE_MAX_SIZE', 500))  # Mensajes en memoria
+    QUEUE_RETRY_BASE_SECONDS = float(os.getenv('QUEUE_RETRY_BASE_SECONDS', 5))  # Espera del primer reintento
+    QUEUE_RETRY_MAX_SECONDS = float(os.getenv('QUEUE_RETRY_MAX_SECONDS', 300))
+    SCHEDULER_RESYNC_SECONDS = int(os.getenv('SCHEDULER_RESYNC_SECONDS', 300))  # Cambios de otros procesos
+    SCHEDULER_BACKPRESSURE_SECONDS = float(os.getenv('SCHEDULER_BACKPRESSURE_SECONDS', 0.5))  # Espera con cola llena
     MAX_RETRY_ATTEMPTS = 3
     RETRY_DELAY_MINUTES = 10
+    MESSAGE_BATCH_SIZE = int(os.getenv('MESSAGE_BATCH_SIZE', 10))  # Mensajes reservados por ciclo
+    FANOUT_CHUNK_SIZE = int(os.getenv('FANOUT_CHUNK_SIZE', 5000))  # Mensajes creados por transacción
+    MESSAGE_LEASE_SECONDS = int(os.getenv('MESSAGE_LEASE_SECONDS', 300))  # Duración de la reserva
+    STATUS_FLUSH_BATCH_SIZE = int(os.getenv('STATUS_FLUSH_BATCH_SIZE', 200))  # Resultados por escritura
+    STATUS_FLUSH_INTERVAL_MS = int(os.getenv('STATUS_FLUSH_INTERVAL_MS', 500))  # Espera máxima antes de escribir
+    STATUS_CALLBACK_BATCH_SIZE = int(os.getenv('STATUS_CALLBACK_BATCH_SIZE', 500))  # Eventos por escritura
+    STATUS_CALLBACK_MAX_WAIT_SECONDS = int(os.getenv('STATUS_CALLBACK_MAX_WAIT_SECONDS', 60))  # SID aún no guardado
+    STATUS_RECONCILE_INTERVAL_MINUTES = int(os.getenv('STATUS_RECONCILE_INTERVAL_MINUTES', 60))  # Pasadas contra Twilio
+    STATUS_RECONCILE_WINDOW_MINUTES = int(os.getenv('STATUS_RECONCILE_WINDOW_MINUTES', 60))  # Tramo de fecha de envío
+    STATUS_RECONCILE_HORIZON_HOURS = int(os.getenv('STATUS_RECONCILE_HORIZON_HOURS', 72))  # Antigüedad máxima revisada
+    STATUS_RECONCILE_WORKERS = int(os.getenv('STATUS_RECONCILE_WORKERS', 4))  # Consultas simultáneas a Twilio
+    STATUS_RECONCILE_SLICE_SECONDS = int(os.getenv('STATUS_RECONCILE_SLICE_SECONDS', 30))  # Tiempo por turno
+    CAMPAIGN_COUNTERS_REPAIR_MINUTES = int(os.getenv('CAMPAIGN_COUNTERS_REPAIR_MINUTES', 60))  # Revisión de contadores
     
     # Configuración de seguridad
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
@@ -60,5 +106,6 @@ class Config:
             'database': cls.DB_NAME,
             'charset': 'utf8mb4',
             'use_unicode': True,
-            'autocommit': False
+            'autocommit': False,
+            'allow_local_infile': cls.CONTACT_UPSERT_LOAD_DATA
         }
@@ -1,64 +1,475 @@
 import mysql.connector
 from mysql.connector import Error
 from contextlib import contextmanager
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 from config import Config
+from segments import (compile_segment, extra_column_name, get_extra_keys, segment_assignments,
+                      validate_extra_key, CONTACT_FIELDS, EXTRA_FIELD_PREFIX, EXTRA_COLUMN_LENGTH)
 
 logger = logging.getLogger(__name__)
 
-class DatabaseManager:
+ER_UNSUPPORTED_PS = 1295  # La sentencia no admite el protocolo de sentencias preparadas
+
+
+class PoolTimeoutError(Error):
+    """No se obtuvo una conexión libre del pool a tiempo"""
+
+
+class ConnectionPool:
+    """Pool de conexiones MySQL acotado, con verificación de salud y
+    expulsión de conexiones ociosas.
+    
+    Cada hilo obtiene su propia conexión; si el mismo hilo vuelve a pedir
+    una conexión mientras ya tiene una, se reutiliza la misma.
+    """
+    
+    def __init__(self, config: Dict, size: int = 10, timeout: float = 30,
+                 idle_timeout: int = 300, health_check_interval: int = 30,
+                 statement_cache_size: int = 0):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.statement_cache_size = statement_cache_size
+        self._idle = []  # [(conexión, último uso)], se usa como pila (LIFO)
+        self._open = 0  # Conexiones abiertas (ociosas + en uso)
+        self._statements = {}  # conexión -> StatementCache
+        self._lock = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'evicted': 0
+        }
+    
+    def acquire(self):
+        """Obtener una conexión para el hilo actual"""
+        holder = getattr(self._local, 'holder', None)
+        if holder:
+            # El hilo ya tiene una conexión: reutilizarla
+            holder[1] += 1
+            return holder[0]
+        
+        conn = self._checkout()
+        self._local.holder = [conn, 1]
+        return conn
+    
+    def release(self, conn, broken: bool = False):
+        """Devolver la conexión del hilo actual al pool"""
+        holder = getattr(self._local, 'holder', None)
+        if holder and holder[0] is conn:
+            holder[1] -= 1
+            if holder[1] > 0:
+                return
+            self._local.holder = None
+        
+        if not broken:
+            try:
+                # Cerrar cualquier transacción implícita para que la siguiente
+                # consulta no lea una instantánea antigua
+                if conn.in_transaction:
+                    conn.rollback()
+            except Error:
+                broken = True
+        
+        if broken:
+            self._discard(conn)
+            return
+        
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+    
+    def _checkout(self):
+        """Sacar una conexión ociosa o abrir una nueva respetando el límite"""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            self._stats['checkouts'] += 1
+        
+        while True:
+            candidate = None
+            expired = []
+            with self._lock:
+                while True:
+                    expired.extend(self._pop_expired_locked())
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        break
+                    
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No hay conexiones libres en el pool ({self.size} en uso)"
+                        )
+                    self._stats['waits'] += 1
+                    self._lock.wait(remaining)
+            
+            for conn in expired:
+                self._close(conn)
+            
+            if candidate is None:
+                try:
+                    conn = mysql.connector.connect(**self.config)
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._stats['created'] += 1
+                return conn
+            
+            conn, last_used = candidate
+            if self._is_healthy(conn, last_used):
+                return conn
+            
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            self._discard(conn)
+    
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        """Verificar la conexión si estuvo ociosa más del intervalo configurado"""
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+    
+    def _pop_expired_locked(self) -> List:
+        """Retirar conexiones ociosas por más de idle_timeout (requiere el lock)"""
+        if not self._idle:
+            return []
+        limit = time.monotonic() - self.idle_timeout
+        # La pila tiene las más antiguas al inicio
+        expired = []
+        while self._idle and self._idle[0][1] < limit:
+            conn, _ = self._idle.pop(0)
+            expired.append(conn)
+        if expired:
+            self._open -= len(expired)
+            self._stats['evicted'] += len(expired)
+            self._lock.notify(len(expired))
+        return expired
+    
+    def _discard(self, conn):
+        """Cerrar una conexión y liberar su lugar en el pool"""
+        self._close(conn)
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+    
+    def statement_cache(self, conn) -> Optional['StatementCache']:
+        """Sentencias preparadas de una conexión del pool (None si están desactivadas)"""
+        if self.statement_cache_size <= 0:
+            return None
+        with self._lock:
+            cache = self._statements.get(conn)
+            if cache is None:
+                cache = self._statements[conn] = StatementCache(conn, self.statement_cache_size)
+            return cache
+    
+    def _close(self, conn):
+        # Al cerrar la conexión el servidor libera sus sentencias preparadas
+        with self._lock:
+            self._statements.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats['closed'] += 1
+    
+    def close_all(self):
+        """Cerrar todas las conexiones ociosas"""
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._open -= len(idle)
+            self._lock.notify_all()
+        for conn in idle:
+            self._close(conn)
+    
+    def get_stats(self) -> Dict:
+        """Obtener estadísticas del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'statements_prepared': sum(cache.prepared for cache in self._statements.values()),
+                'statement_cache_hits': sum(cache.hits for cache in self._statements.values())
+            })
+            return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config: Dict) -> ConnectionPool:
+    """Obtener el pool compartido para una configuración de conexión"""
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                config,
+                size=Config.DB_POOL_SIZE,
+                timeout=Config.DB_POOL_TIMEOUT,
+                idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+                health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE
+            )
+            _pools[key] = pool
+        return pool
+
+
+@lru_cache(maxsize=512)
+def normalize_statement(query: str) -> str:
+    """Normalizar espacios de una sentencia SQL para agrupar métricas"""
+    return ' '.join(query.split())
+
+
+class StatementCache:
+    """Cursores preparados (prepared=True) de una conexión, por SQL normalizado.
+    
+    La primera ejecución prepara la sentencia en el servidor; las siguientes
+    reutilizan el mismo cursor y solo envían los parámetros. Se cierran las
+    sentencias menos usadas al superar `size`. Solo la usa el hilo que tiene
+    la conexión.
+    """
+    
+    def __init__(self, conn, size: int):
+        self.conn = conn
+        self.size = size
+        self.prepared = 0
+        self.hits = 0
+        self._cursors = OrderedDict()  # (sql normalizado, dictionary) -> (sql, cursor)
+        self._unsupported = set()
+    
+    def get(self, query: str, dictionary: bool = False) -> Optional[tuple]:
+        """(sql, cursor) preparado para la sentencia, o None si no se puede preparar"""
+        key = (normalize_statement(query), dictionary)
+        entry = self._cursors.get(key)
+        if entry is not None:
+            self._cursors.move_to_end(key)
+            self.hits += 1
+            return entry
+        if key in self._unsupported:
+            return None
+        
+        # Se guarda el texto original: el cursor solo reutiliza la sentencia
+        # si recibe el mismo SQL con el que la preparó
+        entry = self._cursors[key] = (query, self.conn.cursor(prepared=True, dictionary=dictionary))
+        self.prepared += 1
+        while len(self._cursors) > self.size:
+            _, (_, cursor) = self._cursors.popitem(last=False)
+            self._close_cursor(cursor)
+        return entry
+    
+    def mark_unsupported(self, query: str, dictionary: bool = False):
+        """Ejecutar la sentencia sin preparar de aquí en adelante"""
+        key = (normalize_statement(query), dictionary)
+        entry = self._cursors.pop(key, None)
+        if entry is not None:
+            self._close_cursor(entry[1])
+        self._unsupported.add(key)
+    
+    def _close_cursor(self, cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+
+class QueryMetrics:
+    """Métricas de consultas agrupadas por sentencia"""
+    
+    MAX_STATEMENTS = 200
+    OTHER_KEY = '<otras sentencias>'
+    
     def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Reiniciar contadores"""
+        with self._lock:
+            self._statements = {}
+            self._totals = {'queries': 0, 'errors': 0, 'total_ms': 0.0}
+    
+    def record(self, query: str, elapsed: float, failed: bool = False):
+        """Registrar la ejecución de una sentencia"""
+        key = normalize_statement(query)
+        elapsed_ms = elapsed * 1000
+        
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.MAX_STATEMENTS:
+                    key = self.OTHER_KEY
+                entry = self._statements.setdefault(
+                    key, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+                )
+            
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            self._totals['queries'] += 1
+            self._totals['total_ms'] += elapsed_ms
+            if failed:
+                entry['errors'] += 1
+                self._totals['errors'] += 1
+    
+    def snapshot(self, top: int = 10) -> Dict:
+        """Obtener totales y las sentencias más costosas"""
+        with self._lock:
+            statements = sorted(
+                ({'statement': key, **values} for key, values in self._statements.items()),
+                key=lambda item: item['total_ms'],
+                reverse=True
+            )
+            return {
+                **self._totals,
+                'statements': [dict(item) for item in statements[:top]]
+            }
+
+
+class DatabaseManager:
+    def __init__(self, use_pool: bool = None):
         self.config = Config.get_db_config()
+        if use_pool is None:
+            use_pool = Config.DB_POOL_ENABLED
+        self.pool = get_pool(self.config) if use_pool else None
+        self.metrics = QueryMetrics()
+        self._max_allowed_packet = None
         
     @contextmanager
     def get_connection(self):
         """Context manager para conexiones a la base de datos"""
         conn = None
+        broken = False
         try:
-            conn = mysql.connector.connect(**self.config)
+            if self.pool:
+                conn = self.pool.acquire()
+            else:
+                conn = mysql.connector.connect(**self.config)
             yield conn
         except Error as e:
             logger.error(f"Error de base de datos: {e}")
             if conn:
-                conn.rollback()
+                try:
+                    conn.rollback()
+                except Error:
+                    broken = True
             raise
         finally:
-            if conn and conn.is_connected():
-                conn.close()
+            if conn:
+                if self.pool:
+                    self.pool.release(conn, broken)
+                elif conn.is_connected():
+                    conn.close()
     
-    def execute_query(self, query: str, params: tuple = None, fetch_one: bool = False) -> Any:
-        """Ejecutar una consulta SELECT"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+    @contextmanager
+    def _track(self, query: str):
+        """Medir la ejecución de una sentencia"""
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.record(query, time.perf_counter() - started, failed)
+    
+    @contextmanager
+    def _execute(self, conn, query: str, params: tuple = None, dictionary: bool = False):
+        """Ejecutar una sentencia con el cursor preparado de la conexión, si lo hay"""
+        cache = self.pool.statement_cache(conn) if self.pool else None
+        entry = cache.get(query, dictionary) if cache else None
+        if entry is not None:
+            sql, cursor = entry
+            try:
+                cursor.execute(sql, params or ())
+            except Error as e:
+                if e.errno != ER_UNSUPPORTED_PS:
+                    raise
+                cache.mark_unsupported(query, dictionary)
+            else:
+                # El cursor queda en la caché para la próxima ejecución
+                yield cursor
+                return
+        
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
             cursor.execute(query, params)
-            result = cursor.fetchone() if fetch_one else cursor.fetchall()
+            yield cursor
+        finally:
             cursor.close()
-            return result
+    
+    def get_pool_stats(self) -> Optional[Dict]:
+        """Obtener estadísticas del pool (None si no se usa pool)"""
+        return self.pool.get_stats() if self.pool else None
+    
+    def get_metrics(self, top: int = 10) -> Dict:
+        """Obtener métricas de consultas y del pool de conexiones"""
+        metrics = self.metrics.snapshot(top)
+        metrics['pool'] = self.get_pool_stats()
+        return metrics
+    
+    def execute_query(self, query: str, params: tuple = None, fetch_one: bool = False) -> Any:
+        """Ejecutar una consulta SELECT"""
+        with self._track(query), self.get_connection() as conn:
+            with self._execute(conn, query, params, dictionary=True) as cursor:
+                # Leer todas las filas: un cursor preparado no admite otra
+                # ejecución con resultados pendientes
+                rows = cursor.fetchall()
+            if fetch_one:
+                return rows[0] if rows else None
+            return rows
     
     def execute_update(self, query: str, params: tuple = None) -> int:
         """Ejecutar una consulta INSERT, UPDATE o DELETE"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
+        with self._track(query), self.get_connection() as conn:
+            with self._execute(conn, query, params) as cursor:
+                affected_rows = cursor.rowcount
             conn.commit()
-            affected_rows = cursor.rowcount
-            cursor.close()
             return affected_rows
     
     def execute_insert(self, query: str, params: tuple = None) -> int:
         """Ejecutar una consulta INSERT y devolver el ID generado"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
+        with self._track(query), self.get_connection() as conn:
+            with self._execute(conn, query, params) as cursor:
+                last_id = cursor.lastrowid
             conn.commit()
-            last_id = cursor.lastrowid
-            cursor.close()
             return last_id
     
     def execute_many(self, query: str, data: List[tuple]) -> int:
         """Ejecutar múltiples consultas"""
-        with self.get_connection() as conn:
+        with self._track(query), self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.executemany(query, data)
             conn.commit()
@@ -66,6 +477,50 @@ class DatabaseManager:
             cursor.close()
             return affected_rows
     
+    def execute_page(self, query: str, order_by: str, after: tuple = None,
+                     descending: bool = True, limit: int = 100,
+                     conditions: List[str] = None, params: tuple = (),
+                     id_column: str = 'id') -> List[Dict]:
+        """Ejecutar un SELECT paginado por cursor (keyset).
+        
+        `query` es el SELECT ... FROM ... sin WHERE ni ORDER BY. Las filas se
+        ordenan por (order_by, id_column) y `after` es (valor, id) de la
+        última fila de la página anterior (ver next_cursor). Con un índice
+        sobre esas columnas cada página lee solo sus filas, sin recorrer las
+        anteriores como OFFSET.
+        """
+        conditions = list(conditions or [])
+        params = list(params)
+        if after:
+            condition, condition_params = keyset_condition(order_by, after, descending, id_column)
+            conditions.append(condition)
+            params.extend(condition_params)
+        
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = 'DESC' if descending else 'ASC'
+        query = (f"{query}{where} ORDER BY {order_by} {direction}, {id_column} {direction} "
+                 f"LIMIT %s")
+        params.append(limit)
+        return self.execute_query(query, tuple(params))
+    
+    @contextmanager
+    def transaction(self):
+        """Ejecutar varias sentencias en una sola transacción"""
+        with self._track('<transacción>'), self.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                yield cursor
+                conn.commit()
+            finally:
+                cursor.close()
+    
+    def get_max_allowed_packet(self) -> int:
+        """Tamaño máximo de una sentencia aceptado por el servidor (bytes)"""
+        if self._max_allowed_packet is None:
+            result = self.execute_query("SELECT @@max_allowed_packet AS size", fetch_one=True)
+            self._max_allowed_packet = int(result['size']) if result else 4 * 1024 * 1024
+        return self._max_allowed_packet
+    
     def test_connection(self) -> bool:
         """Probar la conexión a la base de datos"""
         try:
@@ -73,10 +528,27 @@ class DatabaseManager:
                 return conn.is_connected()
         except:
             return False
+    
+    def close(self):
+        """Cerrar las conexiones ociosas del pool"""
+        if self.pool:
+            self.pool.close_all()
+
+
+_database = None
+_database_lock = threading.Lock()
+
+def get_database() -> DatabaseManager:
+    """Obtener el DatabaseManager compartido por todo el proceso"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = DatabaseManager()
+        return _database
 
 class UserModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
     
     def authenticate(self, username: str, password_hash: str) -> Optional[Dict]:
         """Autenticar usuario"""
@@ -109,15 +581,161 @@ class UserModel:
         query = "UPDATE users SET last_login = NOW() WHERE id = %s"
         return self.db.execute_update(query, (user_id,)) > 0
 
+def keyset_condition(column: str, after: tuple, descending: bool = False,
+                     id_column: str = 'id') -> Tuple[str, tuple]:
+    """Condición para continuar un orden (column, id) después de after = (valor, id).
+    
+    Sigue el orden de MySQL para NULL: primero en ASC y al final en DESC.
+    """
+    value, last_id = after
+    if descending:
+        if value is None:
+            return f"({column} IS NULL AND {id_column} < %s)", (last_id,)
+        return (f"({column} < %s OR ({column} = %s AND {id_column} < %s) OR {column} IS NULL)",
+                (value, value, last_id))
+    if value is None:
+        return (f"(({column} IS NULL AND {id_column} > %s) OR {column} IS NOT NULL)",
+                (last_id,))
+    return (f"({column} > %s OR ({column} = %s AND {id_column} > %s))",
+            (value, value, last_id))
+
+
+def next_cursor(rows: List[Dict], field: str = 'created_at', id_field: str = 'id') -> Optional[tuple]:
+    """Cursor (valor, id) para pedir la página siguiente a `rows` (None si está vacía)"""
+    if not rows:
+        return None
+    return rows[-1][field], rows[-1][id_field]
+
+
+_PHONE_SEARCH = re.compile(r'^\+?[\d\s().-]*\d[\d\s().-]*$')
+_SEARCH_WORDS = re.compile(r'\w+')
+
+
+def contact_search_condition(search: str) -> Optional[Tuple[str, tuple]]:
+    """Condición indexada para buscar contactos (None si no hay qué buscar).
+    
+    Un texto con forma de teléfono se busca por prefijo sobre el índice de
+    phone_number (con y sin el código de país por defecto). Cualquier otro
+    texto usa el índice FULLTEXT de nombre, email y empresa: cada palabra
+    es obligatoria y se compara como prefijo.
+    """
+    search = (search or '').strip()
+    if not search:
+        return None
+    
+    if _PHONE_SEARCH.match(search):
+        digits = re.sub(r'\D', '', search)
+        prefixes = [f"+{digits}%"]
+        if not search.startswith('+'):
+            prefixes.append(f"{Config.DEFAULT_COUNTRY_CODE}{digits}%")
+        sql = ' OR '.join(['phone_number LIKE %s'] * len(prefixes))
+        return f"({sql})", tuple(prefixes)
+    
+    words = _SEARCH_WORDS.findall(search)
+    if not words:
+        return None
+    terms = ' '.join(f"+{word}*" for word in words)
+    return "MATCH(name, email, company) AGAINST (%s IN BOOLEAN MODE)", (terms,)
+
+
+def _tsv_value(value: Any) -> str:
+    """Valor para un archivo de LOAD DATA (\\N es NULL)"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0'))
+
+
 class ContactModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
+    
+    # Columnas de la carga masiva de contactos
+    UPSERT_COLUMNS = ('phone_number', 'name', 'email', 'company', 'extra_data', 'created_by')
+    # Por debajo de esta cantidad no vale la pena LOAD DATA
+    LOAD_DATA_MIN_ROWS = 1000
     
     def create_contacts(self, contacts: List[Dict], user_id: int) -> int:
-        """Crear múltiples contactos"""
-        query = """
-            INSERT INTO contacts (phone_number, name, email, company, extra_data, created_by)
-            VALUES (%s, %s, %s, %s, %s, %s)
+        """Crear múltiples contactos (o actualizarlos si el teléfono ya existe).
+        
+        Devuelve el número de contactos guardados.
+        """
+        result = self.upsert_contacts(contacts, user_id)
+        return result['inserted'] + result['updated']
+    
+    def upsert_contacts(self, contacts: List[Dict], user_id: int,
+                        use_load_data: bool = None) -> Dict[str, int]:
+        """Crear o actualizar contactos en bloque.
+        
+        Usa INSERT multi-fila con ON DUPLICATE KEY UPDATE en sentencias del
+        tamaño que permite max_allowed_packet, o LOAD DATA LOCAL INFILE a una
+        tabla temporal y un solo INSERT ... SELECT si está habilitado
+        (CONTACT_UPSERT_LOAD_DATA). Si un teléfono se repite en la lista,
+        gana la última fila.
+        
+        Devuelve {'inserted', 'updated', 'duplicates'}.
+        """
+        rows = {}
+        for contact in contacts:
+            phone = contact.get('phone_number')
+            if phone:
+                rows[phone] = (
+                    phone,
+                    contact.get('name'),
+                    contact.get('email'),
+                    contact.get('company'),
+                    contact.get('extra_data'),
+                    user_id
+                )
+        
+        result = {'inserted': 0, 'updated': 0, 'duplicates': len(contacts) - len(rows)}
+        if not rows:
+            return result
+        
+        if use_load_data is None:
+            use_load_data = Config.CONTACT_UPSERT_LOAD_DATA
+        
+        if use_load_data and len(rows) >= self.LOAD_DATA_MIN_ROWS:
+            try:
+                updated = self._load_data_upsert(list(rows.values()), user_id)
+                result['updated'] = updated
+                result['inserted'] = len(rows) - updated
+                return result
+            except Error as e:
+                logger.warning(f"LOAD DATA no disponible, se usa INSERT multi-fila: {e}")
+        
+        for batch in self._packet_batches(list(rows.values())):
+            updated = self._insert_batch(batch)
+            result['updated'] += updated
+            result['inserted'] += len(batch) - updated
+        return result
+    
+    def _packet_batches(self, rows: List[tuple]):
+        """Dividir las filas en sentencias que quepan en max_allowed_packet"""
+        # Margen para el escape de caracteres y el texto de la sentencia
+        budget = self.db.get_max_allowed_packet() // 2
+        batch, size = [], 0
+        for row in rows:
+            # Estimación: el doble de los bytes en UTF-8 (por el escape) y separadores
+            row_size = 8 * len(row) + 2 * sum(
+                len(str(value).encode('utf-8')) for value in row if value is not None
+            )
+            if batch and size + row_size > budget:
+                yield batch
+                batch, size = [], 0
+            batch.append(row)
+            size += row_size
+        if batch:
+            yield batch
+    
+    def _insert_batch(self, batch: List[tuple]) -> int:
+        """Un INSERT multi-fila en su propia transacción; devuelve los actualizados"""
+        phones = [row[0] for row in batch]
+        placeholders = ', '.join(['%s'] * len(phones))
+        row_placeholder = f"({', '.join(['%s'] * len(self.UPSERT_COLUMNS))})"
+        query = f"""
+            INSERT INTO contacts ({', '.join(self.UPSERT_COLUMNS)})
+            VALUES {', '.join([row_placeholder] * len(batch))}
             ON DUPLICATE KEY UPDATE
                 name = VALUES(name),
                 email = VALUES(email),
@@ -126,40 +744,365 @@ class ContactModel:
                 updated_at = NOW()
         """
         
-        data = []
-        for contact in contacts:
-            data.append((
-                contact.get('phone_number'),
-                contact.get('name'),
-                contact.get('email'),
-                contact.get('company'),
-                contact.get('extra_data'),
-                user_id
-            ))
+        with self.db.transaction() as cursor:
+            # Los teléfonos ya existentes son los que se actualizan
+            cursor.execute(
+                f"SELECT COUNT(*) AS existing FROM contacts WHERE phone_number IN ({placeholders})",
+                phones
+            )
+            existing = cursor.fetchone()['existing']
+            cursor.execute(query, [value for row in batch for value in row])
+        return existing
+    
+    def _load_data_upsert(self, rows: List[tuple], user_id: int) -> int:
+        """Cargar las filas con LOAD DATA a una tabla temporal y combinarlas.
         
-        return self.db.execute_many(query, data)
+        Devuelve el número de contactos que ya existían (actualizados).
+        """
+        fd, path = tempfile.mkstemp(prefix='contacts_', suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='\n') as f:
+                for row in rows:
+                    f.write('\t'.join(_tsv_value(value) for value in row[:5]) + '\n')
+            
+            # La tabla temporal solo existe en esta conexión
+            with self.db.transaction() as cursor:
+                cursor.execute("""
+                    CREATE TEMPORARY TABLE contacts_import (
+                        phone_number VARCHAR(20) NOT NULL PRIMARY KEY,
+                        name VARCHAR(100),
+                        email VARCHAR(100),
+                        company VARCHAR(100),
+                        extra_data JSON
+                    )
+                """)
+                try:
+                    cursor.execute(
+                        """
+                        LOAD DATA LOCAL INFILE %s
+                        INTO TABLE contacts_import
+                        CHARACTER SET utf8mb4
+                        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                        LINES TERMINATED BY '\\n'
+                        (phone_number, name, email, company, extra_data)
+                        """,
+                        (path,)
+                    )
+                    cursor.execute("""
+                        SELECT COUNT(*) AS existing
+                        FROM contacts_import i
+                        JOIN contacts c ON c.phone_number = i.phone_number
+                    """)
+                    existing = cursor.fetchone()['existing']
+                    cursor.execute(
+                        f"""
+                        INSERT INTO contacts ({', '.join(self.UPSERT_COLUMNS)})
+                        SELECT phone_number, name, email, company, extra_data, %s
+                        FROM contacts_import
+                        ON DUPLICATE KEY UPDATE
+                            name = VALUES(name),
+                            email = VALUES(email),
+                            company = VALUES(company),
+                            extra_data = VALUES(extra_data),
+                            updated_at = NOW()
+                        """,
+                        (user_id,)
+                    )
+                finally:
+                    cursor.execute("DROP TEMPORARY TABLE IF EXISTS contacts_import")
+            return existing
+        finally:
+            os.remove(path)
     
-    def get_contacts(self, limit: int = None, offset: int = 0) -> List[Dict]:
-        """Obtener lista de contactos"""
-        query = "SELECT * FROM contacts ORDER BY created_at DESC"
+    def get_contacts(self, limit: int = None, offset: int = 0,
+                     after: tuple = None) -> List[Dict]:
+        """Obtener lista de contactos (más recientes primero).
+        
+        Para recorrer la tabla por páginas usar `after` = (created_at, id)
+        de la última fila recibida (next_cursor) en lugar de `offset`.
+        """
+        if after:
+            return self.db.execute_page("SELECT * FROM contacts", 'created_at',
+                                        after=after, limit=limit or 100)
+        
+        query = "SELECT * FROM contacts ORDER BY created_at DESC, id DESC"
         if limit:
-            query += f" LIMIT {limit} OFFSET {offset}"
+            query += " LIMIT %s OFFSET %s"
+            return self.db.execute_query(query, (limit, offset))
         return self.db.execute_query(query)
     
-    def get_contact_count(self) -> int:
-        """Obtener número total de contactos"""
+    # Columnas por las que se puede paginar la tabla de contactos
+    PAGE_ORDER_COLUMNS = ('created_at', 'phone_number', 'name', 'email', 'company')
+    
+    def get_contacts_page(self, order_by: str = 'created_at', descending: bool = True,
+                          after: tuple = None, limit: int = 200,
+                          search: str = None) -> List[Dict]:
+        """Obtener una página de contactos con paginación por cursor (keyset).
+        
+        `after` es (valor de order_by, id) de la última fila de la página
+        anterior; el costo no depende de la profundidad de la página.
+        """
+        if order_by not in self.PAGE_ORDER_COLUMNS:
+            raise ValueError(f"Orden no soportado: '{order_by}'")
+        
+        conditions, params = [], ()
+        search_condition = contact_search_condition(search)
+        if search_condition:
+            conditions, params = [search_condition[0]], search_condition[1]
+        
+        return self.db.execute_page(
+            "SELECT id, phone_number, name, email, company, created_at FROM contacts",
+            order_by, after=after, descending=descending, limit=limit,
+            conditions=conditions, params=params
+        )
+    
+    def get_contact_count(self, search: str = None) -> int:
+        """Obtener número total de contactos (o de los que coinciden con la búsqueda)"""
         query = "SELECT COUNT(*) as count FROM contacts"
-        result = self.db.execute_query(query, fetch_one=True)
+        params = None
+        search_condition = contact_search_condition(search)
+        if search_condition:
+            query += f" WHERE {search_condition[0]}"
+            params = search_condition[1]
+        result = self.db.execute_query(query, params, fetch_one=True)
         return result['count'] if result else 0
     
     def delete_contact(self, contact_id: int) -> bool:
         """Eliminar un contacto"""
-        query = "DELETE FROM contacts WHERE id = %s"
-        return self.db.execute_update(query, (contact_id,)) > 0
+        return self.delete_contacts([contact_id]) > 0
+    
+    # -- Operaciones masivas ------------------------------------------------
+    # Una selección es una lista de ids, o una búsqueda y/o filtros de
+    # segmento. Se recorre en bloques de ids (iter_id_chunks) y cada bloque
+    # se procesa en su propia transacción con WHERE id IN (...).
+    
+    def _selection_conditions(self, search: str = None,
+                              filters: List[Dict] = None) -> Tuple[List[str], tuple]:
+        """Condiciones SQL (sobre el alias `c`) de una búsqueda y filtros"""
+        conditions, params = [], ()
+        search_condition = contact_search_condition(search)
+        if search_condition:
+            conditions.append(search_condition[0])
+            params += search_condition[1]
+        if filters:
+            audience_sql, audience_params = SegmentModel(self.db).compile_filters(filters)
+            if audience_sql:
+                conditions.append(audience_sql)
+                params += audience_params
+        return conditions, params
+    
+    def count_selection(self, contact_ids: List[int] = None, search: str = None,
+                        filters: List[Dict] = None) -> int:
+        """Contar los contactos de una selección"""
+        if contact_ids is not None:
+            return len(set(contact_ids))
+        conditions, params = self._selection_conditions(search, filters)
+        query = "SELECT COUNT(*) as count FROM contacts c"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        result = self.db.execute_query(query, params, fetch_one=True)
+        return result['count'] if result else 0
+    
+    def iter_id_chunks(self, contact_ids: List[int] = None, search: str = None,
+                       filters: List[Dict] = None, chunk_size: int = None) -> Iterator[List[int]]:
+        """Recorrer los ids de una selección en bloques ordenados por id"""
+        chunk_size = chunk_size or Config.CONTACT_BULK_CHUNK_SIZE
+        if contact_ids is not None:
+            ids = sorted(set(contact_ids))
+            for start in range(0, len(ids), chunk_size):
+                yield ids[start:start + chunk_size]
+            return
+        
+        conditions, params = self._selection_conditions(search, filters)
+        last_id = 0
+        while True:
+            where = ' AND '.join(conditions + ["c.id > %s"])
+            rows = self.db.execute_query(
+                f"SELECT c.id FROM contacts c WHERE {where} ORDER BY c.id LIMIT %s",
+                params + (last_id, chunk_size)
+            )
+            if not rows:
+                return
+            ids = [row['id'] for row in rows]
+            yield ids
+            if len(ids) < chunk_size:
+                return
+            last_id = ids[-1]
+    
+    def get_contacts_by_ids(self, contact_ids: List[int]) -> List[Dict]:
+        """Obtener contactos por id (en el orden de los ids)"""
+        if not contact_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(contact_ids))
+        query = f"SELECT * FROM contacts WHERE id IN ({placeholders}) ORDER BY id"
+        return self.db.execute_query(query, tuple(contact_ids))
+    
+    def delete_contacts(self, contact_ids: List[int]) -> int:
+        """Eliminar contactos por id, un bloque por transacción.
+        
+        Los mensajes se eliminan antes que los contactos y no en cascada: los
+        borrados en cascada no disparan los triggers de campaign_counters.
+        """
+        deleted = 0
+        for chunk in self.iter_id_chunks(contact_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            with self.db.transaction() as cursor:
+                cursor.execute(f"DELETE FROM messages WHERE contact_id IN ({placeholders})",
+                               tuple(chunk))
+                cursor.execute(f"DELETE FROM contacts WHERE id IN ({placeholders})", tuple(chunk))
+                deleted += cursor.rowcount
+        return deleted
+    
+    def update_fields(self, contact_ids: List[int], fields: Dict[str, Optional[str]]) -> int:
+        """Asignar campos a contactos por id, un bloque por transacción.
+        
+        Los campos son columnas de contacts ('name', 'email', 'company') o
+        claves de extra_data ('extra.<clave>'); una clave con valor None se
+        elimina de extra_data.
+        """
+        assignments, params = [], []
+        removals, sets = [], []
+        for field, value in fields.items():
+            if field.startswith(EXTRA_FIELD_PREFIX):
+                path = f'$."{validate_extra_key(field[len(EXTRA_FIELD_PREFIX):])}"'
+                if value is None:
+                    removals.append(path)
+                else:
+                    sets.extend([path, str(value)])
+            elif field in CONTACT_FIELDS and field != 'phone_number':
+                # El campo está en la lista blanca, se puede interpolar
+                assignments.append(f"{field} = %s")
+                params.append(value)
+            else:
+                raise ValueError(f"Campo no asignable: '{field}'")
+        
+        if removals or sets:
+            expression = "COALESCE(extra_data, JSON_OBJECT())"
+            if removals:
+                expression = f"JSON_REMOVE({expression}, {', '.join(['%s'] * len(removals))})"
+            if sets:
+                expression = f"JSON_SET({expression}, {', '.join(['%s'] * len(sets))})"
+            assignments.append(f"extra_data = {expression}")
+            params.extend(removals + sets)
+        if not assignments:
+            return 0
+        
+        updated = 0
+        for chunk in self.iter_id_chunks(contact_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            query = f"UPDATE contacts SET {', '.join(assignments)} WHERE id IN ({placeholders})"
+            with self.db.transaction() as cursor:
+                cursor.execute(query, tuple(params) + tuple(chunk))
+                updated += cursor.rowcount
+        return updated
+    
+    def tag_contacts(self, contact_ids: List[int], key: str, value: Optional[str]) -> int:
+        """Etiquetar contactos con una clave de extra_data (None la quita)"""
+        return self.update_fields(contact_ids, {f"{EXTRA_FIELD_PREFIX}{key}": value})
+    
+    def add_to_segment(self, contact_ids: List[int], segment: Dict) -> int:
+        """Agregar contactos a un segmento asignándoles los valores que filtra"""
+        return self.update_fields(contact_ids, segment_assignments(segment['filters']))
+
+class SegmentModel:
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
+    
+    def create_segment(self, name: str, filters: List[Dict], user_id: int) -> int:
+        """Crear un segmento de audiencia.
+        
+        Las claves de extra_data usadas en los filtros se indexan con una
+        columna generada para que el segmento no recorra toda la tabla.
+        """
+        # Validar los filtros antes de guardarlos
+        compile_segment(filters)
+        
+        for key in get_extra_keys(filters):
+            try:
+                self.index_extra_key(key)
+            except Error as e:
+                logger.warning(f"No se pudo indexar la clave '{key}' de extra_data: {e}")
+        
+        query = """
+            INSERT INTO segments (name, filters, created_by)
+            VALUES (%s, %s, %s)
+        """
+        return self.db.execute_insert(query, (name, json.dumps(filters), user_id))
+    
+    def get_segments(self, active_only: bool = True) -> List[Dict]:
+        """Obtener lista de segmentos"""
+        query = "SELECT * FROM segments"
+        if active_only:
+            query += " WHERE is_active = TRUE"
+        query += " ORDER BY name ASC"
+        return [self._decode(segment) for segment in self.db.execute_query(query)]
+    
+    def get_segment(self, segment_id: int) -> Optional[Dict]:
+        """Obtener un segmento específico"""
+        query = "SELECT * FROM segments WHERE id = %s"
+        return self._decode(self.db.execute_query(query, (segment_id,), fetch_one=True))
+    
+    def delete_segment(self, segment_id: int) -> bool:
+        """Eliminar segmento (soft delete)"""
+        query = "UPDATE segments SET is_active = FALSE WHERE id = %s"
+        return self.db.execute_update(query, (segment_id,)) > 0
+    
+    def compile_filters(self, filters) -> tuple:
+        """Compilar filtros a (condición SQL sobre `c`, parámetros)"""
+        if isinstance(filters, str):
+            filters = json.loads(filters)
+        return compile_segment(filters, self.get_indexed_keys())
+    
+    def count_contacts(self, filters) -> int:
+        """Contar los contactos que cumplen los filtros de un segmento"""
+        audience_sql, audience_params = self.compile_filters(filters)
+        query = "SELECT COUNT(*) as count FROM contacts c"
+        if audience_sql:
+            query += f" WHERE {audience_sql}"
+        result = self.db.execute_query(query, audience_params, fetch_one=True)
+        return result['count'] if result else 0
+    
+    def get_indexed_keys(self) -> Dict[str, str]:
+        """Obtener las claves de extra_data con columna generada {clave: columna}"""
+        rows = self.db.execute_query("SELECT json_key, column_name FROM contact_extra_indexes")
+        return {row['json_key']: row['column_name'] for row in rows}
+    
+    def index_extra_key(self, key: str) -> str:
+        """Crear columna generada e índice para una clave de extra_data.
+        
+        La columna es VIRTUAL: no ocupa espacio en la tabla y solo se
+        materializa en el índice secundario.
+        """
+        indexed = self.get_indexed_keys()
+        if key in indexed:
+            return indexed[key]
+        
+        column = extra_column_name(key)
+        # La clave ya fue validada (solo [A-Za-z0-9_]), se puede interpolar
+        self.db.execute_update(f"""
+            ALTER TABLE contacts
+                ADD COLUMN {column} VARCHAR({EXTRA_COLUMN_LENGTH})
+                    GENERATED ALWAYS AS (
+                        LEFT(JSON_UNQUOTE(JSON_EXTRACT(extra_data, '$."{key}"')), {EXTRA_COLUMN_LENGTH})
+                    ) VIRTUAL,
+                ADD INDEX idx_{column} ({column})
+        """)
+        self.db.execute_insert(
+            "INSERT IGNORE INTO contact_extra_indexes (json_key, column_name) VALUES (%s, %s)",
+            (key, column)
+        )
+        logger.info(f"Clave '{key}' de extra_data indexada en contacts.{column}")
+        return column
+    
+    def _decode(self, segment: Optional[Dict]) -> Optional[Dict]:
+        """Decodificar los filtros JSON de un segmento"""
+        if segment and isinstance(segment.get('filters'), str):
+            segment['filters'] = json.loads(segment['filters'])
+        return segment
 
 class TemplateModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
     
     def create_template(self, name: str, content: str, variables: str, user_id: int) -> int:
         """Crear nueva plantilla"""
@@ -197,31 +1140,68 @@ class TemplateModel:
         return self.db.execute_update(query, (template_id,)) > 0
 
 class CampaignModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
+    
+    # Estados con contador en campaign_counters (mantenidos por triggers)
+    COUNTER_STATUSES = ('pending', 'queued', 'sent', 'delivered', 'read', 'failed', 'undelivered')
     
     def create_campaign(self, name: str, template_id: int, scheduled_at: str, 
-                        user_id: int, total_contacts: int) -> int:
+                        user_id: int, total_contacts: int, segment_id: int = None) -> int:
         """Crear nueva campaña"""
         query = """
-            INSERT INTO campaigns (name, template_id, scheduled_at, created_by, total_contacts)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO campaigns (name, template_id, segment_id, scheduled_at, created_by, total_contacts)
+            VALUES (%s, %s, %s, %s, %s, %s)
         """
         return self.db.execute_insert(query, 
-                                    (name, template_id, scheduled_at, user_id, total_contacts))
+                                    (name, template_id, segment_id, scheduled_at, user_id, total_contacts))
     
     def get_pending_campaigns(self) -> List[Dict]:
         """Obtener campañas pendientes de ejecución"""
         query = """
-            SELECT c.*, t.content as template_content, t.variables
+            SELECT c.*, t.content as template_content, t.variables,
+                   s.name as segment_name, s.filters as segment_filters
             FROM campaigns c
             JOIN templates t ON c.template_id = t.id
+            LEFT JOIN segments s ON c.segment_id = s.id
             WHERE c.status = 'pending' 
             AND (c.scheduled_at IS NULL OR c.scheduled_at <= NOW())
             ORDER BY c.created_at ASC
         """
         return self.db.execute_query(query)
     
+    def update_total_contacts(self, campaign_id: int, total_contacts: int) -> bool:
+        """Actualizar el número de destinatarios de una campaña"""
+        query = "UPDATE campaigns SET total_contacts = %s WHERE id = %s"
+        return self.db.execute_update(query, (total_contacts, campaign_id)) > 0
+    
+    def get_next_scheduled_time(self) -> Optional[datetime]:
+        """Obtener la hora de la próxima campaña programada a futuro"""
+        query = """
+            SELECT MIN(scheduled_at) as next_run
+            FROM campaigns
+            WHERE status = 'pending' AND scheduled_at > NOW()
+        """
+        result = self.db.execute_query(query, fetch_one=True)
+        return result['next_run'] if result else None
+    
+    def start_campaign(self, campaign_id: int) -> bool:
+        """Marcar una campaña pendiente como 'running'.
+        
+        Devuelve False si otro proceso ya la inició.
+        """
+        query = """
+            UPDATE campaigns SET status = 'running', executed_at = NOW()
+            WHERE id = %s AND status = 'pending'
+        """
+        return self.db.execute_update(query, (campaign_id,)) > 0
+    
+    def requeue_campaign(self, campaign_id: int) -> bool:
+        """Devolver a 'pending' una campaña cuya creación de mensajes falló,
+        para que la próxima verificación la reanude"""
+        query = "UPDATE campaigns SET status = 'pending' WHERE id = %s AND status = 'running'"
+        return self.db.execute_update(query, (campaign_id,)) > 0
+    
     def update_campaign_status(self, campaign_id: int, status: str) -> bool:
         """Actualizar estado de campaña"""
         query = "UPDATE campaigns SET status = %s"
@@ -230,18 +1210,27 @@ class CampaignModel:
         query += " WHERE id = %s"
         return self.db.execute_update(query, (status, campaign_id)) > 0
     
+    def update_scheduled_campaign(self, campaign_id: int, name: str, template_id: int,
+                                  scheduled_at: str) -> bool:
+        """Actualizar una campaña programada que aún no se ha ejecutado"""
+        query = """
+            UPDATE campaigns 
+            SET name = %s, template_id = %s, scheduled_at = %s
+            WHERE id = %s AND status = 'pending'
+        """
+        return self.db.execute_update(query, (name, template_id, scheduled_at, campaign_id)) > 0
+    
     def get_campaign_stats(self) -> List[Dict]:
-        """Obtener estadísticas de campañas"""
+        """Obtener estadísticas de campañas (de los contadores por campaña)"""
         query = """
             SELECT 
                 c.id, c.name, c.created_at, c.total_contacts,
-                COUNT(m.id) as sent_messages,
-                COALESCE(SUM(CASE WHEN m.status = 'delivered' THEN 1 ELSE 0 END), 0) as delivered,
-                COALESCE(SUM(CASE WHEN m.status = 'read' THEN 1 ELSE 0 END), 0) as `read`,
-                COALESCE(SUM(CASE WHEN m.status = 'failed' THEN 1 ELSE 0 END), 0) as failed
+                cc.total as sent_messages,
+                cc.delivered,
+                cc.`read`,
+                cc.failed
             FROM campaigns c
-            LEFT JOIN messages m ON c.id = m.campaign_id
-            GROUP BY c.id, c.name, c.created_at, c.total_contacts
+            LEFT JOIN campaign_counters cc ON cc.campaign_id = c.id
             ORDER BY c.created_at DESC
         """
         results = self.db.execute_query(query)
@@ -256,6 +1245,73 @@ class CampaignModel:
         
         return results
     
+    def get_campaign_counters(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        """Contadores de mensajes por estado de varias campañas {id: contadores}.
+        
+        Es una lectura por clave primaria, sin importar el tamaño de la
+        campaña. Las campañas sin mensajes no aparecen en el resultado.
+        """
+        if not campaign_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(campaign_ids))
+        rows = self.db.execute_query(
+            f"SELECT * FROM campaign_counters WHERE campaign_id IN ({placeholders})",
+            tuple(campaign_ids)
+        )
+        return {row['campaign_id']: row for row in rows}
+    
+    def get_active_campaign_ids(self) -> List[int]:
+        """Ids de las campañas pendientes o en ejecución"""
+        rows = self.db.execute_query(
+            "SELECT id FROM campaigns WHERE status IN ('pending', 'running')"
+        )
+        return [row['id'] for row in rows]
+    
+    def repair_counters(self, campaign_ids: List[int] = None) -> int:
+        """Recalcular los contadores desde messages y corregir los desviados.
+        
+        Los borrados en cascada y los cambios hechos con los triggers
+        deshabilitados no actualizan los contadores. Sin `campaign_ids` se
+        revisan todas las campañas. Devuelve las campañas corregidas.
+        """
+        if campaign_ids is None:
+            campaign_ids = [row['id'] for row in self.db.execute_query("SELECT id FROM campaigns")]
+        
+        columns = ('total',) + self.COUNTER_STATUSES
+        quoted = [f"`{column}`" for column in columns]
+        count_query = "SELECT COUNT(*) AS `total`, " + ', '.join(
+            f"COALESCE(SUM(status <=> '{status}'), 0) AS `{status}`"
+            for status in self.COUNTER_STATUSES
+        ) + " FROM messages WHERE campaign_id = %s"
+        update_query = ("UPDATE campaign_counters SET "
+                        + ', '.join(f"{column} = %s" for column in quoted)
+                        + " WHERE campaign_id = %s")
+        
+        repaired = 0
+        for campaign_id in campaign_ids:
+            with self.db.transaction() as cursor:
+                # Bloquear (o crear) la fila antes de contar: los cambios de
+                # estado concurrentes esperan este bloqueo y se suman después
+                cursor.execute(
+                    "INSERT INTO campaign_counters (campaign_id) VALUES (%s) "
+                    "ON DUPLICATE KEY UPDATE campaign_id = campaign_id", (campaign_id,)
+                )
+                cursor.execute(
+                    f"SELECT {', '.join(quoted)} FROM campaign_counters "
+                    "WHERE campaign_id = %s FOR UPDATE", (campaign_id,)
+                )
+                stored = cursor.fetchone()
+                cursor.execute(count_query, (campaign_id,))
+                actual = cursor.fetchone()
+                
+                values = [int(actual[column]) for column in columns]
+                if [int(stored[column]) for column in columns] != values:
+                    cursor.execute(update_query, (*values, campaign_id))
+                    repaired += 1
+                    logger.warning(f"Contadores de la campaña {campaign_id} corregidos: "
+                                   f"{dict(zip(columns, values))}")
+        return repaired
+    
     def get_scheduled_campaigns(self) -> List[Dict]:
         """Obtener campañas programadas (pendientes con fecha futura)"""
         query = """
@@ -268,9 +1324,12 @@ class CampaignModel:
                 c.created_at,
                 t.id as template_id,
                 t.name as template_name,
+                s.id as segment_id,
+                s.name as segment_name,
                 u.username as created_by_username
             FROM campaigns c
             JOIN templates t ON c.template_id = t.id
+            LEFT JOIN segments s ON c.segment_id = s.id
             LEFT JOIN users u ON c.created_by = u.id
             WHERE c.status = 'pending' 
             AND c.scheduled_at IS NOT NULL
@@ -280,8 +1339,8 @@ class CampaignModel:
         return self.db.execute_query(query)
 
 class MessageModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
     
     def create_messages(self, campaign_id: int, template_id: int, contact_ids: List[int]) -> int:
         """Crear mensajes para una campaña"""
@@ -292,6 +1351,82 @@ class MessageModel:
         data = [(campaign_id, contact_id, template_id) for contact_id in contact_ids]
         return self.db.execute_many(query, data)
     
+    def create_campaign_messages(self, campaign_id: int, template_id: int,
+                                 audience_sql: str = None, audience_params: tuple = (),
+                                 chunk_size: int = None,
+                                 progress_callback: Callable[[int], None] = None) -> int:
+        """Crear los mensajes de una campaña directamente en el servidor.
+        
+        Usa INSERT ... SELECT sobre contacts en tramos de `chunk_size` ids para
+        mantener las transacciones pequeñas, sin traer los contactos a Python.
+        `audience_sql` es una condición opcional sobre el alias `c` de contacts.
+        
+        Cada tramo se confirma por separado y en orden de id de contacto: si
+        uno falla, volver a llamar continúa después del último contacto con
+        mensaje en la campaña. Devuelve el total de mensajes de la campaña.
+        """
+        chunk_size = chunk_size or Config.FANOUT_CHUNK_SIZE
+        audience_clause = f" AND ({audience_sql})" if audience_sql else ""
+        audience_params = tuple(audience_params or ())
+        
+        boundary_query = f"""
+            SELECT c.id
+            FROM contacts c
+            WHERE c.id > %s{audience_clause}
+            ORDER BY c.id ASC
+            LIMIT 1 OFFSET %s
+        """
+        insert_query = f"""
+            INSERT INTO messages (campaign_id, contact_id, template_id)
+            SELECT %s, c.id, %s
+            FROM contacts c
+            WHERE c.id > %s AND c.id <= %s{audience_clause}
+        """
+        last_insert_query = f"""
+            INSERT INTO messages (campaign_id, contact_id, template_id)
+            SELECT %s, c.id, %s
+            FROM contacts c
+            WHERE c.id > %s{audience_clause}
+        """
+        
+        # Reanudar después de los tramos ya confirmados (ninguno la primera vez)
+        existing = self.db.execute_query(
+            "SELECT COUNT(*) AS created, MAX(contact_id) AS last_id FROM messages WHERE campaign_id = %s",
+            (campaign_id,),
+            fetch_one=True
+        )
+        created = (existing or {}).get('created') or 0
+        last_id = (existing or {}).get('last_id') or 0
+        if last_id:
+            logger.info(f"Campaña {campaign_id}: reanudando la creación de mensajes "
+                        f"después del contacto {last_id} ({created} ya creados)")
+        
+        while True:
+            # Último id del tramo actual (None si es el último tramo)
+            boundary = self.db.execute_query(
+                boundary_query,
+                (last_id, *audience_params, chunk_size - 1),
+                fetch_one=True
+            )
+            
+            if boundary:
+                created += self.db.execute_update(
+                    insert_query,
+                    (campaign_id, template_id, last_id, boundary['id'], *audience_params)
+                )
+            else:
+                created += self.db.execute_update(
+                    last_insert_query,
+                    (campaign_id, template_id, last_id, *audience_params)
+                )
+            
+            if progress_callback:
+                progress_callback(created)
+            
+            if not boundary:
+                return created
+            last_id = boundary['id']
+    
     def get_pending_messages(self, limit: int = 10) -> List[Dict]:
         """Obtener mensajes pendientes de envío"""
         query = """
@@ -306,10 +1441,107 @@ class MessageModel:
         """
         return self.db.execute_query(query, (Config.MAX_RETRY_ATTEMPTS, limit))
     
+    def claim_pending_messages(self, worker_id: str, limit: int = 10,
+                               lease_seconds: int = None,
+                               exclude_ids: List[int] = None) -> List[Dict]:
+        """Reservar mensajes pendientes para un worker.
+        
+        Las filas bloqueadas por otro worker se saltan (SKIP LOCKED) y las
+        reservas vencidas vuelven a estar disponibles, de modo que varios
+        schedulers pueden enviar la misma campaña sin duplicados.
+        `exclude_ids` son los mensajes que el worker todavía tiene en memoria:
+        no se vuelven a reservar aunque su reserva haya vencido.
+        """
+        lease_seconds = lease_seconds or Config.MESSAGE_LEASE_SECONDS
+        
+        exclude_condition = ""
+        if exclude_ids:
+            exclude_condition = f"AND id NOT IN ({', '.join(['%s'] * len(exclude_ids))})"
+        
+        with self.db.transaction() as cursor:
+            cursor.execute(f"""
+                SELECT id
+                FROM messages
+                WHERE status = 'pending' AND retry_count < %s
+                AND (claimed_until IS NULL OR claimed_until < NOW())
+                {exclude_condition}
+                ORDER BY id ASC
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (Config.MAX_RETRY_ATTEMPTS, *(exclude_ids or ()), limit))
+            message_ids = [row['id'] for row in cursor.fetchall()]
+            
+            if not message_ids:
+                return []
+            
+            placeholders = ', '.join(['%s'] * len(message_ids))
+            cursor.execute(f"""
+                UPDATE messages
+                SET claimed_by = %s, claimed_until = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({placeholders})
+            """, (worker_id, lease_seconds, *message_ids))
+        
+        query = f"""
+            SELECT m.*, c.phone_number, c.name, c.email, c.company, c.extra_data,
+                    t.content as template_content, t.variables,
+                    t.updated_at as template_updated_at
+            FROM messages m
+            JOIN contacts c ON m.contact_id = c.id
+            JOIN templates t ON m.template_id = t.id
+            WHERE m.id IN ({placeholders}) AND m.claimed_by = %s
+            ORDER BY m.id ASC
+        """
+        return self.db.execute_query(query, (*message_ids, worker_id))
+    
+    def renew_claims(self, worker_id: str, message_ids: List[int],
+                     lease_seconds: int = None, chunk_size: int = 1000) -> int:
+        """Extender la reserva de los mensajes que el worker aún no envía.
+        
+        Solo se renuevan las filas que siguen pendientes y reservadas por
+        este worker; devuelve cuántas se renovaron.
+        """
+        lease_seconds = lease_seconds or Config.MESSAGE_LEASE_SECONDS
+        renewed = 0
+        for start in range(0, len(message_ids), chunk_size):
+            chunk = message_ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            renewed += self.db.execute_update(f"""
+                UPDATE messages
+                SET claimed_until = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({placeholders}) AND claimed_by = %s AND status = 'pending'
+            """, (lease_seconds, *chunk, worker_id))
+        return renewed
+    
+    def release_claims(self, worker_id: str, exclude_ids: List[int] = None) -> int:
+        """Liberar las reservas pendientes de un worker (al detenerse).
+        
+        `exclude_ids` son mensajes que todavía se están enviando: conservan
+        la reserva hasta que se guarde su resultado o venza.
+        """
+        exclude_condition = ""
+        if exclude_ids:
+            exclude_condition = f" AND id NOT IN ({', '.join(['%s'] * len(exclude_ids))})"
+        query = f"""
+            UPDATE messages
+            SET claimed_by = NULL, claimed_until = NULL
+            WHERE claimed_by = %s AND status = 'pending'{exclude_condition}
+        """
+        return self.db.execute_update(query, (worker_id, *(exclude_ids or ())))
+    
+    def reclaim_expired_leases(self) -> int:
+        """Liberar reservas vencidas de workers que dejaron de responder"""
+        query = """
+            UPDATE messages
+            SET claimed_by = NULL, claimed_until = NULL
+            WHERE status = 'pending' AND claimed_until < NOW()
+        """
+        return self.db.execute_update(query)
+    
     def update_message_status(self, message_id: int, status: str, 
                             twilio_sid: str = None, error: str = None) -> bool:
         """Actualizar estado de mensaje"""
-        query = "UPDATE messages SET status = %s"
+        # Cualquier cambio de estado termina la reserva del worker
+        query = "UPDATE messages SET status = %s, claimed_by = NULL, claimed_until = NULL"
         params = [status]
         
         if twilio_sid:
@@ -332,6 +1564,162 @@ class MessageModel:
         
         return self.db.execute_update(query, params) > 0
     
+    def bulk_update_send_results(self, results: List[Dict], chunk_size: int = 500) -> int:
+        """Guardar resultados de envío de varios mensajes con UPDATEs multi-fila.
+        
+        Cada resultado es un dict con message_id, status, twilio_sid, error,
+        sent_at y failures (envíos fallidos acumulados). Todos los tramos se
+        confirman en una sola transacción.
+        """
+        if not results:
+            return 0
+        
+        updated = 0
+        with self.db.transaction() as cursor:
+            for start in range(0, len(results), chunk_size):
+                chunk = results[start:start + chunk_size]
+                rows = ' UNION ALL '.join(
+                    ['SELECT %s AS id, %s AS status, %s AS twilio_sid, '
+                     '%s AS error_message, %s AS sent_at, %s AS failures']
+                    + ['SELECT %s, %s, %s, %s, %s, %s'] * (len(chunk) - 1)
+                )
+                params = []
+                for result in chunk:
+                    params.extend((
+                        result['message_id'],
+                        result['status'],
+                        result.get('twilio_sid'),
+                        result.get('error'),
+                        result.get('sent_at'),
+                        result.get('failures', 0)
+                    ))
+                
+                # Cualquier cambio de estado termina la reserva del worker
+                cursor.execute(f"""
+                    UPDATE messages m
+                    JOIN ({rows}) u ON m.id = u.id
+                    SET m.status = u.status,
+                        m.twilio_sid = COALESCE(u.twilio_sid, m.twilio_sid),
+                        m.error_message = COALESCE(u.error_message, m.error_message),
+                        m.retry_count = m.retry_count + u.failures,
+                        m.sent_at = COALESCE(u.sent_at, m.sent_at),
+                        m.claimed_by = NULL,
+                        m.claimed_until = NULL
+                """, tuple(params))
+                updated += cursor.rowcount
+        
+        return updated
+    
+    def apply_status_events(self, events: List[Dict], chunk_size: int = 500) -> tuple:
+        """Aplicar eventos de estado de Twilio (StatusCallback) por SID.
+        
+        Cada evento es un dict con twilio_sid, status, rank y error. Un evento
+        solo se aplica si avanza el estado del mensaje. Devuelve
+        (mensajes actualizados, SIDs que aún no existen en messages).
+        """
+        if not events:
+            return 0, set()
+        
+        updated = 0
+        unknown = set()
+        with self.db.transaction() as cursor:
+            for start in range(0, len(events), chunk_size):
+                chunk = events[start:start + chunk_size]
+                sids = [event['twilio_sid'] for event in chunk]
+                placeholders = ', '.join(['%s'] * len(sids))
+                
+                cursor.execute(
+                    f"SELECT twilio_sid FROM messages WHERE twilio_sid IN ({placeholders})",
+                    tuple(sids)
+                )
+                known = {row['twilio_sid'] for row in cursor.fetchall()}
+                unknown.update(sid for sid in sids if sid not in known)
+                
+                chunk = [event for event in chunk if event['twilio_sid'] in known]
+                if not chunk:
+                    continue
+                
+                rows = ' UNION ALL '.join(
+                    ['SELECT %s AS twilio_sid, %s AS status, %s AS status_rank, %s AS error_message']
+                    + ['SELECT %s, %s, %s, %s'] * (len(chunk) - 1)
+                )
+                params = []
+                for event in chunk:
+                    params.extend((event['twilio_sid'], event['status'],
+                                   event['rank'], event.get('error')))
+                
+                cursor.execute(f"""
+                    UPDATE messages m
+                    JOIN ({rows}) u ON m.twilio_sid = u.twilio_sid
+                    SET m.status = u.status,
+                        m.error_message = COALESCE(u.error_message, m.error_message),
+                        m.delivered_at = CASE
+                            WHEN u.status IN ('delivered', 'read')
+                            THEN COALESCE(m.delivered_at, NOW()) ELSE m.delivered_at END,
+                        m.read_at = CASE WHEN u.status = 'read' THEN NOW() ELSE m.read_at END
+                    WHERE u.status_rank > CASE m.status
+                        WHEN 'queued' THEN 1
+                        WHEN 'sent' THEN 2
+                        WHEN 'delivered' THEN 3
+                        WHEN 'undelivered' THEN 3
+                        WHEN 'failed' THEN 3
+                        WHEN 'read' THEN 4
+                        ELSE 0 END
+                """, tuple(params))
+                updated += cursor.rowcount
+        
+        return updated, unknown
+    
+    def get_oldest_unsettled_sent_at(self, horizon_hours: int) -> Optional[datetime]:
+        """Hora de envío más antigua de los mensajes aún en 'sent'/'queued'"""
+        query = """
+            SELECT MIN(sent_at) as oldest
+            FROM messages
+            WHERE status IN ('sent', 'queued')
+            AND twilio_sid IS NOT NULL
+            AND sent_at >= NOW() - INTERVAL %s HOUR
+        """
+        result = self.db.execute_query(query, (horizon_hours,), fetch_one=True)
+        return result['oldest'] if result else None
+    
+    def get_unsettled_sids(self, start: datetime, end: datetime) -> Dict[str, str]:
+        """SIDs de mensajes en 'sent'/'queued' enviados en [start, end) -> estado"""
+        query = """
+            SELECT twilio_sid, status
+            FROM messages
+            WHERE status IN ('sent', 'queued')
+            AND sent_at >= %s AND sent_at < %s
+            AND twilio_sid IS NOT NULL
+        """
+        rows = self.db.execute_query(query, (start, end))
+        return {row['twilio_sid']: row['status'] for row in rows}
+    
+    def get_message_history(self, campaign_id: int = None, contact_id: int = None,
+                            limit: int = 100, after: tuple = None) -> List[Dict]:
+        """Historial de mensajes (más recientes primero) de una campaña o un contacto.
+        
+        `after` = (created_at, id) del último mensaje recibido pide la
+        página siguiente.
+        """
+        conditions, params = [], []
+        if campaign_id:
+            conditions.append("m.campaign_id = %s")
+            params.append(campaign_id)
+        if contact_id:
+            conditions.append("m.contact_id = %s")
+            params.append(contact_id)
+        
+        query = """
+            SELECT m.id, m.campaign_id, m.contact_id, m.status, m.twilio_sid,
+                   m.error_message, m.sent_at, m.delivered_at, m.read_at, m.created_at,
+                   c.phone_number, c.name
+            FROM messages m
+            JOIN contacts c ON m.contact_id = c.id
+        """
+        return self.db.execute_page(query, 'm.created_at', after=after, limit=limit,
+                                    conditions=conditions, params=tuple(params),
+                                    id_column='m.id')
+    
     def get_message_stats(self) -> Dict:
         """Obtener estadísticas generales de mensajes"""
         query = """
@@ -364,9 +1752,162 @@ class MessageModel:
             'failed': result.get('failed') or 0
         }
 
+class StatusWriteBuffer:
+    """Buffer de escritura diferida para los resultados de envío.
+    
+    Agrupa los resultados por mensaje (el último gana) y los escribe con
+    MessageModel.bulk_update_send_results cada `batch_size` resultados o
+    cada `flush_interval_ms`, lo que ocurra primero. stop() vacía el buffer;
+    los resultados que lleguen sin el hilo activo se escriben al momento.
+    `on_flushed` recibe los ids de mensaje de cada escritura exitosa.
+    """
+    
+    def __init__(self, message_model: 'MessageModel', batch_size: int = None,
+                 flush_interval_ms: int = None,
+                 on_flushed: Callable[[List[int]], None] = None):
+        self.message_model = message_model
+        self.on_flushed = on_flushed
+        self.batch_size = max(1, batch_size or Config.STATUS_FLUSH_BATCH_SIZE)
+        self.flush_interval = (flush_interval_ms or Config.STATUS_FLUSH_INTERVAL_MS) / 1000.0
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.flushed = 0
+        self.flushes = 0
+    
+    def start(self):
+        """Iniciar el hilo de escritura periódica"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+        self._thread.start()
+    
+    def add(self, message_id: int, status: str, twilio_sid: str = None, error: str = None):
+        """Registrar el resultado de envío de un mensaje"""
+        with self._condition:
+            previous = self._pending.get(message_id)
+            failures = (previous['failures'] if previous else 0) + (1 if error else 0)
+            self._pending[message_id] = {
+                'message_id': message_id,
+                'status': status,
+                'twilio_sid': twilio_sid or (previous and previous['twilio_sid']),
+                'error': error or (previous and previous['error']),
+                'sent_at': datetime.now() if status == 'sent' else None,
+                'failures': failures
+            }
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+            running = self._running
+        
+        if not running:
+            # Resultado que llega después de stop(): escribirlo ya
+            self.flush()
+    
+    def flush(self) -> int:
+        """Escribir todos los resultados pendientes; devuelve las filas actualizadas"""
+        with self._flush_lock:
+            with self._condition:
+                results = list(self._pending.values())
+                self._pending = {}
+            
+            if not results:
+                return 0
+            
+            try:
+                updated = self.message_model.bulk_update_send_results(results)
+            except Exception as e:
+                logger.error(f"Error guardando {len(results)} resultados de envío: {e}")
+                self._requeue(results)
+                return 0
+            
+            self.flushed += len(results)
+            self.flushes += 1
+            logger.debug(f"Guardados {len(results)} resultados de envío")
+            if self.on_flushed:
+                try:
+                    self.on_flushed([result['message_id'] for result in results])
+                except Exception as e:
+                    logger.error(f"Error notificando resultados guardados: {e}")
+            return updated
+    
+    def _requeue(self, results: List[Dict]):
+        """Devolver resultados no guardados al buffer sin pisar otros más nuevos"""
+        with self._condition:
+            for result in results:
+                newer = self._pending.get(result['message_id'])
+                if newer:
+                    newer['failures'] += result['failures']
+                    newer['twilio_sid'] = newer['twilio_sid'] or result['twilio_sid']
+                else:
+                    self._pending[result['message_id']] = result
+    
+    def _run(self):
+        """Hilo de escritura: vaciar por tamaño o por tiempo"""
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                if len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if not self._running:
+                    return
+            self.flush()
+    
+    def stop(self):
+        """Detener el hilo y escribir lo pendiente"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+    
+    def get_stats(self) -> Dict:
+        """Estadísticas del buffer"""
+        with self._condition:
+            pending = len(self._pending)
+        return {'pending': pending, 'flushed': self.flushed, 'flushes': self.flushes}
+
+class CheckpointModel:
+    """Puntos de control de tareas largas que deben poder reanudarse"""
+    
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
+    
+    def get_checkpoint(self, name: str) -> Optional[Dict]:
+        """Obtener el punto de control de una tarea"""
+        query = "SELECT * FROM sync_checkpoints WHERE name = %s"
+        checkpoint = self.db.execute_query(query, (name,), fetch_one=True)
+        if checkpoint and isinstance(checkpoint.get('details'), str):
+            checkpoint['details'] = json.loads(checkpoint['details'])
+        return checkpoint
+    
+    def save_checkpoint(self, name: str, position: datetime, details: Dict = None) -> bool:
+        """Guardar hasta dónde avanzó una tarea"""
+        query = """
+            INSERT INTO sync_checkpoints (name, position, details)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                position = VALUES(position),
+                details = VALUES(details),
+                updated_at = NOW()
+        """
+        details = json.dumps(details) if details is not None else None
+        return self.db.execute_update(query, (name, position, details)) > 0
+    
+    def clear_checkpoint(self, name: str) -> bool:
+        """Eliminar el punto de control (la siguiente pasada empieza de cero)"""
+        query = "DELETE FROM sync_checkpoints WHERE name = %s"
+        return self.db.execute_update(query, (name,)) > 0
+
 class ActivityLogModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
     
     def log_activity(self, user_id: int, action: str, details: str = None, 
                     ip_address: str = None) -> int:
@@ -381,23 +1922,24 @@ class ActivityLogModel:
         """
         return self.db.execute_insert(query, (user_id, action, json_details, ip_address))
     
-    def get_recent_activities(self, user_id: int = None, limit: int = 100) -> List[Dict]:
-        """Obtener actividades recientes"""
-        query = "SELECT * FROM activity_logs"
-        params = []
+    def get_recent_activities(self, user_id: int = None, limit: int = 100,
+                              after: tuple = None) -> List[Dict]:
+        """Obtener actividades recientes.
         
+        `after` = (created_at, id) de la última actividad recibida pide la
+        página siguiente.
+        """
+        conditions, params = [], ()
         if user_id:
-            query += " WHERE user_id = %s"
-            params.append(user_id)
+            conditions, params = ["user_id = %s"], (user_id,)
         
-        query += " ORDER BY created_at DESC LIMIT %s"
-        params.append(limit)
-        
-        return self.db.execute_query(query, params)
+        return self.db.execute_page("SELECT * FROM activity_logs", 'created_at',
+                                    after=after, limit=limit,
+                                    conditions=conditions, params=params)
 
 class AttachmentModel:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
     
     def create_attachment(self, template_id: int, file_name: str, file_path: str, 
                             file_type: str, file_size: int, mime_type: str = None, 
@@ -422,6 +1964,22 @@ class AttachmentModel:
         """
         return self.db.execute_query(query, (template_id,))
     
+    def get_attachments_for_templates(self, template_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Obtener los adjuntos de varias plantillas en una sola consulta"""
+        attachments = {template_id: [] for template_id in template_ids}
+        if not attachments:
+            return attachments
+        
+        placeholders = ', '.join(['%s'] * len(attachments))
+        query = f"""
+            SELECT * FROM attachments 
+            WHERE template_id IN ({placeholders})
+            ORDER BY template_id ASC, created_at ASC, id ASC
+        """
+        for attachment in self.db.execute_query(query, tuple(attachments)):
+            attachments[attachment['template_id']].append(attachment)
+        return attachments
+    
     def delete_attachment(self, attachment_id: int) -> bool:
         """Eliminar adjunto"""
         # Primero obtener info del archivo para borrarlo físicamente
@@ -28,9 +28,22 @@ CREATE TABLE IF NOT EXISTS contacts (
     UNIQUE KEY unique_phone (phone_number),
     INDEX idx_phone (phone_number),
     INDEX idx_name (name),
+    INDEX idx_email (email),
+    INDEX idx_company (company),
+    INDEX idx_created (created_at, id),
+    FULLTEXT INDEX ft_contact_search (name, email, company),
     FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Claves de extra_data indexadas con columnas generadas (xd_<clave>).
+CREATE TABLE IF NOT EXISTS contact_extra_indexes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    json_key VARCHAR(48) NOT NULL,
+    column_name VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_json_key (json_key)
+) ENGINE=InnoDB;
+
 -- Tabla de plantillas.
 CREATE TABLE IF NOT EXISTS templates (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -58,11 +71,25 @@ CREATE TABLE IF NOT EXISTS attachments (
     INDEX idx_template (template_id)
 ) ENGINE=InnoDB;
 
+-- Tabla de segmentos de audiencia.
+CREATE TABLE IF NOT EXISTS segments (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    filters JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    created_by INT,
+    is_active BOOLEAN DEFAULT TRUE,
+    INDEX idx_name (name),
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+) ENGINE=InnoDB;
+
 -- Tabla de campañas.
 CREATE TABLE IF NOT EXISTS campaigns (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     template_id INT NOT NULL,
+    segment_id INT NULL,
     scheduled_at TIMESTAMP NULL,
     executed_at TIMESTAMP NULL,
     status ENUM('pending', 'running', 'completed', 'cancelled') DEFAULT 'pending',
@@ -70,6 +97,7 @@ CREATE TABLE IF NOT EXISTS campaigns (
     created_by INT,
     total_contacts INT DEFAULT 0,
     FOREIGN KEY (template_id) REFERENCES templates(id),
+    FOREIGN KEY (segment_id) REFERENCES segments(id) ON DELETE SET NULL,
     FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL,
     INDEX idx_status (status),
     INDEX idx_scheduled (scheduled_at)
@@ -85,6 +113,8 @@ CREATE TABLE IF NOT EXISTS messages (
     status ENUM('pending', 'queued', 'sent', 'delivered', 'read', 'failed', 'undelivered') DEFAULT 'pending',
     error_message TEXT,
     retry_count INT DEFAULT 0,
+    claimed_by VARCHAR(64) NULL,
+    claimed_until TIMESTAMP NULL,
     sent_at TIMESTAMP NULL,
     delivered_at TIMESTAMP NULL,
     read_at TIMESTAMP NULL,
@@ -93,12 +123,23 @@ CREATE TABLE IF NOT EXISTS messages (
     FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE CASCADE,
     FOREIGN KEY (contact_id) REFERENCES contacts(id) ON DELETE CASCADE,
     FOREIGN KEY (template_id) REFERENCES templates(id),
-    INDEX idx_campaign (campaign_id),
-    INDEX idx_contact (contact_id),
+    INDEX idx_campaign_created (campaign_id, created_at, id),
+    INDEX idx_contact_created (contact_id, created_at, id),
     INDEX idx_status (status),
+    INDEX idx_status_claim (status, claimed_until),
+    INDEX idx_claimed_by (claimed_by),
+    INDEX idx_status_sent (status, sent_at),
     INDEX idx_twilio_sid (twilio_sid)
 ) ENGINE=InnoDB;
 
+-- Puntos de control de tareas reanudables.
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    name VARCHAR(50) PRIMARY KEY,
+    position TIMESTAMP NULL,
+    details JSON,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
 -- Tabla de logs.
 CREATE TABLE IF NOT EXISTS activity_logs (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -108,11 +149,92 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     ip_address VARCHAR(45),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
-    INDEX idx_user (user_id),
+    INDEX idx_user_created (user_id, created_at, id),
     INDEX idx_action (action),
-    INDEX idx_created (created_at)
+    INDEX idx_created (created_at, id)
+) ENGINE=InnoDB;
+
+-- Contadores de mensajes por campaña (mantenidos por los triggers de messages).
+CREATE TABLE IF NOT EXISTS campaign_counters (
+    campaign_id INT PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    queued INT NOT NULL DEFAULT 0,
+    sent INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    `read` INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    undelivered INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
+DROP TRIGGER IF EXISTS trg_messages_counters_insert;
+DROP TRIGGER IF EXISTS trg_messages_counters_update;
+DROP TRIGGER IF EXISTS trg_messages_counters_delete;
+
+DELIMITER //
+
+CREATE TRIGGER trg_messages_counters_insert AFTER INSERT ON messages
+FOR EACH ROW
+BEGIN
+    INSERT INTO campaign_counters (campaign_id, total, pending, queued, sent, delivered, `read`, failed, undelivered)
+    VALUES (
+        NEW.campaign_id,
+        1,
+        NEW.status <=> 'pending',
+        NEW.status <=> 'queued',
+        NEW.status <=> 'sent',
+        NEW.status <=> 'delivered',
+        NEW.status <=> 'read',
+        NEW.status <=> 'failed',
+        NEW.status <=> 'undelivered'
+    )
+    ON DUPLICATE KEY UPDATE
+        total = total + 1,
+        pending = pending + (NEW.status <=> 'pending'),
+        queued = queued + (NEW.status <=> 'queued'),
+        sent = sent + (NEW.status <=> 'sent'),
+        delivered = delivered + (NEW.status <=> 'delivered'),
+        `read` = `read` + (NEW.status <=> 'read'),
+        failed = failed + (NEW.status <=> 'failed'),
+        undelivered = undelivered + (NEW.status <=> 'undelivered');
+END//
+
+CREATE TRIGGER trg_messages_counters_update AFTER UPDATE ON messages
+FOR EACH ROW
+BEGIN
+    -- Las reservas y reintentos no cambian el estado: no tocan los contadores
+    IF NOT (OLD.status <=> NEW.status) THEN
+        UPDATE campaign_counters
+        SET pending = pending - (OLD.status <=> 'pending') + (NEW.status <=> 'pending'),
+            queued = queued - (OLD.status <=> 'queued') + (NEW.status <=> 'queued'),
+            sent = sent - (OLD.status <=> 'sent') + (NEW.status <=> 'sent'),
+            delivered = delivered - (OLD.status <=> 'delivered') + (NEW.status <=> 'delivered'),
+            `read` = `read` - (OLD.status <=> 'read') + (NEW.status <=> 'read'),
+            failed = failed - (OLD.status <=> 'failed') + (NEW.status <=> 'failed'),
+            undelivered = undelivered - (OLD.status <=> 'undelivered') + (NEW.status <=> 'undelivered')
+        WHERE campaign_id = NEW.campaign_id;
+    END IF;
+END//
+
+CREATE TRIGGER trg_messages_counters_delete AFTER DELETE ON messages
+FOR EACH ROW
+BEGIN
+    UPDATE campaign_counters
+    SET total = total - 1,
+        pending = pending - (OLD.status <=> 'pending'),
+        queued = queued - (OLD.status <=> 'queued'),
+        sent = sent - (OLD.status <=> 'sent'),
+        delivered = delivered - (OLD.status <=> 'delivered'),
+        `read` = `read` - (OLD.status <=> 'read'),
+        failed = failed - (OLD.status <=> 'failed'),
+        undelivered = undelivered - (OLD.status <=> 'undelivered')
+    WHERE campaign_id = OLD.campaign_id;
+END//
+
+DELIMITER ;
+
 -- Tabla de configuración.
 CREATE TABLE IF NOT EXISTS config (
     id INT AUTO_INCREMENT PRIMARY KEY,
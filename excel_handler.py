@@ -1,17 +1,19 @@
 import pandas as pd
 import openpyxl
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator
+import os
 import re
+import csv
+import json
 from config import Config
-from twilio_service import TwilioService
+import phone_numbers
 
 logger = logging.getLogger(__name__)
 
 class ExcelHandler:
     def __init__(self):
-        self.twilio_service = TwilioService()
-        self.supported_extensions = ['.xlsx', '.xls']
+        self.supported_extensions = ['.xlsx', '.xls', '.csv']
     
     def read_excel_file(self, file_path: str) -> Tuple[pd.DataFrame, List[str]]:
         """Leer archivo Excel y devolver DataFrame con headers"""
@@ -29,6 +31,127 @@ class ExcelHandler:
             logger.error(f"Error leyendo archivo Excel: {e}")
             raise Exception(f"Error leyendo archivo Excel: {str(e)}")
     
+    def read_preview(self, file_path: str, num_rows: int = None) -> Tuple[pd.DataFrame, List[str]]:
+        """Leer solo las primeras filas del archivo (vista previa y detección de columnas)"""
+        num_rows = num_rows or Config.IMPORT_PREVIEW_ROWS
+        try:
+            chunks = self.iter_chunks(file_path, num_rows)
+            try:
+                df = next(chunks, None)
+            finally:
+                chunks.close()
+            
+            if df is None:
+                df = pd.DataFrame()
+            columns = [f"Columna {i+1}" for i in range(len(df.columns))]
+            
+            logger.info(f"Vista previa leída: {len(df)} filas, {len(df.columns)} columnas")
+            return df, columns
+            
+        except Exception as e:
+            logger.error(f"Error leyendo archivo: {e}")
+            raise Exception(f"Error leyendo archivo: {str(e)}")
+    
+    def iter_chunks(self, file_path: str, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        """Leer el archivo por bloques de filas con memoria acotada.
+        
+        El índice de cada bloque es el número de fila en el archivo (desde 0),
+        para que los errores indiquen la fila real.
+        """
+        chunk_size = max(1, chunk_size or Config.IMPORT_CHUNK_SIZE)
+        extension = os.path.splitext(file_path)[1].lower()
+        
+        if extension == '.csv':
+            yield from self._iter_csv_chunks(file_path, chunk_size)
+        elif extension == '.xlsx':
+            yield from self._iter_xlsx_chunks(file_path, chunk_size)
+        else:
+            # .xls no se puede leer en flujo (como máximo tiene 65,536 filas)
+            df = pd.read_excel(file_path, header=None)
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start:start + chunk_size]
+    
+    def _iter_xlsx_chunks(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Bloques de un .xlsx leído en modo read_only (fila por fila).
+        
+        Las columnas quedan como object: con un tipo inferido, una celda vacía
+        en una columna de teléfonos numéricos la volvería float ('502...0').
+        """
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows, index = [], []
+            for row_number, values in enumerate(wb.active.iter_rows(values_only=True)):
+                # Omitir filas vacías
+                if all(value is None for value in values):
+                    continue
+                rows.append(values)
+                index.append(row_number)
+                if len(rows) >= chunk_size:
+                    yield pd.DataFrame(rows, index=index, dtype=object)
+                    rows, index = [], []
+            
+            if rows:
+                yield pd.DataFrame(rows, index=index, dtype=object)
+        finally:
+            wb.close()
+    
+    def _iter_csv_chunks(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Bloques de un CSV (todas las celdas como texto para conservar los números)"""
+        reader = pd.read_csv(
+            file_path,
+            header=None,
+            dtype=str,
+            sep=self._detect_csv_delimiter(file_path),
+            encoding='utf-8-sig',
+            encoding_errors='replace',
+            chunksize=chunk_size
+        )
+        with reader:
+            yield from reader
+    
+    def _detect_csv_delimiter(self, file_path: str) -> str:
+        """Detectar el separador del CSV (coma, punto y coma, tabulador o barra)"""
+        with open(file_path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+            sample = f.read(64 * 1024)
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+        except csv.Error:
+            return ','
+    
+    def count_rows(self, file_path: str) -> Optional[int]:
+        """Número de filas del archivo para mostrar el progreso (None si no se conoce)"""
+        extension = os.path.splitext(file_path)[1].lower()
+        try:
+            if extension == '.csv':
+                lines = 0
+                last = b''
+                with open(file_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        lines += block.count(b'\n')
+                        last = block
+                return lines + (1 if last and not last.endswith(b'\n') else 0)
+            
+            if extension == '.xlsx':
+                wb = openpyxl.load_workbook(file_path, read_only=True)
+                try:
+                    return wb.active.max_row
+                finally:
+                    wb.close()
+        except Exception as e:
+            logger.warning(f"No se pudo contar las filas de {file_path}: {e}")
+        return None
+    
+    def iter_contacts(self, file_path: str, phone_column_index: int,
+                      column_mapping: Dict[str, int],
+                      chunk_size: int = None) -> Iterator[Tuple[List[Dict], List[str], int]]:
+        """Leer, validar y normalizar los contactos del archivo por bloques.
+        
+        Genera (contactos, errores, filas leídas) por cada bloque.
+        """
+        for chunk in self.iter_chunks(file_path, chunk_size):
+            contacts, errors = self.extract_contacts(chunk, phone_column_index, column_mapping)
+            yield contacts, errors, len(chunk)
+    
     def preview_data(self, df: pd.DataFrame, num_rows: int = 5) -> List[List]:
         """Obtener vista previa de los datos"""
         preview_data = []
@@ -39,71 +162,82 @@ class ExcelHandler:
         return preview_data
     
     def extract_contacts(self, df: pd.DataFrame, phone_column_index: int,
-                        column_mapping: Dict[str, int]) -> List[Dict]:
-        """Extraer contactos del DataFrame"""
-        contacts = []
+                        column_mapping: Dict[str, int]) -> Tuple[List[Dict], List[str]]:
+        """Extraer contactos del DataFrame.
+        
+        Procesa por columnas completas (limpieza de teléfonos, campos mapeados
+        y datos adicionales) en lugar de fila por fila. Devuelve
+        (contactos, errores), con un error por fila sin teléfono válido.
+        """
         errors = []
+        if df.empty:
+            return [], errors
         
-        for idx, row in df.iterrows():
-            try:
-                # Obtener número de teléfono
-                phone_raw = str(row.iloc[phone_column_index])
-                
-                # Validar y formatear número
-                validation_result = self.twilio_service.validate_phone_number(phone_raw)
-                
-                if not validation_result['valid']:
-                    errors.append(f"Fila {idx + 1}: {validation_result['error']} - {phone_raw}")
-                    continue
-                
-                # Crear diccionario de contacto
-                contact = {
-                    'phone_number': validation_result['formatted']
-                }
-                
-                # Agregar campos mapeados
-                for field_name, col_index in column_mapping.items():
-                    if col_index >= 0 and col_index < len(row):
-                        value = row.iloc[col_index]
-                        # Convertir NaN a None
-                        if pd.isna(value):
-                            contact[field_name] = None
-                        else:
-                            contact[field_name] = str(value).strip()
-                
-                # Agregar datos adicionales como JSON
-                extra_data = {}
-                for i, value in enumerate(row):
-                    if i != phone_column_index and i not in column_mapping.values():
-                        if not pd.isna(value):
-                            extra_data[f"columna_{i+1}"] = str(value).strip()
-                
-                if extra_data:
-                    contact['extra_data'] = pd.Series(extra_data).to_json()
-                
-                contacts.append(contact)
-                
-            except Exception as e:
-                errors.append(f"Fila {idx + 1}: Error procesando - {str(e)}")
+        # Validar y formatear todos los números en un solo lote
+        phone_raw = df.iloc[:, phone_column_index].map(str).tolist()
+        formatted, phone_errors = phone_numbers.normalize_batch(phone_raw)
+        valid = [phone is not None for phone in formatted]
+        
+        for row_label, raw, error in zip(df.index, phone_raw, phone_errors):
+            if error is not None:
+                errors.append(f"Fila {row_label + 1}: {error} - {raw}")
+        
+        rows = df[valid]
+        columns = []
+        
+        # Campos mapeados, columna por columna
+        mapped_indexes = set(column_mapping.values())
+        for field_name, col_index in column_mapping.items():
+            if 0 <= col_index < len(df.columns):
+                columns.append((field_name, self._column_values(rows.iloc[:, col_index])))
+        
+        # Datos adicionales: el resto de columnas con valor, como JSON
+        extra_columns = [
+            (f"columna_{i+1}", self._column_values(rows.iloc[:, i]))
+            for i in range(len(df.columns))
+            if i != phone_column_index and i not in mapped_indexes
+        ]
+        if extra_columns:
+            keys = [key for key, _ in extra_columns]
+            extra_json = []
+            for values in zip(*(values for _, values in extra_columns)):
+                extra_data = {key: value for key, value in zip(keys, values) if value is not None}
+                extra_json.append(json.dumps(extra_data) if extra_data else None)
+            columns.append(('extra_data', extra_json))
+        
+        # Armar los contactos a partir de las columnas ya procesadas
+        contacts = [{'phone_number': phone} for phone in formatted if phone is not None]
+        for field_name, values in columns:
+            for contact, value in zip(contacts, values):
+                if field_name != 'extra_data' or value is not None:
+                    contact[field_name] = value
         
         logger.info(f"Contactos extraídos: {len(contacts)} válidos, {len(errors)} errores")
         
         return contacts, errors
     
-    def standardize_phone_numbers(self, phone_numbers: List[str]) -> List[Dict]:
+    def _column_values(self, column: pd.Series) -> List[Optional[str]]:
+        """Valores de una columna como texto sin espacios (None para vacíos)"""
+        if column.empty:
+            return []
+        # Convertir a object antes de map: una columna numérica sin filas
+        # válidas seguiría siendo float y no admitiría .str
+        text = column.astype(object).map(str).str.strip().astype(object)
+        return text.where(column.notna(), None).tolist()
+    
+    def standardize_phone_numbers(self, phone_numbers_list: List[str]) -> List[Dict]:
         """Estandarizar lista de números de teléfono"""
-        results = []
+        formatted, errors = phone_numbers.normalize_batch(phone_numbers_list)
         
-        for phone in phone_numbers:
-            validation = self.twilio_service.validate_phone_number(phone)
-            results.append({
+        return [
+            {
                 'original': phone,
-                'formatted': validation.get('formatted', ''),
-                'valid': validation['valid'],
-                'error': validation.get('error', '')
-            })
-        
-        return results
+                'formatted': formatted_phone or '',
+                'valid': formatted_phone is not None,
+                'error': error or ''
+            }
+            for phone, formatted_phone, error in zip(phone_numbers_list, formatted, errors)
+        ]
     
     def get_column_statistics(self, df: pd.DataFrame) -> List[Dict]:
         """Obtener estadísticas de cada columna"""
@@ -139,13 +273,29 @@ class ExcelHandler:
         return stats
     
     def validate_excel_file(self, file_path: str) -> Dict:
-        """Validar archivo Excel antes de procesarlo"""
+        """Validar archivo Excel o CSV antes de procesarlo"""
         try:
             # Verificar extensión
             if not any(file_path.lower().endswith(ext) for ext in self.supported_extensions):
                 return {
                     'valid': False,
-                    'error': 'Formato de archivo no soportado. Use .xlsx o .xls'
+                    'error': 'Formato de archivo no soportado. Use .xlsx, .xls o .csv'
+                }
+            
+            if file_path.lower().endswith('.csv'):
+                if os.path.getsize(file_path) == 0:
+                    return {
+                        'valid': False,
+                        'error': 'El archivo está vacío'
+                    }
+                
+                with open(file_path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+                    first_row = next(csv.reader(f, delimiter=self._detect_csv_delimiter(file_path)), [])
+                
+                return {
+                    'valid': True,
+                    'rows': self.count_rows(file_path),
+                    'columns': len(first_row)
                 }
             
             # Intentar abrir el archivo
@@ -160,16 +310,9 @@ class ExcelHandler:
                     'error': 'El archivo está vacío'
                 }
             
-            # Verificar tamaño
-            if sheet.max_row > 10000:
-                wb.close()
-                return {
-                    'valid': False,
-                    'error': 'El archivo excede el límite de 10,000 filas'
-                }
-            
             wb.close()
             
+            # Sin límite de filas: la importación se hace por bloques
             return {
                 'valid': True,
                 'rows': sheet.max_row,
@@ -224,3 +367,43 @@ class ExcelHandler:
         except Exception as e:
             logger.error(f"Error exportando contactos: {e}")
             return False
+    
+    def export_contact_chunks(self, chunks: Iterator[List[Dict]], output_path: str) -> int:
+        """Exportar contactos por bloques a Excel (.xlsx) o CSV.
+        
+        Los bloques se escriben a medida que llegan (openpyxl en modo
+        write_only), sin juntar todos los contactos en memoria. Devuelve las
+        filas escritas; los errores se propagan al llamador.
+        """
+        columns_order = ['phone_number', 'name', 'email', 'company']
+        is_csv = os.path.splitext(output_path)[1].lower() == '.csv'
+        columns = None
+        written = 0
+        
+        if is_csv:
+            output = open(output_path, 'w', newline='', encoding='utf-8-sig')
+            writer = csv.writer(output)
+            append = writer.writerow
+        else:
+            output = openpyxl.Workbook(write_only=True)
+            sheet = output.create_sheet('Contactos')
+            append = sheet.append
+        
+        try:
+            for contacts in chunks:
+                for contact in contacts:
+                    if columns is None:
+                        columns = columns_order + [col for col in contact if col not in columns_order]
+                        append(columns)
+                    append([contact.get(col) for col in columns])
+                    written += 1
+            if columns is None:
+                append(columns_order)
+        finally:
+            if is_csv:
+                output.close()
+            else:
+                output.save(output_path)
+        
+        logger.info(f"{written} contactos exportados a: {output_path}")
+        return written
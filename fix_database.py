@@ -58,6 +58,15 @@ try:
     cursor.close()
     conn.close()
     
+    # 5. Recalcular los contadores de mensajes de las campañas
+    print("\n5. Recalculando contadores de campañas...")
+    try:
+        from database import CampaignModel
+        repaired = CampaignModel().repair_counters()
+        print(f"   ✓ Corregidos los contadores de {repaired} campañas")
+    except mysql.connector.Error as e:
+        print(f"   ! Error recalculando contadores (¿falta migrations/006_campaign_counters.sql?): {e}")
+    
     print("\n✅ Base de datos arreglada")
     print("\nAhora puedes ejecutar: python main.py")
     
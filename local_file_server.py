@@ -11,6 +11,7 @@ import os
 import threading
 import logging
 from config import Config
+from status_callbacks import STATUS_CALLBACK_PATH, validate_signature
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class LocalFileServer:
         self.port = port
         self.server_thread = None
         self.is_running = False
+        self.status_callback_handler = None
         
         # Intentar detectar ngrok automáticamente
         self.base_url = self._get_base_url(port)
@@ -93,6 +95,28 @@ class LocalFileServer:
                 logger.error(f"Error sirviendo archivo: {e}", exc_info=True)
                 return f"Error interno: {str(e)}", 500
         
+        @self.app.route(STATUS_CALLBACK_PATH, methods=['POST'])
+        def status_callback():
+            """Recibir StatusCallback de Twilio (cambios de estado de mensajes)"""
+            if not self.status_callback_handler:
+                return {'error': 'Status callbacks no habilitados'}, 503
+            
+            params = request.form.to_dict()
+            
+            if Config.TWILIO_VALIDATE_SIGNATURES:
+                # Twilio firma la URL pública (ngrok), no la local
+                url = self.base_url + request.full_path.rstrip('?')
+                signature = request.headers.get('X-Twilio-Signature', '')
+                if not validate_signature(url, params, signature):
+                    logger.warning(f"StatusCallback con firma inválida desde {request.remote_addr}")
+                    return {'error': 'Invalid signature'}, 403
+            
+            if not self.status_callback_handler(params):
+                logger.debug(f"StatusCallback ignorado: {params.get('MessageStatus')}")
+            
+            # Responder rápido: el evento se aplica en segundo plano
+            return '', 204
+        
         @self.app.route('/health')
         def health_check():
             """Verificar que el servidor está funcionando"""
@@ -175,6 +199,16 @@ class LocalFileServer:
             self.is_running = False
             logger.info("Servidor detenido")
     
+    def set_status_callback_handler(self, handler):
+        """Registrar la función que recibe los StatusCallback (params -> bool)"""
+        self.status_callback_handler = handler
+    
+    def get_status_callback_url(self) -> str:
+        """URL pública del endpoint de StatusCallback (None si solo hay localhost)"""
+        if "localhost" in self.base_url:
+            return None
+        return f"{self.base_url}{STATUS_CALLBACK_PATH}"
+    
     def get_file_url(self, file_path: str) -> str:
         """Obtener URL pública para un archivo"""
         # Obtener ruta relativa desde upload_folder
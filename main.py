@@ -9,7 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from logger import setup_logger
-from database import DatabaseManager
+from database import get_database
 from ui.login_window import LoginWindow
 from main_window import MainWindow
 from apply_cursors import setup_global_cursors
@@ -52,7 +52,7 @@ class WhatsAppManagerApp:
             logger.info(f"Iniciando {Config.APP_NAME} v{Config.APP_VERSION}")
             
             # Verificar conexión a base de datos
-            db = DatabaseManager()
+            db = get_database()
             if not db.test_connection():
                 QMessageBox.critical(
                     None,
@@ -10,6 +10,7 @@ import logging
 from auth import auth_manager
 from logger import ActivityLogger
 from message_scheduler import MessageScheduler
+from database import ContactModel, MessageModel, get_database
 from config import Config
 from themes import theme_manager
 
@@ -29,7 +30,10 @@ class MainWindow(QMainWindow):
     
     def __init__(self):
         super().__init__()
-        self.scheduler = MessageScheduler()
+        self.db = get_database()
+        self.scheduler = MessageScheduler(self.db)
+        self.contact_model = ContactModel(self.db)
+        self.message_model = MessageModel(self.db)
         self.activity_logger = None
         self.file_server = None
         self.init_ui()
@@ -41,6 +45,12 @@ class MainWindow(QMainWindow):
             self.file_server = file_server
             self.file_server.start()
             logger.info("Servidor local de archivos iniciado correctamente")
+            
+            # Recibir los cambios de estado de Twilio en el mismo servidor
+            self.file_server.set_status_callback_handler(self.scheduler.status_callbacks.submit)
+            if not self.scheduler.twilio_service.status_callback_url:
+                self.scheduler.twilio_service.status_callback_url = \
+                    self.file_server.get_status_callback_url()
         except Exception as e:
             logger.error(f"Error iniciando servidor de archivos: {e}")
             QMessageBox.warning(
@@ -310,12 +320,8 @@ class MainWindow(QMainWindow):
         """Actualizar barra de estado"""
         try:
             # Obtener estadísticas
-            from database import ContactModel, MessageModel
-            contact_model = ContactModel()
-            message_model = MessageModel()
-            
-            contacts_count = contact_model.get_contact_count()
-            stats = message_model.get_message_stats()
+            contacts_count = self.contact_model.get_contact_count()
+            stats = self.message_model.get_message_stats()
             
             status_text = (
                 f"📞 Contactos: {contacts_count} | "
@@ -393,6 +399,7 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             # Detener scheduler
             self.scheduler.stop()
+            logger.info(f"Métricas de base de datos: {self.db.get_metrics(top=5)}")
             
             # Detener servidor de archivos si existe
             if self.file_server:
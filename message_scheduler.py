@@ -1,29 +1,65 @@
 # Actualización de message_scheduler.py para soportar archivos adjuntos
 
-import schedule
+import heapq
+import itertools
 import threading
 import time
 import logging
+import os
+import socket
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Callable, List
-from database import CampaignModel, MessageModel, ContactModel, AttachmentModel
+from database import (CampaignModel, MessageModel, ContactModel, AttachmentModel,
+                      SegmentModel, CheckpointModel, StatusWriteBuffer, DatabaseManager,
+                      get_database)
 from twilio_service import TwilioService, MessageQueue
+from status_callbacks import StatusCallbackProcessor
+from status_reconciler import StatusReconciler
 from config import Config
 import json
 
 logger = logging.getLogger(__name__)
 
+
+class FanoutInterrupted(Exception):
+    """La creación de mensajes de una campaña se detuvo con el scheduler"""
+
+
 class MessageScheduler:
-    def __init__(self):
-        self.campaign_model = CampaignModel()
-        self.message_model = MessageModel()
-        self.contact_model = ContactModel()
-        self.attachment_model = AttachmentModel()
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or get_database()
+        self.campaign_model = CampaignModel(self.db)
+        self.message_model = MessageModel(self.db)
+        self.contact_model = ContactModel(self.db)
+        self.attachment_model = AttachmentModel(self.db)
+        self.segment_model = SegmentModel(self.db)
         self.twilio_service = TwilioService()
         self.message_queue = MessageQueue(self.twilio_service)
+        # Las reservas terminan cuando el resultado queda guardado
+        self.status_buffer = StatusWriteBuffer(self.message_model,
+                                               on_flushed=self._forget_claims)
+        self.status_callbacks = StatusCallbackProcessor(self.message_model)
+        self.status_reconciler = StatusReconciler(
+            self.twilio_service, self.message_model, CheckpointModel(self.db)
+        )
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # Mensajes reservados que siguen en la cola de envío o en vuelo
+        self._claimed_ids = set()
+        self._claimed_lock = threading.Lock()
+        # Hilos creando los mensajes de campañas (id de campaña -> hilo)
+        self._fanouts = {}
+        self._fanouts_lock = threading.Lock()
         self.running = False
         self.thread = None
         self.callbacks = {}
+        
+        # Tareas programadas: heap de (hora, secuencia, nombre) y la última
+        # secuencia vigente por nombre (las entradas reemplazadas se descartan)
+        self._timers = []
+        self._timer_jobs = {}
+        self._timer_sequence = itertools.count()
+        self._wakeup = threading.Condition()
     
     def start(self):
         """Iniciar el programador"""
@@ -32,49 +68,183 @@ class MessageScheduler:
             return
         
         self.running = True
+        self.status_buffer.start()
+        self.status_callbacks.start()
+        self.message_queue.start_processing()
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         logger.info("Programador de mensajes iniciado")
         logger.info("Configuración del scheduler:")
-        logger.info("  - Verificar campañas: cada 1 minuto")
-        logger.info("  - Procesar mensajes: cada 5 segundos")
+        logger.info("  - Verificar campañas: a la hora programada de la siguiente campaña")
+        logger.info(f"  - Resincronizar campañas: cada {Config.SCHEDULER_RESYNC_SECONDS} segundos")
+        logger.info("  - Procesar mensajes: mientras haya mensajes pendientes")
         logger.info("  - Reintentar fallidos: cada 5 minutos")
-        logger.info("  - Actualizar estados: cada 1 hora")
+        logger.info(f"  - Conciliar estados con Twilio: cada {Config.STATUS_RECONCILE_INTERVAL_MINUTES} minutos")
+        logger.info(f"  - Revisar contadores de campañas: cada {Config.CAMPAIGN_COUNTERS_REPAIR_MINUTES} minutos")
+        logger.info(f"  - Renovar reservas de mensajes: cada {self._lease_renew_seconds():.0f} segundos")
+        logger.info(f"  - Guardar resultados de envío: cada {Config.STATUS_FLUSH_BATCH_SIZE} "
+                    f"resultados o {Config.STATUS_FLUSH_INTERVAL_MS} ms")
     
     def stop(self):
         """Detener el programador"""
-        self.running = False
-        self.message_queue.stop_processing()
+        with self._wakeup:
+            self.running = False
+            self._wakeup.notify_all()
+        workers_stopped = self.message_queue.stop_processing()
         if self.thread:
             self.thread.join()
+        # La creación de mensajes se corta al terminar el tramo en curso
+        self._join_fanouts()
+        
+        # Envíos que siguen en curso (hilos que no terminaron a tiempo): su
+        # resultado se escribirá al llegar y su reserva no se libera
+        in_flight = [] if workers_stopped else self.message_queue.get_in_flight_keys()
+        if in_flight:
+            logger.warning(f"{len(in_flight)} envíos siguen en curso al detener; "
+                           "conservan su reserva")
+        
+        # Guardar los resultados de envío pendientes antes de liberar reservas
+        self.status_buffer.stop()
+        self.status_callbacks.stop()
+        
+        # Devolver los mensajes reservados que no se llegaron a enviar
+        try:
+            released = self.message_model.release_claims(self.worker_id, exclude_ids=in_flight)
+            if released:
+                logger.info(f"Liberadas {released} reservas de mensajes")
+        except Exception as e:
+            logger.error(f"Error liberando reservas de mensajes: {e}")
+        
         logger.info("Programador de mensajes detenido")
     
+    def _schedule_job(self, name: str, delay: float, func: Callable):
+        """Programar una tarea dentro de `delay` segundos.
+        
+        Si ya hay una tarea con el mismo nombre programada antes, se conserva
+        la más próxima.
+        """
+        due = time.time() + max(0.0, delay)
+        with self._wakeup:
+            current = self._timer_jobs.get(name)
+            if current and current[0] <= due:
+                return
+            sequence = next(self._timer_sequence)
+            self._timer_jobs[name] = (due, sequence, func)
+            heapq.heappush(self._timers, (due, sequence, name))
+            self._wakeup.notify()
+    
+    def _next_due_jobs(self) -> List[Callable]:
+        """Esperar hasta la próxima tarea vencida y devolver las que toca ejecutar"""
+        with self._wakeup:
+            while self.running:
+                now = time.time()
+                due_jobs = []
+                while self._timers and self._timers[0][0] <= now:
+                    _, sequence, name = heapq.heappop(self._timers)
+                    job = self._timer_jobs.get(name)
+                    if job and job[1] == sequence:
+                        del self._timer_jobs[name]
+                        due_jobs.append(job[2])
+                
+                if due_jobs:
+                    return due_jobs
+                
+                timeout = self._timers[0][0] - now if self._timers else None
+                self._wakeup.wait(timeout)
+            return []
+    
     def _run_scheduler(self):
         """Loop principal del programador"""
         try:
-            # Programar tareas
-            schedule.every(10).seconds.do(self._check_pending_campaigns)  # Temporalmente cada 10 segundos para pruebas
-            schedule.every(5).seconds.do(self._process_pending_messages)
-            schedule.every(5).minutes.do(self._retry_failed_messages)
-            schedule.every(1).hours.do(self._update_message_statuses)
-            
             logger.info("✅ Scheduler configurado correctamente")
-            logger.info("📅 Tareas programadas:")
-            for job in schedule.jobs:
-                logger.info(f"  - {job}")
             
-            # Ejecutar verificación inicial de campañas
+            # Verificación inicial de campañas y mensajes pendientes
             logger.info("Ejecutando verificación inicial de campañas...")
-            self._check_pending_campaigns()
+            self._schedule_job('campaigns', 0, self._check_pending_campaigns)
+            self._schedule_job('messages', 0, self._pump_messages)
+            self._schedule_job('resync', Config.SCHEDULER_RESYNC_SECONDS, self._resync)
+            self._schedule_job('retry', 5 * 60, self._retry_job)
+            # Primera conciliación al minuto (retoma una pasada interrumpida)
+            self._schedule_job('statuses', 60, self._status_job)
+            self._schedule_job('counters', Config.CAMPAIGN_COUNTERS_REPAIR_MINUTES * 60,
+                               self._counters_job)
+            self._schedule_job('leases', self._lease_renew_seconds(), self._lease_job)
             
             while self.running:
-                schedule.run_pending()
-                time.sleep(1)
+                for job in self._next_due_jobs():
+                    if not self.running:
+                        break
+                    job()
                 
         except Exception as e:
             logger.error(f"Error fatal en scheduler: {e}", exc_info=True)
             self.running = False
     
+    def _resync(self):
+        """Resincronizar con la base de datos por cambios hechos desde otros procesos"""
+        self._schedule_job('campaigns', 0, self._check_pending_campaigns)
+        self._schedule_job('messages', 0, self._pump_messages)
+        self._schedule_job('resync', Config.SCHEDULER_RESYNC_SECONDS, self._resync)
+    
+    def _retry_job(self):
+        self._retry_failed_messages()
+        self._schedule_job('retry', 5 * 60, self._retry_job)
+    
+    def _status_job(self):
+        # Si la pasada no terminó en su turno, continuar pronto desde el punto de control
+        finished = self._update_message_statuses()
+        delay = Config.STATUS_RECONCILE_INTERVAL_MINUTES * 60 if finished else 5
+        self._schedule_job('statuses', delay, self._status_job)
+    
+    def _counters_job(self):
+        self._repair_campaign_counters()
+        self._schedule_job('counters', Config.CAMPAIGN_COUNTERS_REPAIR_MINUTES * 60,
+                           self._counters_job)
+    
+    def _lease_job(self):
+        self._renew_claims()
+        self._schedule_job('leases', self._lease_renew_seconds(), self._lease_job)
+    
+    def _lease_renew_seconds(self) -> float:
+        """Renovar varias veces por reserva para que nunca venza en la cola"""
+        return max(1.0, Config.MESSAGE_LEASE_SECONDS / 3)
+    
+    def _pump_messages(self):
+        """Alimentar la cola de envío mientras haya mensajes pendientes"""
+        if self.message_queue.get_free_slots() <= 0:
+            # Cola llena: volver a intentar cuando el despachador avance
+            self._schedule_job('messages', Config.SCHEDULER_BACKPRESSURE_SECONDS,
+                               self._pump_messages)
+            return
+        
+        claimed = self._process_pending_messages()
+        if claimed:
+            # Puede haber más: seguir sin esperar al siguiente aviso
+            self._schedule_job('messages', 0, self._pump_messages)
+    
+    def refresh_campaign_schedule(self):
+        """Recalcular la próxima ejecución tras crear, editar o cancelar campañas"""
+        self._schedule_job('campaigns', 0, self._check_pending_campaigns)
+    
+    def notify_pending_messages(self):
+        """Avisar que hay mensajes nuevos para enviar"""
+        self._schedule_job('messages', 0, self._pump_messages)
+    
+    def _schedule_next_campaign(self):
+        """Programar la verificación para la hora de la siguiente campaña"""
+        next_run = self.campaign_model.get_next_scheduled_time()
+        if not next_run:
+            logger.info("⏳ No hay campañas programadas a futuro")
+            return
+        
+        # Mínimo 1s por si el reloj de la base de datos va atrasado
+        delay = max(1.0, (next_run - datetime.now()).total_seconds())
+        self._schedule_job('campaigns', delay, self._check_pending_campaigns)
+        logger.info(
+            f"📅 Próxima campaña programada para {next_run.strftime('%Y-%m-%d %H:%M:%S')} "
+            f"(en {int(delay)}s)"
+        )
+    
     def _check_pending_campaigns(self):
         """Verificar y ejecutar campañas pendientes"""
         try:
@@ -82,26 +252,7 @@ class MessageScheduler:
             logger.info("🔍 Verificando campañas programadas...")
             logger.info(f"Hora actual: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Primero, veamos TODAS las campañas para debug
-            from database import DatabaseManager
-            db = DatabaseManager()
-            all_campaigns = db.execute_query(
-                "SELECT id, name, status, scheduled_at FROM campaigns WHERE status = 'pending' ORDER BY scheduled_at ASC"
-            )
-            
-            if all_campaigns:
-                logger.debug("Campañas pendientes en BD:")
-                for c in all_campaigns:
-                    scheduled_time = c['scheduled_at']
-                    time_diff = (scheduled_time - datetime.now()).total_seconds()
-                    if time_diff > 0:
-                        minutes_left = int(time_diff / 60)
-                        seconds_left = int(time_diff % 60)
-                        logger.info(f"  📅 '{c['name']}' se ejecutará en {minutes_left}m {seconds_left}s (a las {scheduled_time.strftime('%H:%M:%S')})")
-                    else:
-                        logger.info(f"  ✅ '{c['name']}' lista para ejecutar (programada para {scheduled_time.strftime('%H:%M:%S')})")
-            
-            # Ahora buscar las pendientes que ya deben ejecutarse
+            # Buscar las pendientes que ya deben ejecutarse
             campaigns = self.campaign_model.get_pending_campaigns()
             
             if campaigns:
@@ -114,147 +265,258 @@ class MessageScheduler:
             for campaign in campaigns:
                 logger.info(f"🚀 Iniciando campaña: {campaign['name']} (ID: {campaign['id']})")
                 
-                # Actualizar estado a 'running'
-                self.campaign_model.update_campaign_status(campaign['id'], 'running')
-                
-                # Obtener contactos
-                contacts = self.contact_model.get_contacts()
-                contact_ids = [c['id'] for c in contacts]
-                logger.info(f"Contactos encontrados: {len(contact_ids)}")
+                # Marcar como 'running'; si otro proceso la tomó primero, omitirla
+                if not self.campaign_model.start_campaign(campaign['id']):
+                    logger.info(f"Campaña {campaign['id']} ya iniciada por otro proceso")
+                    continue
                 
-                # Crear mensajes para la campaña
-                if contact_ids:
-                    created = self.message_model.create_messages(
-                        campaign['id'],
-                        campaign['template_id'],
-                        contact_ids
-                    )
-                    logger.info(f"✅ Creados {len(contact_ids)} mensajes para campaña {campaign['id']}")
-                else:
-                    logger.warning("⚠️ No hay contactos para enviar")
-                
-                # Ejecutar callback si existe
-                if campaign['id'] in self.callbacks:
-                    self.callbacks[campaign['id']]('started', campaign)
-                    
+                self._start_fanout(campaign)
+            
+            self._schedule_next_campaign()
             logger.info("=" * 50)
         
         except Exception as e:
             logger.error(f"❌ Error procesando campañas pendientes: {e}", exc_info=True)
     
-    def _process_pending_messages(self):
-        """Procesar mensajes pendientes de envío con archivos adjuntos"""
+    def _start_fanout(self, campaign: dict):
+        """Crear los mensajes de la campaña en su propio hilo.
+        
+        Puede tardar minutos con audiencias grandes; fuera del hilo de las
+        tareas programadas no retrasa las reservas, su renovación ni los
+        reintentos.
+        """
+        thread = threading.Thread(
+            target=self._fan_out_campaign,
+            args=(campaign,),
+            name=f"fanout-{campaign['id']}",
+            daemon=True
+        )
+        with self._fanouts_lock:
+            self._fanouts[campaign['id']] = thread
+        thread.start()
+    
+    def _fan_out_campaign(self, campaign: dict):
+        """Crear los mensajes de una campaña iniciada y avisar al despachador"""
+        try:
+            # Audiencia: todos los contactos o los del segmento
+            audience_sql, audience_params = None, ()
+            if campaign.get('segment_filters'):
+                audience_sql, audience_params = self.segment_model.compile_filters(
+                    campaign['segment_filters']
+                )
+                logger.info(f"Segmento: {campaign.get('segment_name')}")
+            
+            # Crear mensajes para la campaña en el servidor, por tramos
+            created = self.message_model.create_campaign_messages(
+                campaign['id'],
+                campaign['template_id'],
+                audience_sql=audience_sql,
+                audience_params=audience_params,
+                progress_callback=lambda count: self._report_fanout_progress(campaign, count)
+            )
+            self.campaign_model.update_total_contacts(campaign['id'], created)
+            
+            if created:
+                logger.info(f"✅ Creados {created} mensajes para campaña {campaign['id']}")
+            else:
+                logger.warning("⚠️ No hay contactos para enviar")
+            
+            # Ejecutar callback si existe
+            if campaign['id'] in self.callbacks:
+                self.callbacks[campaign['id']]('started', campaign)
+            self.notify_pending_messages()
+        
+        except FanoutInterrupted:
+            logger.info(f"Creación de mensajes de la campaña {campaign['id']} interrumpida")
+            self._requeue_campaign(campaign)
+        except Exception as e:
+            # Los tramos confirmados se conservan: la campaña vuelve a
+            # 'pending' y la próxima verificación continúa desde ahí
+            logger.error(f"❌ Error creando mensajes de la campaña {campaign['id']}: {e}",
+                         exc_info=True)
+            self._requeue_campaign(campaign)
+        finally:
+            with self._fanouts_lock:
+                self._fanouts.pop(campaign['id'], None)
+    
+    def _join_fanouts(self, timeout: float = 30):
+        """Esperar a que los hilos de creación de mensajes terminen su tramo"""
+        with self._fanouts_lock:
+            threads = list(self._fanouts.values())
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.time()))
+    
+    def _requeue_campaign(self, campaign: dict):
+        """Dejar una campaña a medio crear lista para reanudarse"""
         try:
-            logger.info("Iniciando procesamiento de mensajes pendientes...")
+            self.campaign_model.requeue_campaign(campaign['id'])
+            logger.warning(f"Campaña {campaign['id']} devuelta a 'pending'; se reanudará "
+                           f"en la próxima verificación (cada {Config.SCHEDULER_RESYNC_SECONDS}s)")
+        except Exception as e:
+            logger.error(f"Error devolviendo la campaña {campaign['id']} a 'pending': {e}")
+    
+    def _report_fanout_progress(self, campaign: dict, created: int):
+        """Informar el avance de la creación de mensajes de una campaña"""
+        logger.info(f"Campaña {campaign['id']}: {created} mensajes creados...")
+        # Los tramos ya confirmados se pueden empezar a enviar
+        self.notify_pending_messages()
+        if not self.running:
+            raise FanoutInterrupted()
+        if campaign['id'] in self.callbacks:
+            self.callbacks[campaign['id']]('preparing', {**campaign, 'created_messages': created})
+    
+    def _process_pending_messages(self) -> int:
+        """Procesar mensajes pendientes de envío con archivos adjuntos.
+        
+        Devuelve el número de mensajes reservados y encolados.
+        """
+        try:
+            # No reservar más de lo que cabe en la cola de envío
+            free_slots = self.message_queue.get_free_slots()
+            if free_slots <= 0:
+                logger.info("Cola de envío llena, se reintentará en el próximo ciclo")
+                return 0
             
-            # Obtener mensajes pendientes
-            messages = self.message_model.get_pending_messages(limit=10)
-            logger.info(f"Mensajes pendientes encontrados: {len(messages)}")
+            # Reservar mensajes pendientes para este worker (sin volver a
+            # tomar los que ya tiene en la cola aunque su reserva venciera)
+            with self._claimed_lock:
+                held_ids = list(self._claimed_ids)
+            messages = self.message_model.claim_pending_messages(
+                self.worker_id,
+                limit=min(Config.MESSAGE_BATCH_SIZE, free_slots),
+                exclude_ids=held_ids
+            )
             
             if not messages:
-                return
-                
-            for message in messages:
-                logger.info(f"Procesando mensaje ID: {message['id']} para {message['phone_number']}")
-                logger.debug(f"Datos del mensaje: {message}")
-                
-                # Formatear mensaje con datos del contacto
-                contact_data = {
-                    'nombre': message.get('name', ''),
-                    'email': message.get('email', ''),
-                    'empresa': message.get('company', ''),
-                    'telefono': message.get('phone_number', '')
-                }
-                
-                # Agregar datos extra si existen
-                if message.get('extra_data'):
-                    try:
-                        extra = json.loads(message['extra_data'])
-                        contact_data.update(extra)
-                    except:
-                        pass
-                
-                # Formatear mensaje
-                formatted_message = self.twilio_service.format_message(
-                    message['template_content'],
-                    contact_data
+                return 0
+            
+            logger.info(f"Mensajes reservados: {len(messages)}")
+            with self._claimed_lock:
+                self._claimed_ids.update(message['id'] for message in messages)
+            
+            # Preparar todo el lote y entregar los envíos al despachador
+            for job in self._prepare_batch(messages):
+                queued = self.message_queue.add_job(
+                    job['to_number'],
+                    job['parts'],
+                    callback=lambda result, msg_id=job['message_id']: 
+                        self._handle_send_result(msg_id, result),
+                    block=True,
+                    key=job['message_id']
                 )
-                
-                logger.info(f"Mensaje formateado: {formatted_message[:100]}...")
-                
-                # Obtener archivos adjuntos de la plantilla
-                media_urls = []
-                try:
-                    attachments = self.attachment_model.get_template_attachments(
-                        message['template_id']
-                    )
-                    
-                    # WhatsApp permite hasta 10 archivos por mensaje
-                    for attachment in attachments[:10]:
-                        # Usar URL pública si está disponible
-                        if attachment.get('public_url'):
-                            media_urls.append(attachment['public_url'])
-                            logger.info(f"Agregando archivo a enviar: {attachment['file_name']}")
-                        else:
-                            # Log de advertencia si no hay URL pública
-                            logger.warning(
-                                f"Archivo adjunto sin URL pública: {attachment['file_name']}. "
-                                "Necesita configurar un servicio de hosting de archivos."
-                            )
-                    
-                    if len(media_urls) > 0:
-                        logger.info(f"Total de archivos a enviar: {len(media_urls)}")
-                    
-                except Exception as e:
-                    logger.error(f"Error obteniendo archivos adjuntos: {e}")
-                
-                # Estrategia para múltiples archivos
-                if len(media_urls) > 1:
-                    logger.info(f"Dividiendo en múltiples mensajes debido a limitación de WhatsApp")
-                    
-                    # Primer mensaje con texto y primer archivo
-                    self.message_queue.add_message(
-                        message['phone_number'],
-                        formatted_message,
-                        media_urls=[media_urls[0]] if media_urls else None,
-                        callback=lambda result, msg_id=message['id']: 
-                            self._handle_send_result(msg_id, result)
-                    )
-                    
-                    # Mensajes adicionales para el resto de archivos
-                    for i, media_url in enumerate(media_urls[1:], 2):
-                        additional_text = f"📎 Archivo {i} de {len(media_urls)}"
-                        self.message_queue.add_message(
-                            message['phone_number'],
-                            additional_text,
-                            media_urls=[media_url],
-                            callback=lambda result, msg_id=message['id'], idx=i: 
-                                logger.info(f"Archivo {idx} enviado para mensaje {msg_id}")
-                        )
-                else:
-                    # Un solo archivo o ninguno
-                    self.message_queue.add_message(
-                        message['phone_number'],
-                        formatted_message,
-                        media_urls=media_urls if media_urls else None,
-                        callback=lambda result, msg_id=message['id']: 
-                            self._handle_send_result(msg_id, result)
-                    )
-            
-            # Procesar cola
+                if not queued:
+                    # Cola detenida: stop() libera la reserva
+                    self._forget_claim(job['message_id'])
+            
+            # Los hilos del despachador toman los mensajes de la cola
             queue_size = self.message_queue.get_queue_size()
-            if queue_size > 0:
-                logger.info(f"Procesando cola con {queue_size} mensajes...")
-                queue_thread = threading.Thread(
-                    target=self.message_queue.process_queue,
-                    daemon=True
-                )
-                queue_thread.start()
-            else:
-                logger.warning("La cola de mensajes está vacía")
+            logger.info(f"Mensajes en cola de envío: {queue_size}")
+            return len(messages)
         
         except Exception as e:
             logger.error(f"Error procesando mensajes pendientes: {e}", exc_info=True)
+            return 0
+    
+    def _prepare_batch(self, messages: List[dict]) -> List[dict]:
+        """Preparar los envíos de un lote de mensajes reservados.
+        
+        Agrupa por plantilla: la plantilla compilada y los adjuntos se obtienen
+        una sola vez por plantilla y extra_data se decodifica para todo el lote.
+        """
+        templates = {}
+        for message in messages:
+            templates.setdefault(message['template_id'], message)
+        
+        # Adjuntos de todas las plantillas del lote en una sola consulta
+        try:
+            attachments = self.attachment_model.get_attachments_for_templates(list(templates))
+        except Exception as e:
+            logger.error(f"Error obteniendo archivos adjuntos: {e}")
+            attachments = {}
+        
+        plans = {}
+        for template_id, message in templates.items():
+            compiled = self.twilio_service.template_cache.get(
+                template_id,
+                message.get('template_updated_at'),
+                message['template_content']
+            )
+            plans[template_id] = (compiled, self._get_media_urls(attachments.get(template_id, [])))
+        
+        jobs = []
+        for message, extra in zip(messages, self._decode_extra_data(messages)):
+            compiled, media_urls = plans[message['template_id']]
+            
+            # Formatear mensaje con datos del contacto
+            contact_data = {
+                'nombre': message.get('name', ''),
+                'email': message.get('email', ''),
+                'empresa': message.get('company', ''),
+                'telefono': message.get('phone_number', '')
+            }
+            if extra:
+                contact_data.update(extra)
+            formatted_message = compiled.render(contact_data)
+            
+            # WhatsApp admite un archivo por mensaje: el texto va con el
+            # primero y el resto en mensajes adicionales, enviados en orden
+            parts = [(formatted_message, media_urls[:1] or None)]
+            for i, media_url in enumerate(media_urls[1:], 2):
+                parts.append((f"📎 Archivo {i} de {len(media_urls)}", [media_url]))
+            
+            logger.debug(f"Mensaje {message['id']} preparado para {message['phone_number']} "
+                         f"({len(parts)} partes): {formatted_message[:100]}")
+            jobs.append({
+                'message_id': message['id'],
+                'to_number': message['phone_number'],
+                'parts': parts
+            })
+        
+        return jobs
+    
+    def _get_media_urls(self, attachments: List[dict]) -> List[str]:
+        """Obtener las URLs públicas de los adjuntos de una plantilla"""
+        media_urls = []
+        
+        # WhatsApp permite hasta 10 archivos por mensaje
+        for attachment in attachments[:10]:
+            # Usar URL pública si está disponible
+            if attachment.get('public_url'):
+                media_urls.append(attachment['public_url'])
+            else:
+                logger.warning(
+                    f"Archivo adjunto sin URL pública: {attachment['file_name']}. "
+                    "Necesita configurar un servicio de hosting de archivos."
+                )
+        
+        if media_urls:
+            logger.info(f"Archivos a enviar por mensaje: {len(media_urls)}")
+        return media_urls
+    
+    def _decode_extra_data(self, messages: List[dict]) -> List[Optional[dict]]:
+        """Decodificar extra_data de todo el lote con una sola llamada a json.loads"""
+        raw = []
+        for message in messages:
+            value = message.get('extra_data')
+            if isinstance(value, (bytes, bytearray)):
+                value = value.decode('utf-8')
+            raw.append(value or 'null')
+        
+        try:
+            decoded = json.loads('[' + ','.join(raw) + ']')
+            if len(decoded) != len(raw):
+                raise ValueError("extra_data con varios valores")
+        except ValueError:
+            # Algún registro no es JSON válido: decodificar uno por uno
+            decoded = []
+            for value in raw:
+                try:
+                    decoded.append(json.loads(value))
+                except ValueError:
+                    decoded.append(None)
+        
+        return [extra if isinstance(extra, dict) else None for extra in decoded]
     
     def _retry_failed_messages(self):
         """Reintentar mensajes fallidos"""
@@ -268,62 +530,80 @@ class MessageScheduler:
                 AND updated_at < NOW() - INTERVAL %s MINUTE
             """
             
-            from database import DatabaseManager
-            db = DatabaseManager()
-            affected = db.execute_update(
+            affected = self.db.execute_update(
                 query, 
                 (Config.MAX_RETRY_ATTEMPTS, Config.RETRY_DELAY_MINUTES)
             )
             
             if affected > 0:
                 logger.info(f"Programados {affected} mensajes para reintento")
+            
+            # Recuperar mensajes reservados por workers caídos
+            reclaimed = self.message_model.reclaim_expired_leases()
+            if reclaimed > 0:
+                logger.warning(f"Recuperadas {reclaimed} reservas vencidas de mensajes")
+            
+            if affected > 0 or reclaimed > 0:
+                self.notify_pending_messages()
         
         except Exception as e:
             logger.error(f"Error programando reintentos: {e}")
     
-    def _update_message_statuses(self):
-        """Actualizar estados de mensajes desde Twilio"""
+    def _renew_claims(self):
+        """Extender la reserva de los mensajes que siguen en la cola de envío"""
+        with self._claimed_lock:
+            held_ids = sorted(self._claimed_ids)
+        if not held_ids:
+            return
+        
         try:
-            # Obtener mensajes enviados que necesitan actualización
-            query = """
-                SELECT id, twilio_sid 
-                FROM messages 
-                WHERE status IN ('sent', 'queued')
-                AND twilio_sid IS NOT NULL
-                AND updated_at < NOW() - INTERVAL 5 MINUTE
-                LIMIT 50
-            """
-            
-            from database import DatabaseManager
-            db = DatabaseManager()
-            messages = db.execute_query(query)
-            
-            for message in messages:
-                status = self.twilio_service.get_message_status(message['twilio_sid'])
-                
-                if status and status != message['status']:
-                    # Mapear estados de Twilio a nuestros estados
-                    status_map = {
-                        'delivered': 'delivered',
-                        'read': 'read',
-                        'failed': 'failed',
-                        'undelivered': 'failed'
-                    }
-                    
-                    if status in status_map:
-                        self.message_model.update_message_status(
-                            message['id'],
-                            status_map[status]
-                        )
+            renewed = self.message_model.renew_claims(self.worker_id, held_ids)
+            logger.debug(f"Renovadas {renewed} de {len(held_ids)} reservas de mensajes")
+        except Exception as e:
+            logger.error(f"Error renovando reservas de mensajes: {e}")
+    
+    def _forget_claim(self, message_id: int):
+        """El mensaje ya no está en la cola: dejar de renovar su reserva"""
+        with self._claimed_lock:
+            self._claimed_ids.discard(message_id)
+    
+    def _forget_claims(self, message_ids: List[int]):
+        """Resultados guardados en la base de datos: terminar sus reservas"""
+        with self._claimed_lock:
+            self._claimed_ids.difference_update(message_ids)
+    
+    def _repair_campaign_counters(self):
+        """Corregir los contadores de mensajes de las campañas activas"""
+        try:
+            repaired = self.campaign_model.repair_counters(
+                self.campaign_model.get_active_campaign_ids()
+            )
+            if repaired > 0:
+                logger.warning(f"Corregidos los contadores de {repaired} campañas")
+        except Exception as e:
+            logger.error(f"Error revisando contadores de campañas: {e}")
+    
+    def _update_message_statuses(self) -> bool:
+        """Conciliar estados de mensajes con Twilio (por tramos, reanudable).
         
+        Devuelve False si quedan tramos pendientes para el próximo turno.
+        """
+        try:
+            return self.status_reconciler.run(Config.STATUS_RECONCILE_SLICE_SECONDS)
         except Exception as e:
             logger.error(f"Error actualizando estados de mensajes: {e}")
+            return True
     
     def _handle_send_result(self, message_id: int, result: dict):
-        """Manejar resultado de envío de mensaje"""
+        """Manejar resultado de envío de mensaje.
+        
+        El resultado se guarda en el buffer de escritura diferida, que lo
+        escribe junto con otros en un UPDATE multi-fila. La reserva se sigue
+        renovando hasta que el buffer confirma la escritura (_forget_claims).
+        """
         try:
             if result['success']:
-                self.message_model.update_message_status(
+                self.status_buffer.add(
                     message_id,
                     'sent',
                     twilio_sid=result.get('sid')
@@ -333,7 +613,7 @@ class MessageScheduler:
                     f"{' con ' + str(result.get('media_count', 0)) + ' archivo(s)' if result.get('media_count') else ''}"
                 )
             else:
-                self.message_model.update_message_status(
+                self.status_buffer.add(
                     message_id,
                     'failed',
                     error=result.get('error', 'Error desconocido')
@@ -341,15 +621,24 @@ class MessageScheduler:
                 logger.error(f"Error enviando mensaje {message_id}: {result.get('error')}")
         
         except Exception as e:
+            # El resultado no llegó al buffer: dejar que la reserva venza
             logger.error(f"Error manejando resultado de envío: {e}")
+            self._forget_claim(message_id)
     
     def schedule_campaign(self, name: str, template_id: int, 
                          scheduled_at: datetime, user_id: int,
-                         callback: Optional[Callable] = None) -> int:
-        """Programar una nueva campaña"""
+                         callback: Optional[Callable] = None,
+                         segment_id: Optional[int] = None) -> int:
+        """Programar una nueva campaña (para todos los contactos o un segmento)"""
         try:
-            # Obtener número de contactos
-            total_contacts = self.contact_model.get_contact_count()
+            # Obtener número de contactos de la audiencia
+            if segment_id:
+                segment = self.segment_model.get_segment(segment_id)
+                if not segment:
+                    raise ValueError(f"Segmento {segment_id} no encontrado")
+                total_contacts = self.segment_model.count_contacts(segment['filters'])
+            else:
+                total_contacts = self.contact_model.get_contact_count()
             
             # Crear campaña
             campaign_id = self.campaign_model.create_campaign(
@@ -357,13 +646,15 @@ class MessageScheduler:
                 template_id,
                 scheduled_at.strftime('%Y-%m-%d %H:%M:%S'),
                 user_id,
-                total_contacts
+                total_contacts,
+                segment_id
             )
             
             # Registrar callback si existe
             if callback:
                 self.callbacks[campaign_id] = callback
             
+            self.refresh_campaign_schedule()
             logger.info(f"Campaña programada: {name} para {scheduled_at}")
             return campaign_id
         
@@ -388,10 +679,9 @@ class MessageScheduler:
                 WHERE campaign_id = %s AND status = 'pending'
             """
             
-            from database import DatabaseManager
-            db = DatabaseManager()
-            db.execute_update(query, (campaign_id,))
+            self.db.execute_update(query, (campaign_id,))
             
+            self.refresh_campaign_schedule()
             logger.info(f"Campaña {campaign_id} cancelada")
             return success
         
@@ -421,6 +711,7 @@ class MessageScheduler:
             
             # Actualizar estado a running
             self.campaign_model.update_campaign_status(campaign_id, 'running')
+            self.notify_pending_messages()
             
             logger.info(f"Iniciado envío inmediato para {len(contact_ids)} contactos")
             return campaign_id
@@ -429,38 +720,43 @@ class MessageScheduler:
             logger.error(f"Error en envío inmediato: {e}")
             raise
     
+    def send_transactional(self, to_number: str, message: str,
+                           media_urls: List[str] = None,
+                           callback: Optional[Callable] = None) -> bool:
+        """Enviar un mensaje transaccional (p. ej. códigos de verificación)
+        por delante de los mensajes de campañas"""
+        queued = self.message_queue.add_message(
+            to_number,
+            message,
+            media_urls=media_urls,
+            callback=callback,
+            priority=MessageQueue.PRIORITY_TRANSACTIONAL
+        )
+        if not queued:
+            logger.warning(f"Cola de envío llena, mensaje transaccional a {to_number} rechazado")
+        return queued
+    
     def get_campaign_progress(self, campaign_id: int) -> dict:
-        """Obtener progreso de una campaña"""
+        """Obtener progreso de una campaña (de sus contadores, sin contar mensajes)"""
         try:
-            query = """
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-                    SUM(CASE WHEN status = 'sent' THEN 1 ELSE 0 END) as sent,
-                    SUM(CASE WHEN status = 'delivered' THEN 1 ELSE 0 END) as delivered,
-                    SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed
-                FROM messages
-                WHERE campaign_id = %s
-            """
-            
-            from database import DatabaseManager
-            db = DatabaseManager()
-            result = db.execute_query(query, (campaign_id,), fetch_one=True)
+            counters = self.campaign_model.get_campaign_counters([campaign_id]).get(campaign_id)
             
-            if result:
-                total = result['total'] or 0
+            if counters:
+                total = counters['total']
                 progress = {
                     'total': total,
-                    'pending': result['pending'] or 0,
-                    'sent': result['sent'] or 0,
-                    'delivered': result['delivered'] or 0,
-                    'failed': result['failed'] or 0,
+                    'pending': counters['pending'],
+                    'sent': counters['sent'],
+                    'delivered': counters['delivered'],
+                    'read': counters['read'],
+                    'failed': counters['failed'],
                     'progress_percentage': 0
                 }
                 
                 if total > 0:
-                    completed = progress['sent'] + progress['delivered'] + progress['failed']
-                    progress['progress_percentage'] = (completed / total) * 100
+                    completed = (counters['sent'] + counters['delivered'] + counters['read']
+                                 + counters['failed'] + counters['undelivered'])
+                    progress['progress_percentage'] = min(100, (completed / total) * 100)
                 
                 return progress
             
@@ -469,6 +765,7 @@ class MessageScheduler:
                 'pending': 0,
                 'sent': 0,
                 'delivered': 0,
+                'read': 0,
                 'failed': 0,
                 'progress_percentage': 0
             }
@@ -480,6 +777,7 @@ class MessageScheduler:
                 'pending': 0,
                 'sent': 0,
                 'delivered': 0,
+                'read': 0,
                 'failed': 0,
                 'progress_percentage': 0
             }
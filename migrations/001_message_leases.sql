@@ -0,0 +1,11 @@
+-- Reserva (lease) de mensajes pendientes para varios workers
+-- Permite que varios schedulers envíen la misma campaña sin duplicados.
+-- Requiere MySQL 8.0+ (SELECT ... FOR UPDATE SKIP LOCKED).
+
+USE whatsapp_manager;
+
+ALTER TABLE messages
+    ADD COLUMN claimed_by VARCHAR(64) NULL AFTER retry_count,
+    ADD COLUMN claimed_until TIMESTAMP NULL AFTER claimed_by,
+    ADD INDEX idx_status_claim (status, claimed_until),
+    ADD INDEX idx_claimed_by (claimed_by);
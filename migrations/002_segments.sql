@@ -0,0 +1,36 @@
+-- Segmentos de audiencia para campañas
+-- Los segmentos guardan condiciones sobre contacts (nombre, empresa, email,
+-- teléfono y claves de extra_data) que se compilan a SQL con índices.
+-- Las claves de extra_data usadas con frecuencia se indexan con columnas
+-- generadas (xd_<clave>) creadas desde la aplicación al guardar un segmento.
+
+USE whatsapp_manager;
+
+CREATE TABLE IF NOT EXISTS segments (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    filters JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    created_by INT,
+    is_active BOOLEAN DEFAULT TRUE,
+    INDEX idx_name (name),
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS contact_extra_indexes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    json_key VARCHAR(48) NOT NULL,
+    column_name VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_json_key (json_key)
+) ENGINE=InnoDB;
+
+ALTER TABLE contacts
+    ADD INDEX idx_email (email),
+    ADD INDEX idx_company (company);
+
+ALTER TABLE campaigns
+    ADD COLUMN segment_id INT NULL AFTER template_id,
+    ADD CONSTRAINT fk_campaigns_segment
+        FOREIGN KEY (segment_id) REFERENCES segments(id) ON DELETE SET NULL;
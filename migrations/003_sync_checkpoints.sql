@@ -0,0 +1,15 @@
+-- Puntos de control para tareas reanudables
+-- La conciliación de estados con Twilio guarda aquí hasta qué fecha de
+-- envío avanzó, para continuar desde ese punto si se interrumpe.
+
+USE whatsapp_manager;
+
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    name VARCHAR(50) PRIMARY KEY,
+    position TIMESTAMP NULL,
+    details JSON,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+ALTER TABLE messages
+    ADD INDEX idx_status_sent (status, sent_at);
@@ -0,0 +1,9 @@
+-- Búsqueda de contactos con índices
+-- Nombre, email y empresa se buscan con un índice FULLTEXT (prefijos de
+-- palabra en modo booleano); los teléfonos se buscan por prefijo sobre el
+-- índice único de phone_number.
+
+USE whatsapp_manager;
+
+ALTER TABLE contacts
+    ADD FULLTEXT INDEX ft_contact_search (name, email, company);
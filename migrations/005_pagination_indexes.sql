@@ -0,0 +1,24 @@
+-- Índices compuestos para la paginación por cursor (keyset)
+-- Las páginas continúan desde (created_at, id) de la última fila recibida
+-- con ORDER BY created_at DESC, id DESC LIMIT n; con estos índices cada
+-- página lee solo sus filas en lugar de ordenar la tabla y saltar las
+-- anteriores con OFFSET.
+-- Los índices por campaña, contacto y usuario reemplazan a los simples (y
+-- siguen sirviendo a las claves foráneas).
+
+USE whatsapp_manager;
+
+ALTER TABLE contacts
+    ADD INDEX idx_created (created_at, id);
+
+ALTER TABLE messages
+    ADD INDEX idx_campaign_created (campaign_id, created_at, id),
+    ADD INDEX idx_contact_created (contact_id, created_at, id),
+    DROP INDEX idx_campaign,
+    DROP INDEX idx_contact;
+
+ALTER TABLE activity_logs
+    ADD INDEX idx_user_created (user_id, created_at, id),
+    DROP INDEX idx_user,
+    DROP INDEX idx_created,
+    ADD INDEX idx_created (created_at, id);
@@ -0,0 +1,116 @@
+-- Contadores de mensajes por campaña
+-- El progreso de una campaña se lee de una fila de campaign_counters (por
+-- clave primaria) en lugar de contar sus mensajes. Los triggers de messages
+-- mantienen los contadores en la misma transacción que cada inserción,
+-- cambio de estado o eliminación de mensajes.
+--
+-- Los borrados en cascada (ON DELETE CASCADE desde contacts) no disparan
+-- triggers: la aplicación elimina primero los mensajes de los contactos, y
+-- CampaignModel.repair_counters() recalcula los contadores si se desvían.
+-- Con el binlog activo, crear triggers requiere el privilegio SUPER o
+-- log_bin_trust_function_creators=1.
+
+USE whatsapp_manager;
+
+CREATE TABLE IF NOT EXISTS campaign_counters (
+    campaign_id INT PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    queued INT NOT NULL DEFAULT 0,
+    sent INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    `read` INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    undelivered INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS trg_messages_counters_insert;
+DROP TRIGGER IF EXISTS trg_messages_counters_update;
+DROP TRIGGER IF EXISTS trg_messages_counters_delete;
+
+DELIMITER //
+
+CREATE TRIGGER trg_messages_counters_insert AFTER INSERT ON messages
+FOR EACH ROW
+BEGIN
+    INSERT INTO campaign_counters (campaign_id, total, pending, queued, sent, delivered, `read`, failed, undelivered)
+    VALUES (
+        NEW.campaign_id,
+        1,
+        NEW.status <=> 'pending',
+        NEW.status <=> 'queued',
+        NEW.status <=> 'sent',
+        NEW.status <=> 'delivered',
+        NEW.status <=> 'read',
+        NEW.status <=> 'failed',
+        NEW.status <=> 'undelivered'
+    )
+    ON DUPLICATE KEY UPDATE
+        total = total + 1,
+        pending = pending + (NEW.status <=> 'pending'),
+        queued = queued + (NEW.status <=> 'queued'),
+        sent = sent + (NEW.status <=> 'sent'),
+        delivered = delivered + (NEW.status <=> 'delivered'),
+        `read` = `read` + (NEW.status <=> 'read'),
+        failed = failed + (NEW.status <=> 'failed'),
+        undelivered = undelivered + (NEW.status <=> 'undelivered');
+END//
+
+CREATE TRIGGER trg_messages_counters_update AFTER UPDATE ON messages
+FOR EACH ROW
+BEGIN
+    -- Las reservas y reintentos no cambian el estado: no tocan los contadores
+    IF NOT (OLD.status <=> NEW.status) THEN
+        UPDATE campaign_counters
+        SET pending = pending - (OLD.status <=> 'pending') + (NEW.status <=> 'pending'),
+            queued = queued - (OLD.status <=> 'queued') + (NEW.status <=> 'queued'),
+            sent = sent - (OLD.status <=> 'sent') + (NEW.status <=> 'sent'),
+            delivered = delivered - (OLD.status <=> 'delivered') + (NEW.status <=> 'delivered'),
+            `read` = `read` - (OLD.status <=> 'read') + (NEW.status <=> 'read'),
+            failed = failed - (OLD.status <=> 'failed') + (NEW.status <=> 'failed'),
+            undelivered = undelivered - (OLD.status <=> 'undelivered') + (NEW.status <=> 'undelivered')
+        WHERE campaign_id = NEW.campaign_id;
+    END IF;
+END//
+
+CREATE TRIGGER trg_messages_counters_delete AFTER DELETE ON messages
+FOR EACH ROW
+BEGIN
+    UPDATE campaign_counters
+    SET total = total - 1,
+        pending = pending - (OLD.status <=> 'pending'),
+        queued = queued - (OLD.status <=> 'queued'),
+        sent = sent - (OLD.status <=> 'sent'),
+        delivered = delivered - (OLD.status <=> 'delivered'),
+        `read` = `read` - (OLD.status <=> 'read'),
+        failed = failed - (OLD.status <=> 'failed'),
+        undelivered = undelivered - (OLD.status <=> 'undelivered')
+    WHERE campaign_id = OLD.campaign_id;
+END//
+
+DELIMITER ;
+
+-- Contadores de las campañas existentes
+INSERT INTO campaign_counters (campaign_id, total, pending, queued, sent, delivered, `read`, failed, undelivered)
+SELECT campaign_id,
+       COUNT(*),
+       SUM(status <=> 'pending'),
+       SUM(status <=> 'queued'),
+       SUM(status <=> 'sent'),
+       SUM(status <=> 'delivered'),
+       SUM(status <=> 'read'),
+       SUM(status <=> 'failed'),
+       SUM(status <=> 'undelivered')
+FROM messages
+GROUP BY campaign_id
+ON DUPLICATE KEY UPDATE
+    total = VALUES(total),
+    pending = VALUES(pending),
+    queued = VALUES(queued),
+    sent = VALUES(sent),
+    delivered = VALUES(delivered),
+    `read` = VALUES(`read`),
+    failed = VALUES(failed),
+    undelivered = VALUES(undelivered);
@@ -0,0 +1,167 @@
+# phone_numbers.py - Normalización de números de teléfono a formato E.164
+#
+# Reglas por país (código, longitud del número nacional, prefijo troncal)
+# precompiladas en una tabla. Un número se limpia una sola vez con una
+# expresión regular compilada y el resultado queda en una caché LRU: en las
+# importaciones los mismos números se repiten entre archivos y bloques.
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from config import Config
+
+_NON_DIGITS = re.compile(r'\D')
+
+# Longitud total sin '+' para países sin regla o números que no cumplen la
+# de su país: la del validador anterior (10 a 15 dígitos), para no aceptar
+# formatos que antes se rechazaban.
+GENERIC_MIN_LENGTH = 10
+E164_MAX_LENGTH = 15
+
+CACHE_SIZE = 65536
+
+INVALID_NUMBER = 'Número de teléfono inválido'
+
+
+class PhoneRule(NamedTuple):
+    """Regla de un país: longitudes válidas del número nacional, prefijo
+    troncal y longitudes de formatos antiguos que se siguen aceptando"""
+    country: str
+    lengths: Tuple[int, ...]
+    trunk_prefix: str = ''
+    legacy_lengths: Tuple[int, ...] = ()
+
+
+# Códigos de país (sin '+') -> regla. Los códigos E.164 no son prefijo unos
+# de otros, así que el código de un número se identifica sin ambigüedad.
+COUNTRY_RULES: Dict[str, PhoneRule] = {
+    '1': PhoneRule('Estados Unidos / Canadá', (10,), '1'),
+    '34': PhoneRule('España', (9,)),
+    '51': PhoneRule('Perú', (9,), '0'),
+    '52': PhoneRule('México', (10,), legacy_lengths=(11,)),  # 1 de móviles antes de 2019
+    '54': PhoneRule('Argentina', (10, 11), '0'),
+    '56': PhoneRule('Chile', (9,)),
+    '57': PhoneRule('Colombia', (10,)),
+    '501': PhoneRule('Belice', (7,)),
+    '502': PhoneRule('Guatemala', (8,)),
+    '503': PhoneRule('El Salvador', (8,)),
+    '504': PhoneRule('Honduras', (8,)),
+    '505': PhoneRule('Nicaragua', (8,)),
+    '506': PhoneRule('Costa Rica', (8,)),
+    '507': PhoneRule('Panamá', (7, 8)),
+    '591': PhoneRule('Bolivia', (8,)),
+    '593': PhoneRule('Ecuador', (9,), '0'),
+}
+
+_MAX_CODE_LENGTH = max(len(code) for code in COUNTRY_RULES)
+
+
+def _country_code(digits: str) -> Optional[str]:
+    """Código de país conocido al inicio de los dígitos (None si no hay regla)"""
+    for length in range(1, _MAX_CODE_LENGTH + 1):
+        if digits[:length] in COUNTRY_RULES:
+            return digits[:length]
+    return None
+
+
+def _generic_length_ok(digits: str) -> bool:
+    """Validar solo la longitud total (sin regla de país aplicable)"""
+    return GENERIC_MIN_LENGTH <= len(digits) <= E164_MAX_LENGTH
+
+
+def _default_rule(country_code: str) -> PhoneRule:
+    """Regla del país por defecto (la de la configuración si no está en la tabla)"""
+    return COUNTRY_RULES.get(country_code) or PhoneRule(
+        country_code, (Config.DEFAULT_PHONE_LENGTH,)
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(raw: str, default_country_code: str) -> Tuple[Optional[str], Optional[str]]:
+    """Normalizar un número; devuelve (número E.164 o None, error o None)"""
+    raw = raw.strip()
+    international = raw.startswith('+') or raw.startswith('00')
+    digits = _NON_DIGITS.sub('', raw)
+    if raw.startswith('00'):
+        digits = digits[2:]
+
+    if not digits:
+        return None, INVALID_NUMBER
+
+    # Número nacional del país por defecto (con o sin prefijo troncal)
+    if not international:
+        rule = _default_rule(default_country_code)
+        national = digits
+        if rule.trunk_prefix and national.startswith(rule.trunk_prefix) \
+                and len(national) - len(rule.trunk_prefix) in rule.lengths:
+            national = national[len(rule.trunk_prefix):]
+        if len(national) in rule.lengths:
+            return '+' + default_country_code + national, None
+
+    code = _country_code(digits)
+    if code:
+        rule = COUNTRY_RULES[code]
+        national = digits[len(code):]
+        # Algunos usuarios escriben el prefijo troncal después del código
+        if rule.trunk_prefix and national.startswith(rule.trunk_prefix) \
+                and len(national) - len(rule.trunk_prefix) in rule.lengths:
+            national = national[len(rule.trunk_prefix):]
+        if len(national) in rule.lengths or len(national) in rule.legacy_lengths:
+            return '+' + code + national, None
+        # Longitud distinta a la de la regla: se acepta solo si el validador
+        # anterior también la aceptaba
+        if _generic_length_ok(digits):
+            return '+' + digits, None
+        if not international:
+            return None, INVALID_NUMBER
+        expected = ' o '.join(str(length) for length in rule.lengths)
+        return None, f"{INVALID_NUMBER}: {rule.country} usa {expected} dígitos"
+
+    # País sin regla: solo se valida la longitud (ningún código empieza con 0)
+    if digits[0] == '0' or not _generic_length_ok(digits):
+        return None, INVALID_NUMBER
+    return '+' + digits, None
+
+
+def normalize(phone_number: str, default_country_code: str = None) -> Dict:
+    """Validar y formatear un número de teléfono.
+
+    Devuelve {'valid': True, 'formatted': '+...'} o {'valid': False, 'error': ...}.
+    """
+    default_country_code = (default_country_code or Config.DEFAULT_COUNTRY_CODE).lstrip('+')
+    formatted, error = _normalize(str(phone_number), default_country_code)
+    if formatted is None:
+        return {'valid': False, 'error': error}
+    return {'valid': True, 'formatted': formatted}
+
+
+def normalize_batch(phone_numbers: Iterable,
+                    default_country_code: str = None) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+    """Normalizar una lista de números.
+
+    Devuelve dos listas paralelas: números formateados (None si no son
+    válidos) y errores (None si son válidos). Cada valor distinto se
+    normaliza una sola vez.
+    """
+    default_country_code = (default_country_code or Config.DEFAULT_COUNTRY_CODE).lstrip('+')
+    seen = {}
+    formatted = []
+    errors = []
+    for phone in phone_numbers:
+        result = seen.get(phone)
+        if result is None:
+            result = seen[phone] = _normalize(str(phone), default_country_code)
+        formatted.append(result[0])
+        errors.append(result[1])
+    return formatted, errors
+
+
+def get_cache_stats() -> Dict:
+    """Estadísticas de la caché de números normalizados"""
+    info = _normalize.cache_info()
+    return {
+        'size': info.currsize,
+        'hits': info.hits,
+        'misses': info.misses
+    }
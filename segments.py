@@ -0,0 +1,162 @@
+# segments.py - Segmentos de audiencia para campañas
+#
+# Un segmento es una lista de condiciones (combinadas con AND) sobre las
+# columnas de contacts o sobre claves de extra_data. Las condiciones se
+# compilan a SQL parametrizado sobre el alias `c` de contacts, usando las
+# columnas generadas indexadas cuando existen para la clave de extra_data.
+
+import re
+from typing import Dict, List, Tuple
+
+# Campos base de contacts que se pueden filtrar
+CONTACT_FIELDS = {
+    'name': 'c.name',
+    'email': 'c.email',
+    'company': 'c.company',
+    'phone_number': 'c.phone_number'
+}
+
+EXTRA_FIELD_PREFIX = 'extra.'
+
+# Operadores soportados. 'equals' y 'prefix' aprovechan índices; 'contains'
+# requiere recorrer las filas del índice o de la tabla.
+OPERATORS = ('equals', 'prefix', 'contains', 'in', 'exists')
+
+EXTRA_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_]{1,48}$')
+
+# Longitud de las columnas generadas para claves de extra_data
+EXTRA_COLUMN_LENGTH = 191
+
+
+def validate_extra_key(key: str) -> str:
+    """Validar el nombre de una clave de extra_data"""
+    if not key or not EXTRA_KEY_PATTERN.match(key):
+        raise ValueError(
+            f"Clave de datos extra inválida: '{key}'. "
+            "Use solo letras, números y guion bajo (máx. 48 caracteres)"
+        )
+    return key
+
+
+def extra_column_name(key: str) -> str:
+    """Nombre de la columna generada para una clave de extra_data"""
+    return f"xd_{validate_extra_key(key).lower()}"
+
+
+def escape_like(value: str) -> str:
+    """Escapar comodines de LIKE"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _field_expression(field: str, indexed_keys: Dict[str, str]) -> Tuple[str, tuple]:
+    """Obtener la expresión SQL (y sus parámetros) para un campo"""
+    if field in CONTACT_FIELDS:
+        return CONTACT_FIELDS[field], ()
+
+    if field.startswith(EXTRA_FIELD_PREFIX):
+        key = validate_extra_key(field[len(EXTRA_FIELD_PREFIX):])
+        column = indexed_keys.get(key)
+        if column:
+            return f"c.{column}", ()
+        return "JSON_UNQUOTE(JSON_EXTRACT(c.extra_data, %s))", (f'$."{key}"',)
+
+    raise ValueError(f"Campo de segmento no soportado: '{field}'")
+
+
+def compile_condition(condition: Dict, indexed_keys: Dict[str, str] = None) -> Tuple[str, tuple]:
+    """Compilar una condición a SQL parametrizado"""
+    indexed_keys = indexed_keys or {}
+    field = condition.get('field', '')
+    op = condition.get('op', 'equals')
+    value = condition.get('value')
+
+    if op not in OPERATORS:
+        raise ValueError(f"Operador de segmento no soportado: '{op}'")
+
+    expression, params = _field_expression(field, indexed_keys)
+    indexed_column = not expression.startswith('JSON_')
+
+    if op == 'exists':
+        return f"{expression} IS NOT NULL AND {expression} <> ''", params + params
+
+    if op == 'in':
+        values = [str(v) for v in (value or [])]
+        if not values:
+            raise ValueError(f"La condición 'in' sobre '{field}' necesita al menos un valor")
+        if indexed_column and field.startswith(EXTRA_FIELD_PREFIX):
+            values = [v[:EXTRA_COLUMN_LENGTH] for v in values]
+        placeholders = ', '.join(['%s'] * len(values))
+        return f"{expression} IN ({placeholders})", params + tuple(values)
+
+    if value is None or str(value) == '':
+        raise ValueError(f"La condición sobre '{field}' necesita un valor")
+    value = str(value)
+
+    if op == 'equals':
+        if indexed_column and field.startswith(EXTRA_FIELD_PREFIX):
+            value = value[:EXTRA_COLUMN_LENGTH]
+        return f"{expression} = %s", params + (value,)
+    if op == 'prefix':
+        return f"{expression} LIKE %s", params + (escape_like(value) + '%',)
+    # contains
+    return f"{expression} LIKE %s", params + ('%' + escape_like(value) + '%',)
+
+
+def compile_segment(filters: List[Dict], indexed_keys: Dict[str, str] = None) -> Tuple[str, tuple]:
+    """Compilar las condiciones de un segmento a una cláusula WHERE (sin 'WHERE').
+
+    Devuelve (None, ()) si el segmento no tiene condiciones.
+    """
+    clauses = []
+    params = ()
+    for condition in filters or []:
+        clause, clause_params = compile_condition(condition, indexed_keys)
+        clauses.append(f"({clause})")
+        params += clause_params
+
+    if not clauses:
+        return None, ()
+    return ' AND '.join(clauses), params
+
+
+def segment_assignments(filters: List[Dict]) -> Dict[str, str]:
+    """Valores que hacen que un contacto cumpla un segmento {campo: valor}.
+
+    Solo es posible si todas las condiciones fijan un valor ('equals' o
+    'in', que toma el primero) sobre un campo asignable; el teléfono no se
+    asigna porque identifica al contacto.
+    """
+    assignments = {}
+    for condition in filters or []:
+        field = condition.get('field', '')
+        op = condition.get('op', 'equals')
+        value = condition.get('value')
+        if op == 'in':
+            value = (value or [None])[0]
+        elif op != 'equals':
+            raise ValueError(
+                f"No se pueden agregar contactos a un segmento con la condición '{op}' sobre '{field}'"
+            )
+        if field == 'phone_number' or (field not in CONTACT_FIELDS
+                                       and not field.startswith(EXTRA_FIELD_PREFIX)):
+            raise ValueError(f"No se pueden agregar contactos a un segmento filtrado por '{field}'")
+        if field.startswith(EXTRA_FIELD_PREFIX):
+            validate_extra_key(field[len(EXTRA_FIELD_PREFIX):])
+        if value is None or str(value) == '':
+            raise ValueError(f"La condición sobre '{field}' necesita un valor")
+        if assignments.get(field, value) != value:
+            raise ValueError(f"El segmento pide dos valores distintos para '{field}'")
+        assignments[field] = str(value)
+    return assignments
+
+
+def get_extra_keys(filters: List[Dict]) -> List[str]:
+    """Obtener las claves de extra_data usadas por un segmento"""
+    keys = []
+    for condition in filters or []:
+        field = condition.get('field', '')
+        if field.startswith(EXTRA_FIELD_PREFIX):
+            key = validate_extra_key(field[len(EXTRA_FIELD_PREFIX):])
+            if key not in keys:
+                keys.append(key)
+    return keys
@@ -0,0 +1,186 @@
+# status_callbacks.py - Recepción de StatusCallback de Twilio
+#
+# Twilio envía un POST por cada cambio de estado de un mensaje (sent,
+# delivered, read, failed, ...). Los eventos se validan con la firma
+# X-Twilio-Signature, se encolan en memoria y un hilo los aplica por lotes
+# a la tabla messages usando el índice idx_twilio_sid.
+
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+from twilio.request_validator import RequestValidator
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Estados de Twilio que se guardan y su orden: un evento solo avanza el
+# estado de un mensaje (un 'delivered' atrasado no pisa un 'read')
+STATUS_RANK = {
+    'queued': 1,
+    'sent': 2,
+    'delivered': 3,
+    'undelivered': 3,
+    'failed': 3,
+    'read': 4
+}
+
+# Rutas del servidor local
+STATUS_CALLBACK_PATH = '/twilio/status'
+
+
+def validate_signature(url: str, params: Dict, signature: str,
+                       auth_token: str = None) -> bool:
+    """Validar la firma X-Twilio-Signature de una petición"""
+    auth_token = auth_token or Config.TWILIO_AUTH_TOKEN
+    if not auth_token or not signature:
+        return False
+    return RequestValidator(auth_token).validate(url, params, signature)
+
+
+def parse_status_event(params: Dict) -> Optional[Dict]:
+    """Convertir los parámetros del POST de Twilio en un evento de estado"""
+    sid = params.get('MessageSid') or params.get('SmsSid')
+    status = (params.get('MessageStatus') or params.get('SmsStatus') or '').lower()
+    if not sid or status not in STATUS_RANK:
+        return None
+
+    error_code = params.get('ErrorCode')
+    error = None
+    if status in ('failed', 'undelivered'):
+        error = params.get('ErrorMessage') or (
+            f"Error de Twilio {error_code}" if error_code else "Mensaje no entregado"
+        )
+
+    return {
+        'twilio_sid': sid,
+        'status': status,
+        'rank': STATUS_RANK[status],
+        'error': error,
+        'received_at': time.time()
+    }
+
+
+class StatusCallbackProcessor:
+    """Cola de eventos de estado aplicados por lotes.
+
+    Los eventos de un mismo mensaje se combinan (gana el de mayor orden).
+    Si el SID todavía no está en la base de datos (el resultado del envío
+    aún está en el StatusWriteBuffer), el evento se reintenta en el
+    siguiente lote hasta STATUS_CALLBACK_MAX_WAIT_SECONDS.
+    """
+
+    def __init__(self, message_model, batch_size: int = None,
+                 flush_interval_ms: int = None):
+        self.message_model = message_model
+        self.batch_size = max(1, batch_size or Config.STATUS_CALLBACK_BATCH_SIZE)
+        self.flush_interval = (flush_interval_ms or Config.STATUS_FLUSH_INTERVAL_MS) / 1000.0
+        self.max_wait = Config.STATUS_CALLBACK_MAX_WAIT_SECONDS
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+
+    def start(self):
+        """Iniciar el hilo que aplica los eventos"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="status-callbacks", daemon=True)
+        self._thread.start()
+
+    def submit(self, params: Dict) -> bool:
+        """Encolar un StatusCallback; devuelve False si no es un evento válido"""
+        event = parse_status_event(params)
+        if not event:
+            return False
+
+        with self._condition:
+            self.received += 1
+            self._merge_locked(event)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def _merge_locked(self, event: Dict):
+        current = self._pending.get(event['twilio_sid'])
+        if current and current['rank'] > event['rank']:
+            return
+        if current:
+            # Conservar la hora del primer evento para el límite de espera
+            event['received_at'] = min(event['received_at'], current['received_at'])
+        self._pending[event['twilio_sid']] = event
+
+    def flush(self) -> int:
+        """Aplicar los eventos pendientes; devuelve los mensajes actualizados"""
+        with self._flush_lock:
+            with self._condition:
+                events = list(self._pending.values())
+                self._pending = {}
+
+            if not events:
+                return 0
+
+            try:
+                updated, unknown = self.message_model.apply_status_events(events)
+            except Exception as e:
+                logger.error(f"Error aplicando {len(events)} eventos de estado: {e}")
+                self._requeue(events)
+                return 0
+
+            # SIDs aún no guardados: reintentar mientras no venza la espera
+            now = time.time()
+            retry = [e for e in events
+                     if e['twilio_sid'] in unknown and now - e['received_at'] < self.max_wait]
+            self.dropped += len(unknown) - len(retry)
+            self._requeue(retry)
+
+            self.applied += updated
+            if updated:
+                logger.info(f"Estados actualizados por StatusCallback: {updated}")
+            return updated
+
+    def _requeue(self, events: List[Dict]):
+        with self._condition:
+            for event in events:
+                self._merge_locked(event)
+
+    def _run(self):
+        """Hilo de aplicación: por tamaño de lote o por tiempo"""
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                if len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if not self._running:
+                    return
+            self.flush()
+
+    def stop(self):
+        """Detener el hilo y aplicar lo pendiente"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        """Estadísticas de eventos recibidos y aplicados"""
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'received': self.received,
+            'applied': self.applied,
+            'dropped': self.dropped
+        }
@@ -0,0 +1,141 @@
+# status_reconciler.py - Conciliación de estados de mensajes con Twilio
+#
+# Para cuentas donde los StatusCallback no llegan (sin URL pública), recorre
+# los mensajes aún en 'sent'/'queued' por tramos de fecha de envío. Cada
+# tramo se lista desde Twilio con el endpoint paginado (varios tramos en
+# paralelo, con un límite de consultas simultáneas), se compara con los
+# estados guardados y los cambios se aplican en bloque. El avance se guarda
+# en sync_checkpoints para continuar donde se quedó.
+
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from config import Config
+from status_callbacks import STATUS_RANK, parse_status_event
+
+logger = logging.getLogger(__name__)
+
+# Margen para diferencias entre la hora de envío de Twilio y la nuestra
+WINDOW_OVERLAP = timedelta(minutes=5)
+
+
+class StatusReconciler:
+    """Conciliación paginada, paralela y reanudable de estados con Twilio"""
+
+    CHECKPOINT_NAME = 'status_reconcile'
+
+    def __init__(self, twilio_service, message_model, checkpoint_model):
+        self.twilio_service = twilio_service
+        self.message_model = message_model
+        self.checkpoint_model = checkpoint_model
+        self.window = timedelta(minutes=Config.STATUS_RECONCILE_WINDOW_MINUTES)
+        self.horizon_hours = Config.STATUS_RECONCILE_HORIZON_HOURS
+        self.max_workers = max(1, Config.STATUS_RECONCILE_WORKERS)
+
+    def run(self, time_budget: float = None) -> bool:
+        """Avanzar la conciliación durante `time_budget` segundos como máximo.
+
+        Devuelve True si la pasada terminó (no queda nada por revisar) y
+        False si se detuvo por tiempo; la siguiente llamada continúa desde
+        el último tramo guardado.
+        """
+        if not self.twilio_service.is_configured():
+            return True
+
+        deadline = time.monotonic() + time_budget if time_budget else None
+
+        oldest = self.message_model.get_oldest_unsettled_sent_at(self.horizon_hours)
+        checkpoint = self.checkpoint_model.get_checkpoint(self.CHECKPOINT_NAME)
+        if oldest is None:
+            if checkpoint:
+                self.checkpoint_model.clear_checkpoint(self.CHECKPOINT_NAME)
+            return True
+
+        start = oldest
+        details = {'updated': 0, 'windows': 0}
+        if checkpoint and checkpoint.get('position') and checkpoint['position'] > start:
+            start = checkpoint['position']
+            details = checkpoint.get('details') or details
+            logger.info(f"Reanudando conciliación de estados desde {start}")
+
+        windows = self._windows(start, datetime.now())
+        if not windows:
+            return True
+        in_flight = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="reconcile") as executor:
+            for window in windows:
+                if deadline and time.monotonic() >= deadline:
+                    break
+                in_flight.append(executor.submit(self._fetch_window, *window))
+                if len(in_flight) >= self.max_workers:
+                    self._apply(in_flight.popleft().result(), details)
+
+            # Aplicar en orden los tramos ya pedidos
+            while in_flight:
+                self._apply(in_flight.popleft().result(), details)
+
+        if details.get('last_end') == windows[-1][1]:
+            self.checkpoint_model.clear_checkpoint(self.CHECKPOINT_NAME)
+            logger.info(f"Conciliación de estados terminada: {details['updated']} mensajes actualizados")
+            return True
+
+        logger.info(f"Conciliación de estados en pausa hasta {details.get('last_end')}")
+        return False
+
+    def _windows(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Dividir [start, end) en tramos de fecha de envío"""
+        windows = []
+        while start < end:
+            window_end = min(start + self.window, end)
+            windows.append((start, window_end))
+            start = window_end
+        return windows
+
+    def _fetch_window(self, start: datetime, end: datetime) -> Dict:
+        """Obtener los estados de Twilio y los nuestros para un tramo"""
+        ours = self.message_model.get_unsettled_sids(start, end)
+        theirs = []
+        if ours:
+            # sent_at es hora local; Twilio filtra en UTC
+            theirs = self.twilio_service.list_message_statuses(
+                (start - WINDOW_OVERLAP).astimezone(timezone.utc),
+                (end + WINDOW_OVERLAP).astimezone(timezone.utc)
+            )
+        return {'start': start, 'end': end, 'ours': ours, 'theirs': theirs}
+
+    def _apply(self, result: Dict, details: Dict):
+        """Aplicar los cambios de un tramo y guardar el punto de control"""
+        ours = result['ours']
+        events = []
+        for message in result['theirs']:
+            current = ours.get(message['sid'])
+            if current is None or STATUS_RANK.get(message['status'], 0) <= STATUS_RANK.get(current, 0):
+                continue
+            event = parse_status_event({
+                'MessageSid': message['sid'],
+                'MessageStatus': message['status'],
+                'ErrorCode': message.get('error_code'),
+                'ErrorMessage': message.get('error_message')
+            })
+            if event:
+                events.append(event)
+
+        if events:
+            updated, _ = self.message_model.apply_status_events(events)
+            details['updated'] += updated
+            logger.info(f"Conciliación {result['start']:%Y-%m-%d %H:%M}: "
+                        f"{updated} de {len(ours)} mensajes actualizados")
+
+        details['windows'] += 1
+        details['last_end'] = result['end']
+        self.checkpoint_model.save_checkpoint(
+            self.CHECKPOINT_NAME,
+            result['end'],
+            {'updated': details['updated'], 'windows': details['windows']}
+        )
@@ -0,0 +1,128 @@
+# template_engine.py - Plantillas precompiladas para el formateo de mensajes
+#
+# Una plantilla se analiza una sola vez y se convierte en un plan de
+# renderizado: trozos de texto literal intercalados con referencias a
+# variables. Renderizar para un contacto es una sola llamada a str.format
+# con los valores en orden, sin reemplazos ni expresiones regulares.
+
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any
+
+# Misma sintaxis de variables que las plantillas existentes: {variable}.
+# Las variables son los pares de llaves más internos; VARIABLE_PATTERN es
+# la limpieza del formateo anterior para las llaves sueltas.
+PLACEHOLDER_PATTERN = re.compile(r'\{([^{}]+)\}')
+VARIABLE_PATTERN = re.compile(r'\{([^}]+)\}')
+
+
+class CompiledTemplate:
+    """Plantilla analizada en literales y variables"""
+
+    __slots__ = ('source', 'variables', '_format', '_keys', '_cleanup')
+
+    def __init__(self, source: str):
+        self.source = source
+
+        # re.split con grupo alterna [literal, variable, literal, ...]
+        parts = PLACEHOLDER_PATTERN.split(source)
+        literals = parts[0::2]
+        self._keys = tuple(parts[1::2])
+
+        # Con una '{' suelta en el texto (p. ej. '{{nombre}}') el formateo
+        # anterior borraba también lo que quedaba entre llaves después de
+        # reemplazar: solo esas plantillas necesitan la limpieza al renderizar
+        self._cleanup = any('{' in literal for literal in literals)
+
+        # Cadena de formato con posiciones: los literales escapan sus llaves
+        # y cada variable pasa a ser {0}, {1}, ... (los nombres de variable
+        # pueden contener caracteres que str.format interpretaría)
+        chunks = [literals[0].replace('{', '{{').replace('}', '}}')]
+        for index, literal in enumerate(literals[1:]):
+            chunks.append(f"{{{index}}}")
+            chunks.append(literal.replace('{', '{{').replace('}', '}}'))
+        self._format = ''.join(chunks)
+
+        self.variables = list(dict.fromkeys(self._keys))
+
+    def render(self, contact_data: Dict[str, Any]) -> str:
+        """Renderizar la plantilla con los datos de un contacto.
+
+        Las variables sin valor (o sin dato en el contacto) quedan vacías.
+        El resultado es el del formateo anterior (TwilioService.format_message)
+        para valores sin llaves, salvo que un reemplazo forme otra variable
+        (p. ej. '{{a}b}'), que antes dependía del orden de los datos; los
+        valores se insertan tal cual.
+        """
+        get = contact_data.get
+        if not self._cleanup:
+            values = [str(value) if value else "" for value in map(get, self._keys)]
+            return self._format.format(*values).strip()
+
+        # Las variables sin dato quedan como {variable} para la limpieza
+        values = [
+            (str(value) if value else "") if key in contact_data else f"{{{key}}}"
+            for key, value in zip(self._keys, map(get, self._keys))
+        ]
+        return VARIABLE_PATTERN.sub('', self._format.format(*values)).strip()
+
+
+@lru_cache(maxsize=256)
+def compile_template(source: str) -> CompiledTemplate:
+    """Compilar una plantilla a partir de su contenido (con caché por contenido)"""
+    return CompiledTemplate(source)
+
+
+class TemplateCache:
+    """Caché de plantillas compiladas por id y fecha de actualización.
+
+    Una plantilla editada tiene otro updated_at, así que su versión
+    anterior se reemplaza en la siguiente consulta.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_id: int, updated_at: Any, source: str) -> CompiledTemplate:
+        """Obtener la plantilla compilada, compilándola si cambió o no existe"""
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry and entry[0] == updated_at and entry[1].source == source:
+                self._entries.move_to_end(template_id)
+                self.hits += 1
+                return entry[1]
+
+        compiled = CompiledTemplate(source)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[template_id] = (updated_at, compiled)
+            self._entries.move_to_end(template_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return compiled
+
+    def invalidate(self, template_id: int = None):
+        """Descartar una plantilla (o todas)"""
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(template_id, None)
+
+    def get_stats(self) -> Dict:
+        """Estadísticas de la caché"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
@@ -0,0 +1,99 @@
+# test_campaign_counters.py - Corrección de contadores de campaña desviados
+#
+# Uso:
+#   python -m pytest test_campaign_counters.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contextlib import contextmanager
+
+from database import CampaignModel
+
+COLUMNS = ('total',) + CampaignModel.COUNTER_STATUSES
+
+
+class FakeCounterCursor:
+    """Sentencias de repair_counters sobre tablas en memoria"""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, query, params=()):
+        self.db.queries.append(query)
+        if query.startswith('INSERT INTO campaign_counters'):
+            self.db.counters.setdefault(params[0], dict.fromkeys(COLUMNS, 0))
+        elif 'FROM campaign_counters' in query:
+            assert query.endswith('FOR UPDATE')
+            self.result = dict(self.db.counters[params[0]])
+        elif 'FROM messages' in query:
+            statuses = [status for campaign_id, status in self.db.messages
+                        if campaign_id == params[0]]
+            self.result = {'total': len(statuses)}
+            self.result.update({status: statuses.count(status)
+                                for status in CampaignModel.COUNTER_STATUSES})
+        elif query.startswith('UPDATE campaign_counters'):
+            *values, campaign_id = params
+            self.db.counters[campaign_id] = dict(zip(COLUMNS, values))
+        else:
+            raise AssertionError(query)
+
+    def fetchone(self):
+        return self.result
+
+
+class FakeCounterDB:
+    def __init__(self, messages, counters):
+        self.messages = messages  # (campaign_id, status)
+        self.counters = counters
+        self.queries = []
+
+    def execute_query(self, query, params=None, fetch_one=False):
+        return [{'id': campaign_id} for campaign_id in sorted(self.counters)]
+
+    @contextmanager
+    def transaction(self):
+        yield FakeCounterCursor(self)
+
+
+def counters(**values):
+    row = dict.fromkeys(COLUMNS, 0)
+    row.update(values)
+    return row
+
+
+MESSAGES = [(1, 'sent'), (1, 'sent'), (1, 'failed'), (1, 'pending'), (2, 'read')]
+
+
+def test_drifted_counter_is_repaired():
+    db = FakeCounterDB(MESSAGES, {
+        # Un mensaje borrado en cascada sin descontar y un 'sent' de más
+        1: counters(total=5, sent=3, failed=1, pending=1),
+        2: counters(total=1, read=1),
+    })
+
+    assert CampaignModel(db).repair_counters([1, 2]) == 1
+
+    assert db.counters[1] == counters(total=4, sent=2, failed=1, pending=1)
+    assert db.counters[2] == counters(total=1, read=1)
+
+
+def test_empty_or_missing_counter_row_is_repaired():
+    db = FakeCounterDB(MESSAGES, {1: counters(total=4, sent=2, failed=1, pending=1)})
+    db.counters[2] = counters()
+
+    assert CampaignModel(db).repair_counters() == 1
+    assert db.counters[2] == counters(total=1, read=1)
+
+    del db.counters[2]
+    assert CampaignModel(db).repair_counters([2]) == 1
+    assert db.counters[2] == counters(total=1, read=1)
+
+
+def test_correct_counters_are_not_written():
+    db = FakeCounterDB(MESSAGES, {1: counters(total=4, sent=2, failed=1, pending=1)})
+
+    assert CampaignModel(db).repair_counters([1]) == 0
+    assert not any(query.startswith('UPDATE') for query in db.queries)
@@ -0,0 +1,147 @@
+# test_campaign_fanout.py - Creación de mensajes de campaña interrumpida
+#
+# Uso:
+#   python -m pytest test_campaign_fanout.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+
+import pytest
+from mysql.connector import Error
+
+from database import MessageModel
+from message_scheduler import MessageScheduler
+
+
+class FakeFanoutDB:
+    """Contactos y mensajes en memoria para las sentencias de create_campaign_messages"""
+
+    def __init__(self, contact_count: int, fail_on_insert: int = None):
+        self.contact_ids = list(range(1, contact_count + 1))
+        self.messages = []  # (campaign_id, contact_id)
+        self.inserts = 0
+        self.fail_on_insert = fail_on_insert
+
+    def execute_query(self, query, params=None, fetch_one=False):
+        if 'COUNT(*) AS created' in query:
+            (campaign_id,) = params
+            contacts = [contact for campaign, contact in self.messages if campaign == campaign_id]
+            return {'created': len(contacts), 'last_id': max(contacts) if contacts else None}
+
+        last_id, offset = params
+        remaining = [contact_id for contact_id in self.contact_ids if contact_id > last_id]
+        return {'id': remaining[offset]} if offset < len(remaining) else None
+
+    def execute_update(self, query, params=None):
+        self.inserts += 1
+        if self.inserts == self.fail_on_insert:
+            raise Error("Lock wait timeout exceeded")
+
+        campaign_id, _, last_id = params[:3]
+        upper = params[3] if 'c.id <= %s' in query else max(self.contact_ids)
+        rows = [(campaign_id, contact_id) for contact_id in self.contact_ids
+                if last_id < contact_id <= upper]
+        self.messages.extend(rows)
+        return len(rows)
+
+
+def test_fanout_resumes_after_failed_chunk():
+    db = FakeFanoutDB(25, fail_on_insert=2)
+    model = MessageModel(db)
+
+    with pytest.raises(Error):
+        model.create_campaign_messages(7, 1, chunk_size=10)
+    assert len(db.messages) == 10
+
+    assert model.create_campaign_messages(7, 1, chunk_size=10) == 25
+    assert sorted(contact for _, contact in db.messages) == db.contact_ids
+
+
+class FakeCampaignModel:
+    def __init__(self):
+        self.status = {1: 'pending'}
+        self.totals = {}
+
+    def get_pending_campaigns(self):
+        return [{'id': 1, 'name': 'Prueba', 'template_id': 1}]
+
+    def start_campaign(self, campaign_id):
+        self.status[campaign_id] = 'running'
+        return True
+
+    def requeue_campaign(self, campaign_id):
+        self.status[campaign_id] = 'pending'
+        return True
+
+    def update_total_contacts(self, campaign_id, total):
+        self.totals[campaign_id] = total
+
+    def get_next_scheduled_time(self):
+        return None
+
+
+class FailingMessageModel:
+    def create_campaign_messages(self, *args, **kwargs):
+        raise Error("Lock wait timeout exceeded")
+
+
+def test_failed_fanout_returns_campaign_to_pending():
+    scheduler = MessageScheduler(db=object())
+    scheduler.campaign_model = FakeCampaignModel()
+    scheduler.message_model = FailingMessageModel()
+
+    scheduler._check_pending_campaigns()
+    scheduler._join_fanouts()
+
+    assert scheduler.campaign_model.status[1] == 'pending'
+    assert scheduler.campaign_model.totals == {}
+
+
+class BlockingMessageModel:
+    """Creación de mensajes que espera hasta liberarla"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def create_campaign_messages(self, campaign_id, template_id, progress_callback=None, **kwargs):
+        self.started.set()
+        assert self.release.wait(5)
+        progress_callback(25)
+        return 25
+
+
+def test_fanout_runs_off_the_timer_thread():
+    scheduler = MessageScheduler(db=object())
+    scheduler.running = True
+    scheduler.campaign_model = FakeCampaignModel()
+    scheduler.message_model = BlockingMessageModel()
+
+    # La verificación vuelve sin esperar a que se creen los mensajes
+    scheduler._check_pending_campaigns()
+    assert scheduler.message_model.started.wait(5)
+    assert scheduler.campaign_model.totals == {}
+
+    scheduler.message_model.release.set()
+    scheduler._join_fanouts()
+    assert scheduler.campaign_model.totals == {1: 25}
+    assert scheduler.campaign_model.status[1] == 'running'
+
+
+def test_stopping_interrupts_fanout_and_requeues():
+    scheduler = MessageScheduler(db=object())
+    scheduler.campaign_model = FakeCampaignModel()
+    scheduler.message_model = BlockingMessageModel()
+    scheduler.running = True
+
+    scheduler._check_pending_campaigns()
+    assert scheduler.message_model.started.wait(5)
+    scheduler.running = False
+    scheduler.message_model.release.set()
+    scheduler._join_fanouts()
+
+    assert scheduler.campaign_model.status[1] == 'pending'
+    assert scheduler.campaign_model.totals == {}
@@ -0,0 +1,53 @@
+# test_contact_search.py - Condición de búsqueda de contactos
+#
+# Uso:
+#   python -m pytest test_contact_search.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from config import Config
+from database import contact_search_condition
+
+FULLTEXT = "MATCH(name, email, company) AGAINST (%s IN BOOLEAN MODE)"
+
+
+@pytest.fixture(autouse=True)
+def guatemala(monkeypatch):
+    monkeypatch.setattr(Config, 'DEFAULT_COUNTRY_CODE', '+502')
+
+
+@pytest.mark.parametrize('search', [None, '', '   ', '---', '"()*'])
+def test_nothing_to_search(search):
+    assert contact_search_condition(search) is None
+
+
+def test_local_phone_searches_with_and_without_country_code():
+    assert contact_search_condition(' 5555-1234 ') == (
+        "(phone_number LIKE %s OR phone_number LIKE %s)", ('+55551234%', '+50255551234%')
+    )
+
+
+def test_international_phone_searches_by_prefix_only():
+    assert contact_search_condition('+502 (5555) 12') == (
+        "(phone_number LIKE %s)", ('+502555512%',)
+    )
+
+
+def test_text_uses_fulltext_with_required_prefix_words():
+    assert contact_search_condition('Ana García') == (FULLTEXT, ('+Ana* +García*',))
+    assert contact_search_condition('ana@acme.com') == (FULLTEXT, ('+ana* +acme* +com*',))
+
+
+def test_boolean_mode_operators_and_quotes_are_not_passed_through():
+    sql, params = contact_search_condition("Ana' OR 1=1 -- \"x\" <y> ~z @w")
+    assert sql == FULLTEXT
+    assert params == ('+Ana* +OR* +1* +1* +x* +y* +z* +w*',)
+
+
+def test_phone_like_wildcards_are_not_passed_through():
+    # '%' y '_' no tienen forma de teléfono: se buscan como texto
+    assert contact_search_condition('55%') == (FULLTEXT, ('+55*',))
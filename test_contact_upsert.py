@@ -0,0 +1,113 @@
+# test_contact_upsert.py - Tamaño de las sentencias de upsert de contactos
+#
+# Las sentencias se expanden como las envía mysql.connector (valores
+# escapados entre comillas, en UTF-8) para medir su tamaño real.
+#
+# Uso:
+#   python -m pytest test_contact_upsert.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from database import ContactModel
+
+PACKET_SIZE = 16 * 1024
+
+ESCAPES = {'\0': '\\0', '\n': '\\n', '\r': '\\r', '\\': '\\\\',
+           "'": "\\'", '"': '\\"', '\x1a': '\\Z'}
+
+
+def literal(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, int):
+        return str(value)
+    return "'" + ''.join(ESCAPES.get(char, char) for char in value) + "'"
+
+
+def statement_size(query: str, params) -> int:
+    chunks = query.split('%s')
+    assert len(chunks) == len(params) + 1
+    sql = chunks[0] + ''.join(literal(value) + chunk for value, chunk in zip(params, chunks[1:]))
+    return len(sql.encode('utf-8'))
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, query, params=()):
+        self.statements.append((query, list(params)))
+
+    def fetchone(self):
+        return {'existing': 0}
+
+
+class FakePacketDB:
+    def __init__(self, max_allowed_packet: int):
+        self.max_allowed_packet = max_allowed_packet
+        self.statements = []
+
+    def get_max_allowed_packet(self):
+        return self.max_allowed_packet
+
+    @contextmanager
+    def transaction(self):
+        yield FakeCursor(self.statements)
+
+
+def contacts(count, text):
+    return [{
+        'phone_number': f"+502{index:08d}",
+        'name': f"{text} {index}",
+        'email': None if index % 3 else f"c{index}@example.com",
+        'company': text * 3,
+        'extra_data': json.dumps({'nota': text * 5}, ensure_ascii=False)
+    } for index in range(count)]
+
+
+@pytest.mark.parametrize('text', [
+    'Contacto',
+    "O'Brien \\ \"x\"\n",   # cada carácter se escapa
+    'Ñandú 🚀🚀',            # 2 y 4 bytes por carácter en UTF-8
+])
+def test_no_statement_exceeds_max_allowed_packet(text):
+    db = FakePacketDB(PACKET_SIZE)
+    data = contacts(2000, text)
+
+    result = ContactModel(db).upsert_contacts(data, user_id=1, use_load_data=False)
+
+    assert result == {'inserted': 2000, 'updated': 0, 'duplicates': 0}
+    inserts = [params for query, params in db.statements if 'INSERT INTO contacts' in query]
+    assert len(inserts) > 1
+    assert sum(len(params) for params in inserts) == 2000 * len(ContactModel.UPSERT_COLUMNS)
+    for query, params in db.statements:
+        assert statement_size(query, params) <= PACKET_SIZE
+
+
+def test_packet_batches_keep_row_order():
+    db = FakePacketDB(PACKET_SIZE)
+    rows = [(f"+502{index:08d}", 'x' * 200, None, None, None, 1) for index in range(300)]
+
+    batches = list(ContactModel(db)._packet_batches(rows))
+
+    assert len(batches) > 1
+    assert [row for batch in batches for row in batch] == rows
+
+
+def test_few_large_multibyte_rows_fit():
+    # Dos filas de 4 bytes por carácter cerca de la mitad del presupuesto
+    db = FakePacketDB(PACKET_SIZE)
+    data = [{'phone_number': f"+502{index:08d}", 'name': '🚀' * 500, 'email': '🚀' * 500,
+             'company': '🚀' * 500, 'extra_data': '🚀' * 500} for index in range(6)]
+
+    ContactModel(db).upsert_contacts(data, user_id=1, use_load_data=False)
+
+    for query, params in db.statements:
+        assert statement_size(query, params) <= PACKET_SIZE
@@ -0,0 +1,51 @@
+# test_excel_import.py - Extracción de contactos de archivos Excel y CSV
+#
+# Uso:
+#   python -m pytest test_excel_import.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openpyxl
+import pandas as pd
+
+from excel_handler import ExcelHandler
+
+
+def test_numeric_column_without_valid_rows():
+    # Ningún teléfono válido: la columna mapeada queda numérica y vacía
+    df = pd.DataFrame([['abc', 5.0], ['x', None]])
+
+    contacts, errors = ExcelHandler().extract_contacts(df, 0, {'name': 1})
+
+    assert contacts == []
+    assert len(errors) == 2
+
+
+def test_numeric_mapped_column_with_blanks():
+    df = pd.DataFrame([['+50212345678', 5.0, 1.5], ['+50212345679', None, None]])
+
+    contacts, errors = ExcelHandler().extract_contacts(df, 0, {'name': 1})
+
+    assert errors == []
+    assert contacts == [
+        {'phone_number': '+50212345678', 'name': '5.0', 'extra_data': '{"columna_3": "1.5"}'},
+        {'phone_number': '+50212345679', 'name': None}
+    ]
+
+
+def test_xlsx_numeric_phones_with_blank_cell(tmp_path):
+    path = str(tmp_path / 'contactos.xlsx')
+    wb = openpyxl.Workbook()
+    for row in ([50212345678, 'Ana'], [None, 'Sin teléfono'], [50212345679, 'Luis']):
+        wb.active.append(row)
+    wb.save(path)
+
+    handler = ExcelHandler()
+    results = list(handler.iter_contacts(path, 0, {'name': 1}))
+
+    contacts = [contact for chunk, _, _ in results for contact in chunk]
+    errors = [error for _, chunk_errors, _ in results for error in chunk_errors]
+    assert [contact['phone_number'] for contact in contacts] == ['+50212345678', '+50212345679']
+    assert len(errors) == 1 and errors[0].startswith('Fila 2:')
@@ -0,0 +1,90 @@
+# test_keyset_pagination.py - Condición de paginación por cursor (keyset)
+#
+# Además del SQL generado, recorre todas las páginas sobre SQLite, que
+# ordena los NULL igual que MySQL (primero en ASC, al final en DESC).
+#
+# Uso:
+#   python -m pytest test_keyset_pagination.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sqlite3
+
+import pytest
+
+from database import keyset_condition, next_cursor
+
+
+def test_ascending_condition():
+    assert keyset_condition('name', ('Ana', 7)) == (
+        "(name > %s OR (name = %s AND id > %s))", ('Ana', 'Ana', 7)
+    )
+
+
+def test_descending_condition():
+    assert keyset_condition('created_at', ('2024-01-01', 7), descending=True) == (
+        "(created_at < %s OR (created_at = %s AND id < %s) OR created_at IS NULL)",
+        ('2024-01-01', '2024-01-01', 7)
+    )
+
+
+def test_null_cursor_conditions():
+    assert keyset_condition('name', (None, 7)) == (
+        "((name IS NULL AND id > %s) OR name IS NOT NULL)", (7,)
+    )
+    assert keyset_condition('name', (None, 7), descending=True) == (
+        "(name IS NULL AND id < %s)", (7,)
+    )
+
+
+def test_custom_id_column():
+    assert keyset_condition('c.name', ('Ana', 7), id_column='c.id') == (
+        "(c.name > %s OR (c.name = %s AND c.id > %s))", ('Ana', 'Ana', 7)
+    )
+
+
+@pytest.fixture
+def contacts():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT)")
+    # Nombres repetidos y NULL para ejercitar el desempate por id
+    names = ['Luis', None, 'Ana', 'Luis', 'Ana', None, 'Bea', 'Luis', 'Ana', None, 'Bea']
+    conn.executemany("INSERT INTO contacts (id, name) VALUES (?, ?)", list(enumerate(names, 1)))
+    yield conn
+    conn.close()
+
+
+def fetch_all_pages(conn, descending, limit):
+    direction = 'DESC' if descending else 'ASC'
+    pages, after = [], None
+    while True:
+        where, params = "", ()
+        if after:
+            condition, params = keyset_condition('name', after, descending)
+            where = f" WHERE {condition.replace('%s', '?')}"
+        rows = conn.execute(
+            f"SELECT id, name FROM contacts{where} ORDER BY name {direction}, id {direction} LIMIT ?",
+            params + (limit,)
+        ).fetchall()
+        rows = [dict(row) for row in rows]
+        if not rows:
+            return pages
+        pages.append(rows)
+        after = next_cursor(rows, field='name')
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 3, 4])
+def test_pages_cover_every_row_once_in_order(contacts, descending, limit):
+    direction = 'DESC' if descending else 'ASC'
+    expected = [dict(row) for row in contacts.execute(
+        f"SELECT id, name FROM contacts ORDER BY name {direction}, id {direction}"
+    )]
+
+    pages = fetch_all_pages(contacts, descending, limit)
+
+    assert [row for page in pages for row in page] == expected
+    assert all(len(page) <= limit for page in pages)
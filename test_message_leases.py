@@ -0,0 +1,244 @@
+# test_message_leases.py - Reservas de mensajes con la cola de envío llena
+#
+# Simula un worker con la cola llena (más mensajes de los que se envían
+# durante una reserva) y verifica que ningún mensaje se reserve ni se envíe
+# dos veces.
+#
+# Uso:
+#   python -m pytest test_message_leases.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import functools
+import threading
+import time
+
+from config import Config
+from database import StatusWriteBuffer
+from message_scheduler import MessageScheduler
+from twilio_service import MessageQueue
+
+
+class FakeMessageTable:
+    """Tabla messages en memoria con la semántica de reservas de MessageModel"""
+
+    def __init__(self, count: int):
+        self.now = 0.0
+        self.rows = {
+            message_id: {'status': 'pending', 'claimed_by': None, 'claimed_until': None}
+            for message_id in range(1, count + 1)
+        }
+        self.claims = {}
+
+    def claim_pending_messages(self, worker_id, limit=10, lease_seconds=None, exclude_ids=None):
+        lease_seconds = lease_seconds or Config.MESSAGE_LEASE_SECONDS
+        excluded = set(exclude_ids or ())
+        claimed = []
+        for message_id, row in sorted(self.rows.items()):
+            if len(claimed) >= limit:
+                break
+            if row['status'] != 'pending' or message_id in excluded:
+                continue
+            if row['claimed_until'] is not None and row['claimed_until'] >= self.now:
+                continue
+            row['claimed_by'] = worker_id
+            row['claimed_until'] = self.now + lease_seconds
+            self.claims[message_id] = self.claims.get(message_id, 0) + 1
+            claimed.append({'id': message_id, 'phone_number': f"+50212{message_id:06d}"})
+        return claimed
+
+    def renew_claims(self, worker_id, message_ids, lease_seconds=None):
+        lease_seconds = lease_seconds or Config.MESSAGE_LEASE_SECONDS
+        renewed = 0
+        for message_id in message_ids:
+            row = self.rows[message_id]
+            if row['claimed_by'] == worker_id and row['status'] == 'pending':
+                row['claimed_until'] = self.now + lease_seconds
+                renewed += 1
+        return renewed
+
+    def save_result(self, message_id, status):
+        row = self.rows[message_id]
+        row.update(status=status, claimed_by=None, claimed_until=None)
+
+
+class FakeStatusBuffer:
+    """Buffer que guarda cada resultado al momento"""
+
+    def __init__(self, table: FakeMessageTable, on_flushed):
+        self.table = table
+        self.on_flushed = on_flushed
+
+    def add(self, message_id, status, twilio_sid=None, error=None):
+        self.table.save_result(message_id, status)
+        self.on_flushed([message_id])
+
+
+class FakeQueue:
+    """Cola de envío acotada que envía un mensaje por llamada a send_one()"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.jobs = []
+        self.sent = []
+
+    def get_free_slots(self):
+        return self.max_size - len(self.jobs)
+
+    def get_queue_size(self):
+        return len(self.jobs)
+
+    def add_job(self, to_number, parts, callback=None, priority=None, block=False, timeout=None,
+                key=None):
+        self.jobs.append((to_number, callback))
+        return True
+
+    def send_one(self):
+        to_number, callback = self.jobs.pop(0)
+        self.sent.append(to_number)
+        callback({'success': True, 'sid': f"SM{len(self.sent)}"})
+
+
+def make_scheduler(table, queue):
+    scheduler = MessageScheduler(db=object())
+    scheduler.message_model = table
+    scheduler.message_queue = queue
+    scheduler.status_buffer = FakeStatusBuffer(table, scheduler._forget_claims)
+    scheduler._prepare_batch = lambda messages: [
+        {'message_id': message['id'], 'to_number': message['phone_number'], 'parts': []}
+        for message in messages
+    ]
+    return scheduler
+
+
+def test_full_queue_outliving_lease_is_not_claimed_twice(monkeypatch):
+    monkeypatch.setattr(Config, 'MESSAGE_LEASE_SECONDS', 300)
+    monkeypatch.setattr(Config, 'MESSAGE_BATCH_SIZE', 100)
+    table = FakeMessageTable(1200)
+    queue = FakeQueue(max_size=500)
+    scheduler = make_scheduler(table, queue)
+    renew_every = int(scheduler._lease_renew_seconds())
+
+    # 1 mensaje por segundo: los últimos de la cola esperan 500 s, más que la reserva
+    for second in range(1300):
+        table.now = float(second)
+        if second % renew_every == 0:
+            scheduler._renew_claims()
+        while queue.get_free_slots() > 0 and scheduler._process_pending_messages():
+            pass
+        if queue.jobs:
+            queue.send_one()
+
+    assert len(queue.sent) == 1200
+    assert len(set(queue.sent)) == 1200
+    assert all(count == 1 for count in table.claims.values())
+    assert not scheduler._claimed_ids
+
+
+def test_expired_claims_in_queue_are_excluded(monkeypatch):
+    monkeypatch.setattr(Config, 'MESSAGE_LEASE_SECONDS', 300)
+    monkeypatch.setattr(Config, 'MESSAGE_BATCH_SIZE', 10)
+    table = FakeMessageTable(20)
+    queue = FakeQueue(max_size=50)
+    scheduler = make_scheduler(table, queue)
+
+    assert scheduler._process_pending_messages() == 10
+
+    # Sin renovar: la reserva vence pero los mensajes siguen en la cola
+    table.now = 301.0
+    assert scheduler._process_pending_messages() == 10
+    assert scheduler._process_pending_messages() == 0
+    assert all(count == 1 for count in table.claims.values())
+
+
+class SlowService:
+    """Envío que tarda más que la espera de stop_processing"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.started = threading.Event()
+
+    def send_whatsapp_message(self, to_number, message, media_urls=None, **kwargs):
+        self.started.set()
+        time.sleep(self.delay)
+        return {'success': True, 'sid': 'SM1'}
+
+
+class RecordingMessageModel:
+    def __init__(self):
+        self.released = []
+        self.saved = []
+
+    def release_claims(self, worker_id, exclude_ids=None):
+        self.released.append(list(exclude_ids or ()))
+        return 0
+
+    def bulk_update_send_results(self, results):
+        self.saved.extend(results)
+        return len(results)
+
+
+def test_stop_keeps_claim_of_send_still_in_flight():
+    model = RecordingMessageModel()
+    service = SlowService(delay=0.5)
+    scheduler = MessageScheduler(db=object())
+    scheduler.message_model = model
+    scheduler.status_buffer = StatusWriteBuffer(model)
+    scheduler.message_queue = MessageQueue(service, num_workers=1, use_async=False)
+    scheduler.message_queue.stop_processing = functools.partial(
+        scheduler.message_queue.stop_processing, timeout=0.1
+    )
+    scheduler.status_buffer.start()
+    scheduler.message_queue.start_processing()
+    scheduler.message_queue.add_job(
+        '+50212345678', [('Hola', None)],
+        callback=lambda result: scheduler._handle_send_result(42, result),
+        key=42
+    )
+    assert service.started.wait(1)
+
+    scheduler.stop()
+
+    # El envío en curso conserva la reserva y su resultado se guarda al llegar
+    assert model.released == [[42]]
+    time.sleep(0.6)
+    assert [result['message_id'] for result in model.saved] == [42]
+    assert model.saved[0]['status'] == 'sent'
+
+
+class FailingResultsModel:
+    """Modelo cuya escritura de resultados falla hasta habilitarla"""
+
+    def __init__(self):
+        self.available = False
+        self.saved = []
+
+    def bulk_update_send_results(self, results):
+        if not self.available:
+            raise RuntimeError("Lost connection to MySQL server")
+        self.saved.extend(results)
+        return len(results)
+
+
+def test_claim_is_kept_until_result_is_persisted():
+    model = FailingResultsModel()
+    scheduler = MessageScheduler(db=object())
+    scheduler.message_model = model
+    scheduler.status_buffer = StatusWriteBuffer(
+        model, batch_size=1, on_flushed=scheduler._forget_claims
+    )
+    scheduler._claimed_ids.add(42)
+
+    scheduler._handle_send_result(42, {'success': True, 'sid': 'SM1'})
+    assert scheduler.status_buffer.flush() == 0
+
+    # La escritura falló: la reserva se sigue renovando
+    assert 42 in scheduler._claimed_ids
+    assert scheduler.status_buffer.get_stats()['pending'] == 1
+
+    model.available = True
+    assert scheduler.status_buffer.flush() == 1
+    assert 42 not in scheduler._claimed_ids
+    assert [result['message_id'] for result in model.saved] == [42]
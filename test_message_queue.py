@@ -0,0 +1,175 @@
+# test_message_queue.py - Detención de la cola de envío
+#
+# Uso:
+#   python -m pytest test_message_queue.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+
+from config import Config
+from twilio_service import MessageQueue, RateLimiter, TokenBucket, TwilioService
+
+
+class FakeMessages:
+    def __init__(self):
+        self.created = []
+
+    def create(self, **params):
+        self.created.append(params)
+        raise AssertionError("No se debe enviar después de detener la cola")
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+
+def make_service(rate: float) -> TwilioService:
+    service = TwilioService()
+    service.account_sid = 'AC' + '0' * 32
+    service.auth_token = 'token'
+    service.client = FakeClient()
+    service.rate_limiter = RateLimiter(rate)
+    return service
+
+
+def test_stop_cancels_worker_waiting_for_token():
+    # Un token cada 1000 s: el hilo queda esperando en el rate limiter
+    service = make_service(0.001)
+    service.rate_limiter.get_bucket(service.from_number).tokens = 0
+    results = []
+    queue = MessageQueue(service, num_workers=1, use_async=False)
+    queue.start_processing()
+    queue.add_message('+50212345678', 'Hola', callback=results.append)
+
+    time.sleep(0.2)
+    started = time.monotonic()
+    queue.stop_processing()
+
+    assert time.monotonic() - started < 1
+    assert not queue.workers
+    assert service.client.messages.created == []
+    # Cancelado antes de Twilio: no se informa como fallido
+    assert results == []
+
+
+def test_acquire_returns_false_when_inactive():
+    bucket = TokenBucket(0.001)
+    bucket.tokens = 0
+    condition = threading.Condition()
+    active = [True]
+
+    def stop():
+        time.sleep(0.1)
+        with condition:
+            active[0] = False
+            condition.notify_all()
+
+    threading.Thread(target=stop).start()
+    started = time.monotonic()
+    assert bucket.acquire(condition, lambda: active[0]) is False
+    assert time.monotonic() - started < 1
+
+
+def test_acquire_takes_available_token():
+    bucket = TokenBucket(1)
+    assert bucket.acquire(threading.Condition(), lambda: True) is True
+    assert bucket.tokens < 1
+
+
+class FlakyService:
+    """Falla los primeros `failures` envíos y luego acepta"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def send_whatsapp_message(self, to_number, message, media_urls=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return {'success': False, 'error': f"Error {self.calls}"}
+        return {'success': True, 'sid': 'SM1'}
+
+
+def run_until_done(queue: MessageQueue, results: list, timeout: float = 5):
+    queue.start_processing()
+    deadline = time.monotonic() + timeout
+    while not results and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.stop_processing()
+
+
+def test_callback_only_on_final_result(monkeypatch):
+    monkeypatch.setattr(Config, 'QUEUE_RETRY_BASE_SECONDS', 0.01)
+    service = FlakyService(failures=2)
+    results = []
+    queue = MessageQueue(service, num_workers=1, use_async=False)
+    queue.add_message('+50212345678', 'Hola', callback=results.append)
+
+    run_until_done(queue, results)
+
+    assert service.calls == 3
+    assert [result['success'] for result in results] == [True]
+
+
+def test_callback_after_last_attempt(monkeypatch):
+    monkeypatch.setattr(Config, 'QUEUE_RETRY_BASE_SECONDS', 0.01)
+    service = FlakyService(failures=100)
+    results = []
+    queue = MessageQueue(service, num_workers=1, use_async=False)
+    queue.add_message('+50212345678', 'Hola', callback=results.append)
+
+    run_until_done(queue, results)
+
+    assert service.calls == Config.MAX_RETRY_ATTEMPTS + 1
+    assert len(results) == 1
+    assert results[0]['error'] == f"Error {Config.MAX_RETRY_ATTEMPTS + 1}"
+
+
+class ThrottleOnceService:
+    """Primer envío limitado por Twilio (429); el segundo queda bloqueado hasta liberarlo"""
+
+    def __init__(self):
+        self.calls = 0
+        self.second_started = threading.Event()
+        self.release = threading.Event()
+
+    def send_whatsapp_message(self, to_number, message, media_urls=None, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            return {'success': False, 'throttled': True, 'error': 'Too Many Requests'}
+        self.second_started.set()
+        self.release.wait(5)
+        return {'success': True, 'sid': 'SM1'}
+
+
+def test_throttled_retry_stays_in_flight_with_two_workers():
+    service = ThrottleOnceService()
+    results = []
+    queue = MessageQueue(service, num_workers=2, use_async=False)
+
+    # El primer hilo termina su turno recién cuando el otro ya retomó el mensaje
+    schedule_retry = queue._schedule_retry
+
+    def retry_then_wait(item, delay):
+        schedule_retry(item, delay)
+        assert service.second_started.wait(5)
+
+    queue._schedule_retry = retry_then_wait
+    queue.add_job('+50212345678', [('Hola', None)], callback=results.append, key=42)
+    queue.start_processing()
+
+    try:
+        assert service.second_started.wait(5)
+        time.sleep(0.1)
+        assert queue.get_in_flight_keys() == [42]
+    finally:
+        service.release.set()
+        run_until_done(queue, results)
+
+    assert [result['success'] for result in results] == [True]
+    assert queue.get_in_flight_keys() == []
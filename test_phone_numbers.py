@@ -0,0 +1,78 @@
+# test_phone_numbers.py - Normalización de números de teléfono
+#
+# Uso:
+#   python -m pytest test_phone_numbers.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import re
+
+import phone_numbers
+
+
+def baseline_validate(phone_number: str) -> dict:
+    """Validador anterior (TwilioService.validate_phone_number) con Guatemala por defecto"""
+    cleaned = re.sub(r'[^\d]', '', phone_number)
+    if len(cleaned) == 8:
+        cleaned = '502' + cleaned
+    if len(cleaned) < 10 or len(cleaned) > 15:
+        return {'valid': False}
+    return {'valid': True, 'formatted': '+' + cleaned}
+
+
+def normalize(phone_number: str) -> dict:
+    return phone_numbers.normalize(phone_number, '+502')
+
+
+def test_numbers_accepted_before_are_still_accepted():
+    numbers = [
+        '+44 20 7946 0958',   # Reino Unido, sin regla
+        '+52 1 55 1234 5678',  # México con el 1 de móviles de antes
+        '+34 91 234 56 789',  # España con un dígito de más
+        '5212345678',         # Sin '+', código 52 y longitud distinta
+        '+502 1234 567',      # Guatemala con 7 dígitos
+        '12025550123',
+        '5551234',
+        '1234 5678',
+    ]
+    for number in numbers:
+        before = baseline_validate(number)
+        after = normalize(number)
+        if before['valid']:
+            assert after == before, number
+
+
+def test_numbers_without_rule_use_previous_length_bounds():
+    assert normalize('+44 20 7946 0958') == {'valid': True, 'formatted': '+442079460958'}
+    assert normalize('+299 3210 0012') == {'valid': True, 'formatted': '+29932100012'}
+    # Menos de 10 dígitos se rechaza también con '+', como antes
+    assert not normalize('+299 32 10 00')['valid']
+    assert not normalize('+44 1234')['valid']
+    assert not normalize('+44 1234 5678 9012 345')['valid']
+    assert not normalize('299321000')['valid']
+
+
+def test_country_rules():
+    assert normalize('5555 1234') == {'valid': True, 'formatted': '+50255551234'}
+    assert normalize('+54 0 11 1234 5678') == {'valid': True, 'formatted': '+541112345678'}
+    assert normalize('+52 1 55 1234 5678') == {'valid': True, 'formatted': '+5215512345678'}
+    assert normalize('+502 1234') == {
+        'valid': False,
+        'error': 'Número de teléfono inválido: Guatemala usa 8 dígitos'
+    }
+    # Longitud distinta a la regla y menor a la que aceptaba el validador anterior
+    assert normalize('+50212345') == {
+        'valid': False,
+        'error': 'Número de teléfono inválido: Guatemala usa 8 dígitos'
+    }
+    assert normalize('+34 912 345') == {
+        'valid': False,
+        'error': 'Número de teléfono inválido: España usa 9 dígitos'
+    }
+    assert normalize('+12345678') == {
+        'valid': False,
+        'error': 'Número de teléfono inválido: Estados Unidos / Canadá usa 10 dígitos'
+    }
+    assert not normalize('abc')['valid']
@@ -16,7 +16,7 @@ logging.basicConfig(
 
 print("=== Prueba del Scheduler ===")
 print("Este script verificará que el scheduler esté funcionando correctamente")
-print("Deberías ver mensajes cada minuto diciendo 'Verificando campañas programadas...'")
+print("Deberías ver 'Verificando campañas programadas...' al iniciar y a la hora de cada campaña")
 print("Presiona Ctrl+C para detener\n")
 
 # Crear e iniciar scheduler
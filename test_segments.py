@@ -0,0 +1,115 @@
+# test_segments.py - Compilación de segmentos de audiencia a SQL
+#
+# Uso:
+#   python -m pytest test_segments.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from segments import compile_condition, compile_segment, validate_extra_key
+
+JSON_CITY = "JSON_UNQUOTE(JSON_EXTRACT(c.extra_data, %s))"
+
+
+def test_equals_on_contact_field():
+    assert compile_condition({'field': 'name', 'op': 'equals', 'value': 'Ana'}) == (
+        "c.name = %s", ('Ana',)
+    )
+
+
+def test_equals_on_extra_key():
+    condition = {'field': 'extra.ciudad', 'op': 'equals', 'value': 'Lima'}
+    assert compile_condition(condition) == (f"{JSON_CITY} = %s", ('$."ciudad"', 'Lima'))
+
+
+def test_equals_on_indexed_extra_key_truncates_to_column_length():
+    condition = {'field': 'extra.ciudad', 'op': 'equals', 'value': 'x' * 300}
+    sql, params = compile_condition(condition, {'ciudad': 'xd_ciudad'})
+    assert sql == "c.xd_ciudad = %s"
+    assert params == ('x' * 191,)
+
+
+def test_prefix_and_contains_escape_like_wildcards():
+    prefix = {'field': 'email', 'op': 'prefix', 'value': 'a_b%'}
+    assert compile_condition(prefix) == ("c.email LIKE %s", ('a\\_b\\%%',))
+
+    contains = {'field': 'extra.ciudad', 'op': 'contains', 'value': 'San\\'}
+    assert compile_condition(contains) == (f"{JSON_CITY} LIKE %s", ('$."ciudad"', '%San\\\\%'))
+
+
+def test_in_uses_one_placeholder_per_value():
+    condition = {'field': 'company', 'op': 'in', 'value': ['Acme', 7]}
+    assert compile_condition(condition) == ("c.company IN (%s, %s)", ('Acme', '7'))
+
+    indexed = {'field': 'extra.plan', 'op': 'in', 'value': ['oro', 'plata']}
+    assert compile_condition(indexed, {'plan': 'xd_plan'}) == (
+        "c.xd_plan IN (%s, %s)", ('oro', 'plata')
+    )
+
+
+def test_exists_repeats_expression_params():
+    assert compile_condition({'field': 'extra.ciudad', 'op': 'exists'}) == (
+        f"{JSON_CITY} IS NOT NULL AND {JSON_CITY} <> ''", ('$."ciudad"', '$."ciudad"')
+    )
+    assert compile_condition({'field': 'company', 'op': 'exists'}) == (
+        "c.company IS NOT NULL AND c.company <> ''", ()
+    )
+
+
+@pytest.mark.parametrize('condition', [
+    {'field': 'name', 'op': 'regexp', 'value': '.*'},
+    {'field': 'password_hash', 'op': 'equals', 'value': 'x'},
+    {'field': 'name', 'op': 'equals', 'value': ''},
+    {'field': 'name', 'op': 'prefix'},
+    {'field': 'name', 'op': 'in', 'value': []},
+])
+def test_invalid_conditions_are_rejected(condition):
+    with pytest.raises(ValueError):
+        compile_condition(condition)
+
+
+@pytest.mark.parametrize('key', [
+    'ciudad") OR 1=1 -- ',
+    "ciudad'; DROP TABLE contacts; --",
+    'ciudad.nombre',
+    'ciu dad',
+])
+def test_injection_in_extra_key_is_rejected(key):
+    with pytest.raises(ValueError):
+        compile_condition({'field': f'extra.{key}', 'op': 'equals', 'value': 'x'})
+
+
+def test_injection_in_value_stays_in_params():
+    value = "x' OR '1'='1"
+    sql, params = compile_condition({'field': 'name', 'op': 'equals', 'value': value})
+    assert sql == "c.name = %s"
+    assert params == (value,)
+
+
+def test_compile_segment_joins_conditions_with_and():
+    filters = [
+        {'field': 'company', 'op': 'equals', 'value': 'Acme'},
+        {'field': 'extra.ciudad', 'op': 'prefix', 'value': 'Gua'},
+    ]
+    assert compile_segment(filters) == (
+        f"(c.company = %s) AND ({JSON_CITY} LIKE %s)", ('Acme', '$."ciudad"', 'Gua%')
+    )
+    assert compile_segment(filters, {'ciudad': 'xd_ciudad'}) == (
+        "(c.company = %s) AND (c.xd_ciudad LIKE %s)", ('Acme', 'Gua%')
+    )
+
+
+def test_empty_segment_has_no_clause():
+    assert compile_segment([]) == (None, ())
+    assert compile_segment(None) == (None, ())
+
+
+def test_validate_extra_key():
+    assert validate_extra_key('Ciudad_2') == 'Ciudad_2'
+    assert validate_extra_key('k' * 48) == 'k' * 48
+    for key in ('', 'k' * 49, 'ciudad-natal', 'año'):
+        with pytest.raises(ValueError):
+            validate_extra_key(key)
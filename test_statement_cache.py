@@ -0,0 +1,131 @@
+# test_statement_cache.py - Sentencias preparadas por conexión del pool
+#
+# Uso:
+#   python -m pytest test_statement_cache.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mysql.connector import Error
+
+import database
+from database import ConnectionPool, DatabaseManager, ER_UNSUPPORTED_PS
+
+
+class FakeCursor:
+    def __init__(self, conn, prepared, dictionary):
+        self.conn = conn
+        self.prepared = prepared
+        self.dictionary = dictionary
+        self.executed = []
+        self.closed = False
+        self.rowcount = 1
+        self.lastrowid = 7
+
+    def execute(self, query, params=None):
+        if self.prepared and query in self.conn.unsupported:
+            raise Error("not supported", errno=ER_UNSUPPORTED_PS)
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return [{'id': 1}]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, **config):
+        self.cursors = []
+        self.unsupported = set()
+        self.in_transaction = False
+
+    def cursor(self, dictionary=False, prepared=False):
+        cursor = FakeCursor(self, prepared, dictionary)
+        self.cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_manager(monkeypatch, cache_size=64):
+    connections = []
+
+    def connect(**config):
+        connections.append(FakeConnection(**config))
+        return connections[-1]
+
+    monkeypatch.setattr(database.mysql.connector, 'connect', connect)
+    db = DatabaseManager(use_pool=False)
+    db.pool = ConnectionPool(db.config, size=1, statement_cache_size=cache_size)
+    return db, connections
+
+
+def test_reuses_prepared_cursor(monkeypatch):
+    db, connections = make_manager(monkeypatch)
+
+    db.execute_query("SELECT * FROM contacts WHERE id = %s", (1,))
+    db.execute_query("SELECT *  FROM contacts\n WHERE id = %s", (2,), fetch_one=True)
+    db.execute_update("UPDATE contacts SET name = %s WHERE id = %s", ('a', 1))
+    db.execute_update("UPDATE contacts SET name = %s WHERE id = %s", ('b', 2))
+
+    conn = connections[0]
+    assert len(connections) == 1
+    assert len(conn.cursors) == 2
+    select, update = conn.cursors
+    assert select.prepared and select.dictionary
+    # Misma sentencia normalizada: mismo texto y mismo cursor preparado
+    assert [query for query, _ in select.executed] == ["SELECT * FROM contacts WHERE id = %s"] * 2
+    assert [params for _, params in update.executed] == [('a', 1), ('b', 2)]
+    assert not select.closed and not update.closed
+
+    stats = db.get_pool_stats()
+    assert stats['statements_prepared'] == 2
+    assert stats['statement_cache_hits'] == 2
+
+
+def test_unsupported_statement_falls_back(monkeypatch):
+    db, connections = make_manager(monkeypatch)
+    db.pool.statement_cache(db.pool.acquire())
+    conn = connections[0]
+    db.pool.release(conn)
+    conn.unsupported.add("LOCK TABLES messages WRITE")
+
+    db.execute_update("LOCK TABLES messages WRITE")
+    db.execute_update("LOCK TABLES messages WRITE")
+
+    prepared = [cursor for cursor in conn.cursors if cursor.prepared]
+    plain = [cursor for cursor in conn.cursors if not cursor.prepared]
+    assert len(prepared) == 1 and prepared[0].closed
+    assert len(plain) == 2 and all(cursor.closed for cursor in plain)
+
+
+def test_evicts_least_recently_used(monkeypatch):
+    db, connections = make_manager(monkeypatch, cache_size=2)
+
+    db.execute_query("SELECT 1")
+    db.execute_query("SELECT 2")
+    db.execute_query("SELECT 1")
+    db.execute_query("SELECT 3")
+
+    first, second, third = connections[0].cursors
+    assert not first.closed
+    assert second.closed
+    assert not third.closed
+
+
+def test_disabled_cache_uses_plain_cursors(monkeypatch):
+    db, connections = make_manager(monkeypatch, cache_size=0)
+
+    assert db.execute_insert("INSERT INTO tags (name) VALUES (%s)", ('x',)) == 7
+
+    cursor, = connections[0].cursors
+    assert not cursor.prepared and cursor.closed
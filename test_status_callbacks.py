@@ -0,0 +1,88 @@
+# test_status_callbacks.py - Eventos de StatusCallback de Twilio
+#
+# Uso:
+#   python -m pytest test_status_callbacks.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from status_callbacks import StatusCallbackProcessor, parse_status_event
+
+
+class RecordingMessageModel:
+    """apply_status_events que guarda los eventos y desconoce algunos SIDs"""
+
+    def __init__(self, unknown=()):
+        self.unknown = set(unknown)
+        self.applied = []
+
+    def apply_status_events(self, events):
+        known = [event for event in events if event['twilio_sid'] not in self.unknown]
+        self.applied.extend(known)
+        return len(known), {event['twilio_sid'] for event in events} & self.unknown
+
+
+def callback(sid, status, **extra):
+    return dict({'MessageSid': sid, 'MessageStatus': status}, **extra)
+
+
+@pytest.mark.parametrize('params', [
+    callback('SM1', 'accepted'),
+    callback('SM1', 'receiving'),
+    callback('SM1', ''),
+    {'MessageSid': 'SM1'},
+    callback('', 'delivered'),
+    {'MessageStatus': 'delivered'},
+])
+def test_unknown_status_or_missing_sid_is_ignored(params):
+    assert parse_status_event(params) is None
+
+    processor = StatusCallbackProcessor(RecordingMessageModel())
+    assert processor.submit(params) is False
+    assert processor.get_stats()['received'] == 0
+
+
+def test_parse_sms_fields_and_errors():
+    event = parse_status_event({'SmsSid': 'SM1', 'SmsStatus': 'FAILED', 'ErrorCode': '63016'})
+    assert (event['twilio_sid'], event['status'], event['rank']) == ('SM1', 'failed', 3)
+    assert event['error'] == 'Error de Twilio 63016'
+    assert parse_status_event(callback('SM1', 'read'))['error'] is None
+
+
+def test_late_lower_rank_event_does_not_overwrite_higher():
+    model = RecordingMessageModel()
+    processor = StatusCallbackProcessor(model)
+
+    for status in ('sent', 'read', 'delivered', 'sent'):
+        assert processor.submit(callback('SM1', status))
+    processor.flush()
+
+    assert [event['status'] for event in model.applied] == ['read']
+
+
+def test_same_rank_event_replaces_and_keeps_first_arrival():
+    processor = StatusCallbackProcessor(RecordingMessageModel())
+    processor.submit(callback('SM1', 'delivered'))
+    first = processor._pending['SM1']['received_at']
+
+    processor.submit(callback('SM1', 'undelivered', ErrorMessage='Número no válido'))
+
+    pending = processor._pending['SM1']
+    assert (pending['status'], pending['error']) == ('undelivered', 'Número no válido')
+    assert pending['received_at'] == first
+
+
+def test_retried_event_for_unknown_sid_merges_with_newer():
+    model = RecordingMessageModel(unknown={'SM1'})
+    processor = StatusCallbackProcessor(model)
+    processor.submit(callback('SM1', 'read'))
+    assert processor.flush() == 0
+
+    # Mientras se reintenta llega un 'delivered' atrasado
+    processor.submit(callback('SM1', 'delivered'))
+    model.unknown.clear()
+    assert processor.flush() == 1
+    assert [event['status'] for event in model.applied] == ['read']
@@ -0,0 +1,65 @@
+# test_template_engine.py - Plantillas precompiladas frente al formateo anterior
+#
+# Uso:
+#   python -m pytest test_template_engine.py
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import re
+
+import pytest
+
+from template_engine import CompiledTemplate, TemplateCache
+
+
+def baseline_format_message(template: str, contact_data: dict) -> str:
+    """Formateo anterior (TwilioService.format_message)"""
+    message = template
+    for key, value in contact_data.items():
+        placeholder = f"{{{key}}}"
+        if placeholder in message:
+            message = message.replace(placeholder, str(value) if value else "")
+    message = re.sub(r'\{[^}]+\}', '', message)
+    return message.strip()
+
+
+CONTACT = {'nombre': 'Ana', 'empresa': 'Acme', 'vacio': '', 'nulo': None, 'cero': 0}
+
+
+@pytest.mark.parametrize('template', [
+    # Variables sin dato, vacías, None o 0
+    'Hola {nombre} de {empresa}',
+    'Hola {apellido}',
+    '{vacio}{nulo}{cero} fin',
+    '  {nombre}  ',
+    '{nombre}{nombre}',
+    # Llaves en el texto y variables entre llaves
+    '{{nombre}}',
+    '{{apellido}}',
+    '{{nombre}',
+    '{nombre}}',
+    '{ {nombre} }',
+    '{a {nombre}',
+    'x}{y',
+    '{}',
+    '{{}}',
+    '{nombre',
+    # Nombres que str.format interpretaría
+    '{0} {nombre!r} {x.y} {a[0]} {:>10}',
+])
+def test_render_matches_previous_format_message(template):
+    assert CompiledTemplate(template).render(CONTACT) == baseline_format_message(template, CONTACT)
+
+
+def test_variables_are_innermost_brace_pairs():
+    assert CompiledTemplate('{{nombre}} {empresa} {nombre}').variables == ['nombre', 'empresa']
+
+
+def test_cache_recompiles_edited_template():
+    cache = TemplateCache()
+    first = cache.get(1, 'v1', 'Hola {nombre}')
+    assert cache.get(1, 'v1', 'Hola {nombre}') is first
+    assert cache.get(1, 'v2', 'Adiós {nombre}').render(CONTACT) == 'Adiós Ana'
+    assert cache.get_stats() == {'size': 1, 'hits': 1, 'misses': 2}
@@ -0,0 +1,100 @@
+# twilio_async.py - Transporte asyncio para los envíos de Twilio
+#
+# El cliente síncrono de Twilio ocupa un hilo del sistema por cada petición
+# en curso. Este transporte usa el cliente HTTP asíncrono de Twilio (aiohttp)
+# sobre un pool de conexiones keep-alive, de modo que un solo hilo con un
+# event loop mantiene cientos de envíos en vuelo.
+#
+# aiohttp no hace pipelining de HTTP/1.1: cada petición en vuelo usa su
+# propia conexión keep-alive, así que el límite de conexiones por host es
+# también el límite de peticiones simultáneas hacia la API.
+
+import logging
+from typing import Callable, Dict, List
+
+from twilio.rest import Client
+
+from config import Config
+from twilio_service import TwilioService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTwilioService:
+    """Envíos de WhatsApp con asyncio.
+
+    Comparte con el TwilioService síncrono la configuración, los parámetros
+    del mensaje, el manejo de errores y el RateLimiter por remitente.
+    """
+
+    def __init__(self, service: TwilioService = None, max_connections: int = None):
+        self.service = service or TwilioService()
+        self.max_connections = max(1, max_connections or Config.TWILIO_MAX_CONNECTIONS)
+        self.client = None
+        self.http_client = None
+
+    def is_configured(self) -> bool:
+        """Verificar si Twilio está configurado"""
+        return self.service.is_configured()
+
+    def _get_client(self) -> Client:
+        """Crear el cliente asíncrono dentro del event loop en curso"""
+        if self.client is None:
+            from aiohttp import ClientSession, TCPConnector
+            from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+            # Sesión propia para controlar el pool de conexiones keep-alive
+            self.http_client = AsyncTwilioHttpClient(pool_connections=False)
+            self.http_client.session = ClientSession(connector=TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=Config.TWILIO_KEEPALIVE_SECONDS
+            ))
+            self.client = self.service.create_client(http_client=self.http_client)
+            logger.info(f"Transporte asyncio de Twilio con hasta {self.max_connections} conexiones")
+        return self.client
+
+    async def send_whatsapp_message(self, to_number: str, message: str,
+                                    media_urls: List[str] = None,
+                                    from_number: str = None,
+                                    active: Callable[[], bool] = None) -> Dict:
+        """Enviar mensaje de WhatsApp con soporte para múltiples archivos.
+
+        Se cancela si active() deja de ser verdadero antes de llegar a Twilio.
+        """
+        if not self.is_configured():
+            return {
+                'success': False,
+                'error': 'Twilio no está configurado correctamente'
+            }
+
+        from_number = from_number or self.service.from_number
+
+        # Aplicar rate limiting sin bloquear el event loop
+        if not await self.service.rate_limiter.wait_if_needed_async(from_number, active):
+            return self.service.cancelled_result()
+        if active is not None and not active():
+            return self.service.cancelled_result()
+
+        try:
+            message_params = self.service.build_message_params(
+                to_number, message, media_urls, from_number
+            )
+            sent = await self._get_client().messages.create_async(**message_params)
+            return self.service.success_result(sent, message_params)
+
+        except Exception as e:
+            return self.service.error_result(e, to_number, from_number)
+
+    async def close(self):
+        """Cerrar las conexiones del pool"""
+        if self.http_client is not None:
+            await self.http_client.close()
+        self.client = None
+        self.http_client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -2,10 +2,17 @@
 
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+import asyncio
+import heapq
+import itertools
 import logging
+import threading
 import time
-from typing import Dict, Optional, List
+from datetime import datetime
+from typing import Callable, Dict, Optional, List
 from config import Config
+from template_engine import TemplateCache, compile_template
+import phone_numbers
 import json
 import re
 
@@ -16,97 +23,157 @@ class TwilioService:
         self.account_sid = Config.TWILIO_ACCOUNT_SID
         self.auth_token = Config.TWILIO_AUTH_TOKEN
         self.from_number = Config.TWILIO_WHATSAPP_FROM
+        self.status_callback_url = Config.TWILIO_STATUS_CALLBACK_URL or None
         self.client = None
-        self.rate_limiter = RateLimiter(Config.MESSAGES_PER_SECOND)
+        self.rate_limiter = RateLimiter(Config.MESSAGES_PER_SECOND, Config.RATE_LIMIT_BURST)
+        self.template_cache = TemplateCache()
         
         if self.account_sid and self.auth_token:
             try:
-                self.client = Client(self.account_sid, self.auth_token)
+                self.client = self.create_client()
                 logger.info("Servicio de Twilio inicializado correctamente")
             except Exception as e:
                 logger.error(f"Error inicializando Twilio: {e}")
     
+    def create_client(self, http_client=None) -> Client:
+        """Crear un cliente de Twilio (con TWILIO_API_BASE_URL si se configuró)"""
+        client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        if Config.TWILIO_API_BASE_URL:
+            # Servidor alternativo, p. ej. benchmarks/fake_twilio_server.py
+            client.api.base_url = Config.TWILIO_API_BASE_URL.rstrip('/')
+            logger.warning(f"Usando API de Twilio en {client.api.base_url}")
+        return client
+    
     def is_configured(self) -> bool:
         """Verificar si Twilio está configurado"""
         return bool(self.client and self.account_sid and self.auth_token)
     
-    def format_message(self, template: str, contact_data: Dict) -> str:
-        """Formatear mensaje con datos del contacto"""
-        message = template
-        
-        # Reemplazar variables en el template
-        for key, value in contact_data.items():
-            placeholder = f"{{{key}}}"
-            if placeholder in message:
-                message = message.replace(placeholder, str(value) if value else "")
+    def format_message(self, template: str, contact_data: Dict,
+                       template_id: int = None, updated_at=None) -> str:
+        """Formatear mensaje con datos del contacto.
         
-        # Limpiar variables no reemplazadas
-        message = re.sub(r'\{[^}]+\}', '', message)
-        
-        return message.strip()
+        La plantilla se compila una sola vez: por id y fecha de actualización
+        si se indican, o por contenido en caso contrario.
+        """
+        if template_id is not None:
+            compiled = self.template_cache.get(template_id, updated_at, template)
+        else:
+            compiled = compile_template(template)
+        return compiled.render(contact_data)
     
     def send_whatsapp_message(self, to_number: str, message: str, 
-                            media_urls: List[str] = None) -> Dict:
-        """Enviar mensaje de WhatsApp con soporte para múltiples archivos"""
+                            media_urls: List[str] = None,
+                            from_number: str = None,
+                            condition: threading.Condition = None,
+                            active: Callable[[], bool] = None) -> Dict:
+        """Enviar mensaje de WhatsApp con soporte para múltiples archivos.
+        
+        Con `condition` y `active` (ver TokenBucket.acquire) el envío se
+        cancela si active() deja de ser verdadero antes de llegar a Twilio.
+        """
         if not self.is_configured():
             return {
                 'success': False,
                 'error': 'Twilio no está configurado correctamente'
             }
         
-        # Aplicar rate limiting
-        self.rate_limiter.wait_if_needed()
+        from_number = from_number or self.from_number
+        
+        # Aplicar rate limiting (un bucket por número remitente)
+        if not self.rate_limiter.wait_if_needed(from_number, condition, active):
+            return self.cancelled_result()
+        if active is not None and not active():
+            return self.cancelled_result()
         
         try:
-            # Asegurar formato de número
-            if not to_number.startswith('whatsapp:'):
-                to_number = f"whatsapp:{to_number}"
-            
-            # Preparar parámetros del mensaje
-            message_params = {
-                'from_': self.from_number,
-                'to': to_number,
-                'body': message
-            }
-            
-            # Agregar media si existe
-            if media_urls:
-                # Twilio soporta hasta 10 archivos multimedia por mensaje
-                # Filtrar solo URLs válidas (no None)
-                valid_urls = [url for url in media_urls if url][:10]
-                if valid_urls:
-                    message_params['media_url'] = valid_urls
-                    logger.info(f"Adjuntando {len(valid_urls)} archivo(s) al mensaje")
-                    for i, url in enumerate(valid_urls):
-                        logger.debug(f"  Archivo {i+1}: {url}")
+            message_params = self.build_message_params(to_number, message, media_urls, from_number)
             
             # Enviar mensaje
-            message = self.client.messages.create(**message_params)
+            sent = self.client.messages.create(**message_params)
+            return self.success_result(sent, message_params)
             
-            logger.info(f"Mensaje enviado exitosamente a {to_number}, SID: {message.sid}")
-            
-            return {
-                'success': True,
-                'sid': message.sid,
-                'status': message.status,
-                'to': message.to,
-                'from': message.from_,
-                'media_count': len(valid_urls) if media_urls else 0
-            }
-            
-        except TwilioRestException as e:
-            logger.error(f"Error de Twilio enviando mensaje a {to_number}: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'error_code': e.code
-            }
         except Exception as e:
-            logger.error(f"Error inesperado enviando mensaje a {to_number}: {e}")
+            return self.error_result(e, to_number, from_number)
+    
+    def build_message_params(self, to_number: str, message: str,
+                             media_urls: List[str], from_number: str) -> Dict:
+        """Preparar los parámetros de Messages.create"""
+        # Asegurar formato de número
+        if not to_number.startswith('whatsapp:'):
+            to_number = f"whatsapp:{to_number}"
+        
+        # Preparar parámetros del mensaje
+        message_params = {
+            'from_': from_number,
+            'to': to_number,
+            'body': message
+        }
+        
+        # Pedir a Twilio que notifique los cambios de estado
+        if self.status_callback_url:
+            message_params['status_callback'] = self.status_callback_url
+        
+        # Agregar media si existe
+        if media_urls:
+            # Twilio soporta hasta 10 archivos multimedia por mensaje
+            # Filtrar solo URLs válidas (no None)
+            valid_urls = [url for url in media_urls if url][:10]
+            if valid_urls:
+                message_params['media_url'] = valid_urls
+                logger.info(f"Adjuntando {len(valid_urls)} archivo(s) al mensaje")
+                for i, url in enumerate(valid_urls):
+                    logger.debug(f"  Archivo {i+1}: {url}")
+        
+        return message_params
+    
+    def success_result(self, message, message_params: Dict) -> Dict:
+        """Resultado de un envío aceptado por Twilio"""
+        logger.info(f"Mensaje enviado exitosamente a {message_params['to']}, SID: {message.sid}")
+        self.rate_limiter.report_success(message_params['from_'])
+        
+        return {
+            'success': True,
+            'sid': message.sid,
+            'status': message.status,
+            'to': message.to,
+            'from': message.from_,
+            'media_count': len(message_params.get('media_url', []))
+        }
+    
+    def cancelled_result(self) -> Dict:
+        """Resultado de un envío cancelado antes de llegar a Twilio"""
+        return {
+            'success': False,
+            'cancelled': True,
+            'error': 'Envío cancelado: la cola de envío se detuvo'
+        }
+    
+    def error_result(self, error: Exception, to_number: str, from_number: str) -> Dict:
+        """Resultado de un envío fallido (aplica retroceso ante 429)"""
+        if isinstance(error, TwilioRestException):
+            if is_rate_limit_error(error):
+                # Twilio pidió bajar la velocidad: frenar el bucket de este número
+                logger.warning(f"Límite de velocidad de Twilio alcanzado para {from_number}")
+                self.rate_limiter.report_throttled(from_number)
+                return {
+                    'success': False,
+                    'error': str(error),
+                    'error_code': error.code,
+                    'throttled': True
+                }
+            
+            logger.error(f"Error de Twilio enviando mensaje a {to_number}: {error}")
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(error),
+                'error_code': error.code
             }
+        
+        logger.error(f"Error inesperado enviando mensaje a {to_number}: {error}")
+        return {
+            'success': False,
+            'error': str(error)
+        }
     
     def get_message_status(self, message_sid: str) -> Optional[str]:
         """Obtener estado de un mensaje"""
@@ -120,30 +187,36 @@ class TwilioService:
             logger.error(f"Error obteniendo estado del mensaje {message_sid}: {e}")
             return None
     
-    def validate_phone_number(self, phone_number: str) -> Dict:
-        """Validar y formatear número de teléfono"""
-        # Eliminar espacios y caracteres especiales
-        cleaned = re.sub(r'[^\d]', '', phone_number)
+    def list_message_statuses(self, date_sent_after: datetime, date_sent_before: datetime,
+                              page_size: int = 1000) -> List[Dict]:
+        """Listar sid, estado y error de los mensajes enviados en un rango de fechas.
         
-        # Si no tiene código de país, agregar el de Guatemala
-        if len(cleaned) == Config.DEFAULT_PHONE_LENGTH:
-            cleaned = Config.DEFAULT_COUNTRY_CODE.replace('+', '') + cleaned
+        Usa el endpoint de listado de Twilio, paginado de `page_size` en
+        `page_size`, en lugar de consultar cada mensaje por separado.
+        Las fechas deben tener zona horaria (Twilio filtra en UTC).
+        """
+        if not self.is_configured():
+            return []
         
-        # Validar longitud
-        if len(cleaned) < 10 or len(cleaned) > 15:
-            return {
-                'valid': False,
-                'error': 'Número de teléfono inválido'
+        messages = self.client.messages.stream(
+            from_=self.from_number,
+            date_sent_after=date_sent_after,
+            date_sent_before=date_sent_before,
+            page_size=page_size
+        )
+        return [
+            {
+                'sid': message.sid,
+                'status': message.status,
+                'error_code': message.error_code,
+                'error_message': message.error_message
             }
-        
-        # Agregar prefijo +
-        if not cleaned.startswith('+'):
-            cleaned = '+' + cleaned
-        
-        return {
-            'valid': True,
-            'formatted': cleaned
-        }
+            for message in messages
+        ]
+    
+    def validate_phone_number(self, phone_number: str) -> Dict:
+        """Validar y formatear número de teléfono (ver phone_numbers.normalize)"""
+        return phone_numbers.normalize(phone_number)
     
     def check_template_compliance(self, template_content: str) -> Dict:
         """Verificar si la plantilla cumple con las políticas de WhatsApp"""
@@ -217,72 +290,477 @@ class TwilioService:
         return {'valid': True, 'url': url}
 
 
+def is_rate_limit_error(error: TwilioRestException) -> bool:
+    """Indicar si el error de Twilio corresponde a un límite de velocidad (429/20429)"""
+    return error.status == 429 or error.code == 20429
+
+
+class TokenBucket:
+    """Token bucket seguro para hilos con ráfaga y retroceso adaptativo.
+    
+    Ante un 429 la tasa se reduce a la mitad y el bucket se pausa con un
+    retroceso exponencial; cada envío exitoso recupera la tasa poco a poco
+    hasta volver a la configurada.
+    """
+    
+    MIN_RATE_FACTOR = 0.1  # La tasa nunca baja de este porcentaje de la base
+    RECOVERY_STEP = 0.05  # Porcentaje de la tasa base recuperado por envío exitoso
+    
+    def __init__(self, rate: float, capacity: int = 1):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.consecutive_throttles = 0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """Agregar los tokens generados desde la última actualización"""
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+    
+    def try_acquire(self) -> float:
+        """Tomar un token si hay; si no, devolver los segundos a esperar"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self, condition: threading.Condition = None,
+                active: Callable[[], bool] = None) -> bool:
+        """Esperar hasta obtener un token.
+        
+        Con `condition` y `active` la espera se hace sobre esa condición (la
+        de la cola de envío) y se abandona en cuanto active() es falso;
+        devuelve False si no se tomó el token.
+        """
+        while True:
+            if active is not None and not active():
+                return False
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if condition is None:
+                time.sleep(wait)
+                continue
+            with condition:
+                if not active():
+                    return False
+                condition.wait(wait)
+    
+    async def acquire_async(self, active: Callable[[], bool] = None) -> bool:
+        """Esperar hasta obtener un token sin bloquear el event loop"""
+        while True:
+            if active is not None and not active():
+                return False
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            # Revisar active() al menos cada segundo durante pausas largas
+            await asyncio.sleep(wait if active is None else min(wait, 1.0))
+    
+    def throttle(self):
+        """Reducir la tasa y pausar tras un error de límite de velocidad"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                # Otros envíos en vuelo ya provocaron la pausa actual
+                return self.paused_until - now
+            
+            self._refill(now)
+            self.consecutive_throttles += 1
+            self.rate = max(self.base_rate * self.MIN_RATE_FACTOR, self.rate / 2)
+            self.tokens = 0
+            
+            backoff = min(
+                Config.RATE_LIMIT_MAX_BACKOFF_SECONDS,
+                Config.RATE_LIMIT_BACKOFF_SECONDS * (2 ** (self.consecutive_throttles - 1))
+            )
+            self.paused_until = max(self.paused_until, now + backoff)
+            return backoff
+    
+    def recover(self):
+        """Recuperar gradualmente la tasa tras un envío exitoso"""
+        with self.lock:
+            self.consecutive_throttles = 0
+            if self.rate < self.base_rate:
+                now = time.monotonic()
+                self._refill(now)
+                self.rate = min(self.base_rate, self.rate + self.base_rate * self.RECOVERY_STEP)
+
+
 class RateLimiter:
-    """Limitador de velocidad para respetar límites de API"""
+    """Limitador de velocidad para respetar límites de API.
     
-    def __init__(self, messages_per_second: int):
+    Mantiene un token bucket por número remitente, ya que Twilio aplica
+    los límites de WhatsApp por número.
+    """
+    
+    def __init__(self, messages_per_second: float, burst: int = 1):
         self.messages_per_second = messages_per_second
-        self.min_interval = 1.0 / messages_per_second
-        self.last_request_time = 0
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
     
-    def wait_if_needed(self):
-        """Esperar si es necesario para respetar el límite de velocidad"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.min_interval:
-            sleep_time = self.min_interval - time_since_last_request
-            time.sleep(sleep_time)
+    def get_bucket(self, key: str = None) -> TokenBucket:
+        """Obtener (o crear) el bucket de un número remitente"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.messages_per_second, self.burst)
+                self.buckets[key] = bucket
+            return bucket
+    
+    def wait_if_needed(self, key: str = None, condition: threading.Condition = None,
+                       active: Callable[[], bool] = None) -> bool:
+        """Esperar si es necesario para respetar el límite de velocidad.
         
-        self.last_request_time = time.time()
+        Devuelve False si la espera se canceló (ver TokenBucket.acquire).
+        """
+        return self.get_bucket(key).acquire(condition, active)
+    
+    async def wait_if_needed_async(self, key: str = None,
+                                   active: Callable[[], bool] = None) -> bool:
+        """Versión asyncio de wait_if_needed"""
+        return await self.get_bucket(key).acquire_async(active)
+    
+    def report_throttled(self, key: str = None):
+        """Registrar un 429 de Twilio para aplicar retroceso"""
+        backoff = self.get_bucket(key).throttle()
+        logger.warning(f"Pausando envíos de {key} por {backoff:.1f}s")
+    
+    def report_success(self, key: str = None):
+        """Registrar un envío exitoso"""
+        self.get_bucket(key).recover()
 
 
 class MessageQueue:
-    """Cola de mensajes para envío masivo con soporte de archivos"""
+    """Cola de mensajes para envío masivo con soporte de archivos.
     
-    def __init__(self, twilio_service: TwilioService):
+    Cola acotada con prioridades: los envíos transaccionales salen antes que
+    los de campañas. Los reintentos esperan con retroceso exponencial en una
+    cola diferida en lugar de volver de inmediato. Un grupo de hilos de
+    trabajo envía en paralelo; el ritmo real lo controla el RateLimiter del
+    TwilioService.
+    """
+    
+    PRIORITY_TRANSACTIONAL = 0
+    PRIORITY_BULK = 10
+    
+    def __init__(self, twilio_service: TwilioService, num_workers: int = None,
+                 max_size: int = None, use_async: bool = None):
         self.twilio_service = twilio_service
-        self.queue = []
+        self.num_workers = max(1, num_workers or Config.DISPATCH_WORKERS)
+        self.use_async = Config.TWILIO_ASYNC_TRANSPORT if use_async is None else use_async
+        self.max_in_flight = max(1, Config.ASYNC_MAX_IN_FLIGHT)
+        self.max_size = max_size or Config.MESSAGE_QUEUE_MAX_SIZE
+        self.ready = []  # heap de (prioridad, secuencia, item)
+        self.delayed = []  # heap de (listo_en, secuencia, item)
+        self.sequence = itertools.count()
         self.processing = False
+        # Turno de cada retiro de la cola -> item que se está enviando. Un item
+        # reintentado puede volver a retirarse antes de que termine el turno
+        # anterior, por eso la clave es el turno y no el item.
+        self.in_flight = {}
+        self.checkouts = itertools.count()
+        self.workers = []
+        self.condition = threading.Condition()
     
     def add_message(self, to_number: str, message: str, 
-                    media_urls: List[str] = None, callback=None):
-        """Agregar mensaje a la cola con archivos multimedia opcionales"""
-        self.queue.append({
+                    media_urls: List[str] = None, callback=None,
+                    priority: int = None, block: bool = False,
+                    timeout: float = None) -> bool:
+        """Agregar mensaje a la cola con archivos multimedia opcionales.
+        
+        Devuelve False si la cola está llena (o se detuvo mientras se esperaba
+        lugar con block=True).
+        """
+        return self.add_job(to_number, [(message, media_urls)], callback,
+                            priority=priority, block=block, timeout=timeout)
+    
+    def add_job(self, to_number: str, parts: List[tuple], callback=None,
+                priority: int = None, block: bool = False,
+                timeout: float = None, key=None) -> bool:
+        """Agregar un envío de varias partes [(texto, media_urls), ...].
+        
+        Un mismo hilo envía las partes en orden; el callback recibe una sola
+        vez el resultado final de la primera parte (la que lleva el texto del
+        mensaje): éxito, o el último fallo tras agotar los reintentos.
+        `key` identifica el envío en get_in_flight_keys().
+        """
+        item = {
             'to_number': to_number,
-            'message': message,
-            'media_urls': media_urls,
+            'parts': list(parts),
+            'next_part': 0,
             'callback': callback,
-            'attempts': 0
-        })
+            'priority': self.PRIORITY_BULK if priority is None else priority,
+            'attempts': 0,
+            'key': key
+        }
+        
+        with self.condition:
+            if block:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while self._size_locked() >= self.max_size and self.processing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+            
+            if self._size_locked() >= self.max_size:
+                return False
+            
+            self._push_ready_locked(item)
+            return True
+    
+    def _push_ready_locked(self, item: Dict):
+        heapq.heappush(self.ready, (item['priority'], next(self.sequence), item))
+        self.condition.notify()
+    
+    def _schedule_retry(self, item: Dict, delay: float):
+        """Reencolar un mensaje para que se envíe después de un retraso"""
+        with self.condition:
+            if delay <= 0:
+                self._push_ready_locked(item)
+                return
+            heapq.heappush(self.delayed, (time.monotonic() + delay, next(self.sequence), item))
+            # Despertar a un hilo para que recalcule su tiempo de espera
+            self.condition.notify()
+    
+    def _promote_due_locked(self) -> Optional[float]:
+        """Pasar a la cola lista los reintentos vencidos; devolver la espera al próximo"""
+        now = time.monotonic()
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, item = heapq.heappop(self.delayed)
+            heapq.heappush(self.ready, (item['priority'], next(self.sequence), item))
+        return self.delayed[0][0] - now if self.delayed else None
+    
+    def _size_locked(self) -> int:
+        return len(self.ready) + len(self.delayed)
+    
+    def start_processing(self):
+        """Iniciar los hilos de envío (si no están activos)"""
+        with self.condition:
+            if self.processing:
+                return
+            self.processing = True
+            if self.use_async:
+                # Un solo hilo con event loop y muchos envíos en vuelo
+                self.workers = [
+                    threading.Thread(target=self._async_worker, name="dispatch-async", daemon=True)
+                ]
+            else:
+                self.workers = [
+                    threading.Thread(target=self._worker, name=f"dispatch-{i + 1}", daemon=True)
+                    for i in range(self.num_workers)
+                ]
+        
+        for worker in self.workers:
+            worker.start()
+        if self.use_async:
+            logger.info(f"Despachador asyncio iniciado con hasta {self.max_in_flight} envíos en vuelo")
+        else:
+            logger.info(f"Despachador de mensajes iniciado con {self.num_workers} hilos")
     
     def process_queue(self):
-        """Procesar cola de mensajes"""
-        self.processing = True
+        """Procesar cola de mensajes y esperar hasta vaciarla"""
+        self.start_processing()
+        with self.condition:
+            while self.processing and (self._size_locked() or self.in_flight):
+                self.condition.wait()
+    
+    def _next_item(self) -> Optional[tuple]:
+        """Esperar el siguiente mensaje listo; devuelve (turno, item) o None si
+        la cola se detuvo. El turno se entrega a _finish_item."""
+        with self.condition:
+            while True:
+                if not self.processing:
+                    return None
+                next_due = self._promote_due_locked()
+                if self.ready:
+                    break
+                self.condition.wait(next_due)
+            
+            _, _, item = heapq.heappop(self.ready)
+            checkout = next(self.checkouts)
+            self.in_flight[checkout] = item
+            # Hay lugar libre para productores bloqueados
+            self.condition.notify_all()
+            return checkout, item
+    
+    def _finish_item(self, checkout: int):
+        with self.condition:
+            self.in_flight.pop(checkout, None)
+            self.condition.notify_all()
+    
+    def _worker(self):
+        """Hilo de envío: tomar mensajes de la cola mientras esté activa"""
+        while True:
+            taken = self._next_item()
+            if taken is None:
+                return
+            
+            checkout, item = taken
+            try:
+                self._send(item)
+            except Exception as e:
+                logger.error(f"Error en hilo de envío: {e}", exc_info=True)
+            finally:
+                self._finish_item(checkout)
+    
+    def _async_worker(self):
+        """Hilo del event loop del transporte asyncio"""
+        try:
+            asyncio.run(self._async_dispatch())
+        except Exception as e:
+            logger.error(f"Error en despachador asyncio: {e}", exc_info=True)
+    
+    async def _async_dispatch(self):
+        """Tomar mensajes de la cola y enviarlos como tareas concurrentes"""
+        from twilio_async import AsyncTwilioService
         
-        while self.queue and self.processing:
-            item = self.queue.pop(0)
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        
+        async with AsyncTwilioService(self.twilio_service) as service:
+            while True:
+                await slots.acquire()
+                # La espera en la cola es bloqueante: hacerla fuera del loop
+                taken = await loop.run_in_executor(None, self._next_item)
+                if taken is None:
+                    slots.release()
+                    break
+                
+                task = asyncio.create_task(self._send_async(service, *taken))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: slots.release())
+            
+            # Terminar los envíos en vuelo antes de cerrar las conexiones
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _send_async(self, service, checkout: int, item: Dict):
+        """Versión asyncio de _send"""
+        try:
+            while item['next_part'] < len(item['parts']):
+                body, media_urls = item['parts'][item['next_part']]
+                result = await service.send_whatsapp_message(
+                    item['to_number'], body, media_urls, active=self._is_processing
+                )
+                if not self._handle_part_result(item, result):
+                    return
+        except Exception as e:
+            logger.error(f"Error en envío asyncio: {e}", exc_info=True)
+        finally:
+            self._finish_item(checkout)
+    
+    def _send(self, item: Dict):
+        """Enviar las partes pendientes de un mensaje y programar su reintento si corresponde"""
+        while item['next_part'] < len(item['parts']):
+            if not self.processing:
+                # Cola detenida: no enviar nada más
+                return
+            body, media_urls = item['parts'][item['next_part']]
             
-            # Enviar mensaje con archivos multimedia si existen
+            # Enviar mensaje con archivos multimedia si existen; la espera del
+            # rate limiter se corta si la cola se detiene
             result = self.twilio_service.send_whatsapp_message(
                 item['to_number'],
-                item['message'],
-                item.get('media_urls')
+                body,
+                media_urls,
+                condition=self.condition,
+                active=self._is_processing
             )
-            
-            # Ejecutar callback si existe
-            if item['callback']:
-                item['callback'](result)
-            
-            # Si falló y no ha excedido intentos, volver a agregar a la cola
-            if not result['success'] and item['attempts'] < Config.MAX_RETRY_ATTEMPTS:
-                item['attempts'] += 1
-                self.queue.append(item)
+            if not self._handle_part_result(item, result):
+                return
     
-    def stop_processing(self):
-        """Detener procesamiento de la cola"""
-        self.processing = False
+    def _handle_part_result(self, item: Dict, result: Dict) -> bool:
+        """Procesar el resultado de una parte; devuelve True si se debe seguir con la siguiente"""
+        index = item['next_part']
+        
+        if result.get('cancelled'):
+            # La cola se detuvo antes del envío; la reserva del mensaje se
+            # libera al detener el scheduler
+            return False
+        
+        if result.get('throttled'):
+            # El límite de velocidad no cuenta como intento fallido; el bucket
+            # del remitente ya está en pausa
+            self._schedule_retry(item, 0)
+            return False
+        
+        retry = not result['success'] and item['attempts'] < Config.MAX_RETRY_ATTEMPTS
+        
+        # Ejecutar callback con el resultado final de la parte principal: los
+        # fallos que se reintentan en memoria no se informan
+        if index == 0 and item['callback'] and not retry:
+            item['callback'](result)
+        elif result['success']:
+            logger.info(f"Parte {index + 1} de {len(item['parts'])} enviada a {item['to_number']}")
+        
+        if retry:
+            # Reintentar desde esta parte tras un retroceso exponencial
+            item['attempts'] += 1
+            delay = min(
+                Config.QUEUE_RETRY_MAX_SECONDS,
+                Config.QUEUE_RETRY_BASE_SECONDS * (2 ** (item['attempts'] - 1))
+            )
+            logger.info(f"Reintento {item['attempts']} para {item['to_number']} en {delay:.0f}s "
+                        f"({result.get('error')})")
+            self._schedule_retry(item, delay)
+            return False
+        
+        if not result['success']:
+            return False
+        
+        item['next_part'] += 1
+        return True
+    
+    def _is_processing(self) -> bool:
+        return self.processing
+    
+    def stop_processing(self, timeout: float = 5) -> bool:
+        """Detener procesamiento de la cola.
+        
+        Devuelve False si algún hilo sigue enviando al vencer `timeout`
+        (p. ej. esperando la respuesta de Twilio); ver get_in_flight_keys().
+        """
+        with self.condition:
+            self.processing = False
+            self.condition.notify_all()
+        
+        deadline = time.monotonic() + timeout
+        stopped = True
+        for worker in self.workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout=max(0.0, deadline - time.monotonic()))
+                stopped = stopped and not worker.is_alive()
+        self.workers = []
+        return stopped
+    
+    def get_in_flight_keys(self) -> list:
+        """Claves (`key` de add_job) de los envíos que un hilo tiene en curso"""
+        with self.condition:
+            keys = {item['key'] for item in self.in_flight.values() if item['key'] is not None}
+            return list(keys)
     
     def get_queue_size(self) -> int:
-        """Obtener tamaño de la cola"""
-        return len(self.queue)
+        """Obtener tamaño de la cola (incluye reintentos en espera)"""
+        with self.condition:
+            return self._size_locked()
+    
+    def get_free_slots(self) -> int:
+        """Obtener lugares libres en la cola"""
+        with self.condition:
+            return max(0, self.max_size - self._size_locked())
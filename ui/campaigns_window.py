@@ -9,7 +9,7 @@ from PyQt6.QtGui import QColor
 from datetime import datetime
 import logging
 
-from database import CampaignModel, TemplateModel, ContactModel
+from database import CampaignModel, TemplateModel, ContactModel, SegmentModel
 from message_scheduler import MessageScheduler
 from auth import auth_manager
 
@@ -21,9 +21,10 @@ class CampaignsWindow(QWidget):
     def __init__(self, scheduler: MessageScheduler):
         super().__init__()
         self.scheduler = scheduler
-        self.campaign_model = CampaignModel()
-        self.template_model = TemplateModel()
-        self.contact_model = ContactModel()
+        self.campaign_model = CampaignModel(scheduler.db)
+        self.template_model = TemplateModel(scheduler.db)
+        self.contact_model = ContactModel(scheduler.db)
+        self.segment_model = SegmentModel(scheduler.db)
         self.activity_logger = None
         
         self.active_campaigns = {}
@@ -497,21 +498,15 @@ class CampaignsWindow(QWidget):
             
             try:
                 # Actualizar campaña en la base de datos
-                from database import DatabaseManager
-                db = DatabaseManager()
-                
-                query = """
-                    UPDATE campaigns 
-                    SET name = %s, template_id = %s, scheduled_at = %s
-                    WHERE id = %s AND status = 'pending'
-                """
-                
-                success = db.execute_update(
-                    query,
-                    (name, template_id, scheduled_dt.strftime('%Y-%m-%d %H:%M:%S'), campaign['id'])
+                success = self.campaign_model.update_scheduled_campaign(
+                    campaign['id'],
+                    name,
+                    template_id,
+                    scheduled_dt.strftime('%Y-%m-%d %H:%M:%S')
                 )
                 
                 if success:
+                    self.scheduler.refresh_campaign_schedule()
                     QMessageBox.information(
                         self,
                         "Éxito",
@@ -592,11 +587,12 @@ class CampaignsWindow(QWidget):
     
     def schedule_campaign(self):
         """Programar nueva campaña"""
-        dialog = ScheduleCampaignDialog(self.template_model, self)
+        dialog = ScheduleCampaignDialog(self.template_model, self, self.segment_model)
         if dialog.exec():
             name = dialog.get_campaign_name()
             template_id = dialog.get_template_id()
             scheduled_dt = dialog.get_scheduled_datetime()
+            segment_id = dialog.get_segment_id()
             
             try:
                 user = auth_manager.get_current_user()
@@ -606,7 +602,8 @@ class CampaignsWindow(QWidget):
                     template_id,
                     scheduled_dt,
                     user['id'],
-                    callback=self.on_campaign_update
+                    callback=self.on_campaign_update,
+                    segment_id=segment_id
                 )
                 
                 QMessageBox.information(
@@ -904,16 +901,18 @@ class QuickSendDialog(QDialog):
 class ScheduleCampaignDialog(QDialog):
     """Diálogo para programar campaña"""
     
-    def __init__(self, template_model, parent=None):
+    def __init__(self, template_model, parent=None, segment_model=None):
         super().__init__(parent)
         self.template_model = template_model
+        self.segment_model = segment_model
         self.init_ui()
         self.load_templates()
+        self.load_segments()
     
     def init_ui(self):
         """Inicializar interfaz"""
         self.setWindowTitle("Programar Campaña")
-        self.setFixedSize(400, 350)
+        self.setFixedSize(400, 420)
         
         layout = QVBoxLayout()
         
@@ -928,6 +927,19 @@ class ScheduleCampaignDialog(QDialog):
         self.template_combo = QComboBox()
         layout.addWidget(self.template_combo)
         
+        # Audiencia
+        layout.addWidget(QLabel("Audiencia:"))
+        audience_layout = QHBoxLayout()
+        self.segment_combo = QComboBox()
+        self.segment_combo.currentIndexChanged.connect(self.update_audience_info)
+        audience_layout.addWidget(self.segment_combo, 1)
+        
+        new_segment_btn = QPushButton("➕ Segmento")
+        new_segment_btn.clicked.connect(self.create_segment)
+        new_segment_btn.setEnabled(self.segment_model is not None)
+        audience_layout.addWidget(new_segment_btn)
+        layout.addLayout(audience_layout)
+        
         # Fecha y hora
         layout.addWidget(QLabel("Fecha y Hora de Envío:"))
         self.datetime_edit = QDateTimeEdit()
@@ -937,13 +949,10 @@ class ScheduleCampaignDialog(QDialog):
         layout.addWidget(self.datetime_edit)
         
         # Información
-        info_label = QLabel(
-            "ℹ️ La campaña se enviará a todos los contactos disponibles "
-            "en la fecha y hora especificada."
-        )
-        info_label.setWordWrap(True)
-        info_label.setStyleSheet("color: #666; padding: 10px; background-color: #f8f9fa;")
-        layout.addWidget(info_label)
+        self.info_label = QLabel()
+        self.info_label.setWordWrap(True)
+        self.info_label.setStyleSheet("color: #666; padding: 10px; background-color: #f8f9fa;")
+        layout.addWidget(self.info_label)
         
         layout.addStretch()
         
@@ -988,6 +997,50 @@ class ScheduleCampaignDialog(QDialog):
         except Exception as e:
             logger.error(f"Error cargando plantillas: {e}")
     
+    def load_segments(self, select_id: int = None):
+        """Cargar segmentos de audiencia"""
+        self.segment_combo.clear()
+        self.segment_combo.addItem("Todos los contactos", None)
+        
+        if self.segment_model:
+            try:
+                for segment in self.segment_model.get_segments():
+                    self.segment_combo.addItem(segment['name'], segment['id'])
+            except Exception as e:
+                logger.error(f"Error cargando segmentos: {e}")
+        
+        if select_id is not None:
+            index = self.segment_combo.findData(select_id)
+            if index >= 0:
+                self.segment_combo.setCurrentIndex(index)
+        self.update_audience_info()
+    
+    def update_audience_info(self):
+        """Actualizar el texto de información según la audiencia"""
+        if self.segment_combo.currentData() is None:
+            text = ("ℹ️ La campaña se enviará a todos los contactos disponibles "
+                    "en la fecha y hora especificada.")
+        else:
+            text = (f"ℹ️ La campaña se enviará a los contactos del segmento "
+                    f"'{self.segment_combo.currentText()}' en la fecha y hora especificada.")
+        self.info_label.setText(text)
+    
+    def create_segment(self):
+        """Crear un nuevo segmento de audiencia"""
+        dialog = SegmentDialog(self.segment_model, self)
+        if dialog.exec():
+            try:
+                user = auth_manager.get_current_user()
+                segment_id = self.segment_model.create_segment(
+                    dialog.get_segment_name(),
+                    dialog.get_filters(),
+                    user['id'] if user else None
+                )
+                self.load_segments(select_id=segment_id)
+            except Exception as e:
+                logger.error(f"Error creando segmento: {e}")
+                QMessageBox.critical(self, "Error", f"Error creando segmento: {str(e)}")
+    
     def validate_and_accept(self):
         """Validar y aceptar"""
         if not self.name_input.text().strip():
@@ -1015,6 +1068,153 @@ class ScheduleCampaignDialog(QDialog):
     def get_scheduled_datetime(self):
         """Obtener fecha y hora programada"""
         return self.datetime_edit.dateTime().toPyDateTime()
+    
+    def get_segment_id(self):
+        """Obtener ID del segmento (None = todos los contactos)"""
+        return self.segment_combo.currentData()
+
+
+class SegmentDialog(QDialog):
+    """Diálogo para crear un segmento de audiencia"""
+    
+    FIELDS = [
+        ("Nombre", 'name'),
+        ("Empresa", 'company'),
+        ("Email", 'email'),
+        ("Teléfono", 'phone_number'),
+        ("Dato extra", 'extra')
+    ]
+    OPERATORS = [
+        ("es igual a", 'equals'),
+        ("empieza con", 'prefix'),
+        ("contiene", 'contains')
+    ]
+    
+    def __init__(self, segment_model, parent=None):
+        super().__init__(parent)
+        self.segment_model = segment_model
+        self.rows = []
+        self.init_ui()
+        self.add_condition()
+    
+    def init_ui(self):
+        """Inicializar interfaz"""
+        self.setWindowTitle("Nuevo Segmento")
+        self.setMinimumWidth(560)
+        
+        layout = QVBoxLayout()
+        
+        layout.addWidget(QLabel("Nombre del Segmento:"))
+        self.name_input = QLineEdit()
+        self.name_input.setPlaceholderText("Ej: Clientes de Ciudad de Guatemala")
+        layout.addWidget(self.name_input)
+        
+        conditions_group = QGroupBox("Condiciones (se deben cumplir todas)")
+        self.conditions_layout = QVBoxLayout()
+        conditions_group.setLayout(self.conditions_layout)
+        layout.addWidget(conditions_group)
+        
+        add_btn = QPushButton("➕ Agregar condición")
+        add_btn.clicked.connect(self.add_condition)
+        layout.addWidget(add_btn)
+        
+        # Vista previa del número de contactos
+        preview_layout = QHBoxLayout()
+        self.count_label = QLabel("")
+        preview_layout.addWidget(self.count_label, 1)
+        count_btn = QPushButton("Contar contactos")
+        count_btn.clicked.connect(self.count_contacts)
+        preview_layout.addWidget(count_btn)
+        layout.addLayout(preview_layout)
+        
+        buttons_layout = QHBoxLayout()
+        cancel_btn = QPushButton("Cancelar")
+        cancel_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(cancel_btn)
+        
+        save_btn = QPushButton("Guardar")
+        save_btn.clicked.connect(self.validate_and_accept)
+        buttons_layout.addWidget(save_btn)
+        layout.addLayout(buttons_layout)
+        
+        self.setLayout(layout)
+    
+    def add_condition(self):
+        """Agregar una fila de condición"""
+        row_layout = QHBoxLayout()
+        
+        field_combo = QComboBox()
+        for label, field in self.FIELDS:
+            field_combo.addItem(label, field)
+        row_layout.addWidget(field_combo)
+        
+        key_input = QLineEdit()
+        key_input.setPlaceholderText("clave")
+        key_input.setFixedWidth(90)
+        key_input.setVisible(False)
+        row_layout.addWidget(key_input)
+        field_combo.currentIndexChanged.connect(
+            lambda _, combo=field_combo, key=key_input: key.setVisible(combo.currentData() == 'extra')
+        )
+        
+        op_combo = QComboBox()
+        for label, op in self.OPERATORS:
+            op_combo.addItem(label, op)
+        row_layout.addWidget(op_combo)
+        
+        value_input = QLineEdit()
+        value_input.setPlaceholderText("valor")
+        row_layout.addWidget(value_input, 1)
+        
+        self.conditions_layout.addLayout(row_layout)
+        self.rows.append((field_combo, key_input, op_combo, value_input))
+    
+    def get_filters(self):
+        """Obtener las condiciones en el formato de segments.py"""
+        filters = []
+        for field_combo, key_input, op_combo, value_input in self.rows:
+            value = value_input.text().strip()
+            if not value:
+                continue
+            field = field_combo.currentData()
+            if field == 'extra':
+                field = f"extra.{key_input.text().strip()}"
+            filters.append({'field': field, 'op': op_combo.currentData(), 'value': value})
+        return filters
+    
+    def count_contacts(self):
+        """Mostrar cuántos contactos cumplen las condiciones"""
+        try:
+            count = self.segment_model.count_contacts(self.get_filters())
+            self.count_label.setText(f"👥 {count} contactos")
+        except ValueError as e:
+            QMessageBox.warning(self, "Aviso", str(e))
+        except Exception as e:
+            logger.error(f"Error contando contactos del segmento: {e}")
+            QMessageBox.critical(self, "Error", f"Error contando contactos: {str(e)}")
+    
+    def validate_and_accept(self):
+        """Validar y aceptar"""
+        if not self.name_input.text().strip():
+            QMessageBox.warning(self, "Aviso", "El nombre del segmento es requerido")
+            return
+        
+        filters = self.get_filters()
+        if not filters:
+            QMessageBox.warning(self, "Aviso", "Agregue al menos una condición con valor")
+            return
+        
+        try:
+            self.segment_model.compile_filters(filters)
+        except ValueError as e:
+            QMessageBox.warning(self, "Aviso", str(e))
+            return
+        
+        self.accept()
+    
+    def get_segment_name(self):
+        """Obtener nombre del segmento"""
+        return self.name_input.text().strip()
 
 
 class EditScheduledCampaignDialog(QDialog):
@@ -1,17 +1,26 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QTableWidget, QTableWidgetItem, QHeaderView,
+                             QTableWidget, QTableWidgetItem, QTableView, QHeaderView,
                              QMessageBox, QFileDialog, QDialog, QLabel,
                              QLineEdit, QComboBox, QTextEdit, QGroupBox,
-                             QSpinBox, QCheckBox, QProgressDialog)
-from PyQt6.QtCore import Qt, pyqtSignal, QThread, QEvent
+                             QSpinBox, QCheckBox, QProgressDialog, QProgressBar,
+                             QInputDialog)
+from PyQt6.QtCore import (Qt, pyqtSignal, QThread, QEvent, QTimer, QAbstractTableModel,
+                          QModelIndex)
 from PyQt6.QtGui import QColor, QPainter
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
 import json
+import os
+import queue
+import threading
 
-from database import ContactModel
+from database import ContactModel, SegmentModel, next_cursor
 from excel_handler import ExcelHandler
 from auth import auth_manager
+from config import Config
+from segments import segment_assignments, validate_extra_key, EXTRA_FIELD_PREFIX
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,6 +74,239 @@ class CustomHeaderView(QHeaderView):
             return
         super().mouseReleaseEvent(event)
 
+class ContactTableModel(QAbstractTableModel):
+    """Modelo de la tabla de contactos con paginación por cursor (keyset).
+    
+    Las filas se piden al servidor por páginas a medida que la vista se
+    desplaza (canFetchMore/fetchMore). Solo las últimas páginas usadas
+    quedan en memoria; de las demás se guarda el cursor para volver a
+    pedirlas. Las páginas se piden en un hilo aparte para no bloquear la
+    interfaz. La selección se guarda como un conjunto de ids, no como un
+    checkbox por fila.
+    """
+    
+    HEADERS = ["Seleccionar", "Teléfono", "Nombre", "Email", "Empresa", "Fecha Registro"]
+    SORT_COLUMNS = {1: 'phone_number', 2: 'name', 3: 'email', 4: 'company', 5: 'created_at'}
+    FIELDS = (None, 'phone_number', 'name', 'email', 'company', 'created_at')
+    PAGE_SIZE = 200
+    MAX_CACHED_PAGES = 20
+    
+    # Número de contactos seleccionados
+    selection_changed = pyqtSignal(int)
+    # (generación, página, filas o None si falló), emitida desde el hilo de carga
+    _page_loaded = pyqtSignal(int, int, object)
+    
+    def __init__(self, contact_model: ContactModel, parent=None):
+        super().__init__(parent)
+        self.contact_model = contact_model
+        self.sort_column = 5
+        self.descending = True
+        self.search = ''
+        self.selected_ids = set()
+        self._generation = 0
+        self._page_loaded.connect(self._on_page_loaded)
+        self._reset_pages()
+    
+    def _reset_pages(self):
+        self._row_count = 0
+        self._pages = OrderedDict()  # página -> filas (LRU)
+        self._cursors = [None]  # cursor para pedir cada página
+        self._exhausted = False
+        self._loading = set()  # páginas que se están pidiendo
+        # Las páginas pedidas antes de reiniciar se descartan al llegar
+        self._generation += 1
+    
+    def reload(self):
+        """Volver a cargar desde la primera página"""
+        self.beginResetModel()
+        self._reset_pages()
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+    
+    def set_search(self, text: str):
+        """Filtrar los contactos en el servidor"""
+        text = text.strip()
+        if text == self.search:
+            return
+        self.search = text
+        self.reload()
+    
+    # -- Paginación -------------------------------------------------------
+    
+    def _request_page(self, page: int):
+        """Pedir una página en segundo plano; llega por _on_page_loaded"""
+        if page in self._loading:
+            return
+        self._loading.add(page)
+        
+        generation = self._generation
+        kwargs = {
+            'order_by': self.SORT_COLUMNS[self.sort_column],
+            'descending': self.descending,
+            'after': self._cursors[page],
+            'limit': self.PAGE_SIZE,
+            'search': self.search or None
+        }
+        
+        def load():
+            try:
+                rows = self.contact_model.get_contacts_page(**kwargs)
+            except Exception as e:
+                logger.error(f"Error cargando contactos: {e}")
+                rows = None
+            self._page_loaded.emit(generation, page, rows)
+        
+        threading.Thread(target=load, name=f"contacts-page-{page}", daemon=True).start()
+    
+    def _on_page_loaded(self, generation: int, page: int, rows: Optional[List[Dict]]):
+        """Guardar una página recibida (en el hilo de la interfaz)"""
+        if generation != self._generation:
+            return
+        self._loading.discard(page)
+        
+        if page == len(self._cursors) - 1:
+            self._append_page(page, rows)
+            return
+        if rows is None:
+            return
+        
+        # Página descartada de la caché que se volvió a pedir
+        self._store_page(page, rows)
+        first = page * self.PAGE_SIZE
+        last = min(first + len(rows), self._row_count) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(last, len(self.HEADERS) - 1))
+    
+    def _append_page(self, page: int, rows: Optional[List[Dict]]):
+        """Agregar al final de la tabla la página siguiente"""
+        if rows is None or len(rows) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not rows:
+            return
+        
+        self._cursors.append(next_cursor(rows, self.SORT_COLUMNS[self.sort_column]))
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(rows) - 1)
+        self._store_page(page, rows)
+        self._row_count += len(rows)
+        self.endInsertRows()
+    
+    def _store_page(self, page: int, rows: List[Dict]):
+        self._pages[page] = rows
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+    
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        self._request_page(len(self._cursors) - 1)
+    
+    def contact_at(self, row: int) -> Optional[Dict]:
+        """Contacto de una fila.
+        
+        Si su página se descartó de la caché se pide en segundo plano y se
+        devuelve None; la vista se actualiza con dataChanged al llegar.
+        """
+        page, offset = divmod(row, self.PAGE_SIZE)
+        rows = self._pages.get(page)
+        if rows is None:
+            self._request_page(page)
+            return None
+        self._pages.move_to_end(page)
+        return rows[offset] if offset < len(rows) else None
+    
+    # -- QAbstractTableModel ----------------------------------------------
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._row_count
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        column = index.column()
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            if column == 0:
+                return Qt.AlignmentFlag.AlignCenter
+            return Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft
+        
+        contact = self.contact_at(index.row())
+        if contact is None:
+            # Página en camino: se muestra al recibirla
+            if role == Qt.ItemDataRole.DisplayRole and column == 1:
+                return "Cargando..."
+            return None
+        
+        if role == Qt.ItemDataRole.CheckStateRole and column == 0:
+            return (Qt.CheckState.Checked if contact['id'] in self.selected_ids
+                    else Qt.CheckState.Unchecked)
+        if role == Qt.ItemDataRole.UserRole:
+            return contact['id']
+        if role == Qt.ItemDataRole.DisplayRole and column > 0:
+            value = contact.get(self.FIELDS[column])
+            if column == 5:
+                return value.strftime('%Y-%m-%d %H:%M') if value else ''
+            return value or ''
+        return None
+    
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or index.column() != 0 or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        
+        contact = self.contact_at(index.row())
+        if contact is None:
+            return False
+        
+        if Qt.CheckState(value) == Qt.CheckState.Checked:
+            self.selected_ids.add(contact['id'])
+        else:
+            self.selected_ids.discard(contact['id'])
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        self.selection_changed.emit(len(self.selected_ids))
+        return True
+    
+    def flags(self, index: QModelIndex):
+        if index.isValid() and index.column() == 0:
+            return Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+    
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+    
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """Ordenar en el servidor (por columnas con índice)"""
+        if column not in self.SORT_COLUMNS:
+            return
+        descending = order == Qt.SortOrder.DescendingOrder
+        if (column, descending) == (self.sort_column, self.descending):
+            return
+        self.sort_column = column
+        self.descending = descending
+        self.reload()
+    
+    def clear_selection(self, contact_ids=None):
+        """Quitar de la selección los ids indicados (o todos)"""
+        if contact_ids is None:
+            self.selected_ids.clear()
+        else:
+            self.selected_ids.difference_update(contact_ids)
+        if self._row_count:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._row_count - 1, 0),
+                                  [Qt.ItemDataRole.CheckStateRole])
+        self.selection_changed.emit(len(self.selected_ids))
+
+
 class ContactsWindow(QWidget):
     contacts_updated = pyqtSignal()
     
@@ -73,6 +315,11 @@ class ContactsWindow(QWidget):
         self.contact_model = ContactModel()
         self.excel_handler = ExcelHandler()
         self.activity_logger = None
+        self.bulk_worker = None
+        self.bulk_selection = None
+        self.bulk_progress = None
+        self.bulk_on_finished = None
+        self.total_contacts = 0
         self.current_page = 1
         self.page_size = 100
         self.init_ui()
@@ -108,6 +355,15 @@ class ContactsWindow(QWidget):
         export_btn.clicked.connect(self.export_contacts)
         toolbar_layout.addWidget(export_btn)
         
+        # Botones de operaciones masivas
+        tag_btn = QPushButton("🏷️ Etiquetar")
+        tag_btn.clicked.connect(self.tag_contacts)
+        toolbar_layout.addWidget(tag_btn)
+        
+        segment_btn = QPushButton("👥 Agregar a Segmento")
+        segment_btn.clicked.connect(self.add_to_segment)
+        toolbar_layout.addWidget(segment_btn)
+        
         # Botón agregar
         add_btn = QPushButton("➕ Agregar Contacto")
         add_btn.clicked.connect(self.add_contact)
@@ -139,14 +395,20 @@ class ContactsWindow(QWidget):
         self.search_input.textChanged.connect(self.filter_contacts)
         toolbar_layout.addWidget(self.search_input)
         
+        # La búsqueda se lanza cuando el usuario deja de escribir
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(Config.CONTACT_SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        
         layout.addLayout(toolbar_layout)
         
-        # Tabla de contactos
-        self.contacts_table = QTableWidget()
-        self.contacts_table.setColumnCount(6)
-        self.contacts_table.setHorizontalHeaderLabels([
-            "Seleccionar", "Teléfono", "Nombre", "Email", "Empresa", "Fecha Registro"
-        ])
+        # Tabla de contactos (las filas se piden al servidor por páginas)
+        self.table_model = ContactTableModel(self.contact_model, self)
+        self.table_model.selection_changed.connect(lambda _: self.update_info())
+        self.table_model.rowsInserted.connect(lambda *_: self.update_info())
+        self.contacts_table = QTableView()
+        self.contacts_table.setModel(self.table_model)
         
         # Reemplazar el header con uno personalizado
         custom_header = CustomHeaderView(Qt.Orientation.Horizontal, self.contacts_table)
@@ -185,16 +447,16 @@ class ContactsWindow(QWidget):
         
         # Estilos para mejorar la visualización
         self.contacts_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 gridline-color: #ddd;
                 font-size: 13px;
                 selection-background-color: #e3f2fd;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 8px;
                 border: none;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #e3f2fd;
                 color: black;
             }
@@ -210,7 +472,7 @@ class ContactsWindow(QWidget):
             QHeaderView::section:hover {
                 background-color: #e9ecef;
             }
-            QTableWidget QTableCornerButton::section {
+            QTableView QTableCornerButton::section {
                 background-color: #f8f9fa;
                 border: none;
                 border-right: 1px solid #ddd;
@@ -233,13 +495,12 @@ class ContactsWindow(QWidget):
         """)
         
         self.contacts_table.setAlternatingRowColors(True)
-        self.contacts_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.contacts_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         
-        # IMPORTANTE: Deshabilitar el ordenamiento hasta que los datos estén cargados
-        self.contacts_table.setSortingEnabled(False)
-        
-        # Establecer ordenamiento inicial en una columna que no sea la de checkbox
-        self.contacts_table.sortByColumn(1, Qt.SortOrder.AscendingOrder)  # Ordenar por Teléfono inicialmente
+        # El ordenamiento lo hace el servidor: el modelo vuelve a pedir las
+        # filas al cambiar la columna. Inicialmente por fecha descendente.
+        header.setSortIndicator(5, Qt.SortOrder.DescendingOrder)
+        self.contacts_table.setSortingEnabled(True)
         
         layout.addWidget(self.contacts_table)
         
@@ -251,84 +512,26 @@ class ContactsWindow(QWidget):
         self.setLayout(layout)
     
     def load_contacts(self):
-        """Cargar contactos en la tabla"""
+        """Cargar la primera página de contactos en la tabla"""
         try:
-            # Deshabilitar ordenamiento temporalmente
-            self.contacts_table.setSortingEnabled(False)
-            
-            contacts = self.contact_model.get_contacts()
-            self.populate_table(contacts)
+            self.table_model.reload()
+            self.total_contacts = self.contact_model.get_contact_count(self.table_model.search)
             self.update_info()
-            
-            # Habilitar ordenamiento después de cargar datos
-            self.contacts_table.setSortingEnabled(True)
-            
-            # Establecer ordenamiento inicial si no hay uno definido
-            if self.contacts_table.horizontalHeader().sortIndicatorSection() == -1:
-                self.contacts_table.sortByColumn(5, Qt.SortOrder.DescendingOrder)  # Ordenar por fecha descendente
-            
         except Exception as e:
             logger.error(f"Error cargando contactos: {e}")
             QMessageBox.critical(self, "Error", f"Error cargando contactos: {str(e)}")
     
-    def populate_table(self, contacts: List[Dict]):
-        """Poblar tabla con contactos"""
-        # Guardar estado de ordenamiento actual
-        current_sort_column = self.contacts_table.horizontalHeader().sortIndicatorSection()
-        current_sort_order = self.contacts_table.horizontalHeader().sortIndicatorOrder()
-        
-        self.contacts_table.setRowCount(len(contacts))
-        
-        for row, contact in enumerate(contacts):
-            # Checkbox - Usar QTableWidgetItem con CheckState en lugar de QWidget
-            checkbox_item = QTableWidgetItem()
-            checkbox_item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
-            checkbox_item.setCheckState(Qt.CheckState.Unchecked)
-            checkbox_item.setData(Qt.ItemDataRole.UserRole, contact['id'])
-            checkbox_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.contacts_table.setItem(row, 0, checkbox_item)
-            
-            # Datos
-            self.contacts_table.setItem(row, 1, QTableWidgetItem(contact.get('phone_number', '')))
-            self.contacts_table.setItem(row, 2, QTableWidgetItem(contact.get('name', '')))
-            self.contacts_table.setItem(row, 3, QTableWidgetItem(contact.get('email', '')))
-            self.contacts_table.setItem(row, 4, QTableWidgetItem(contact.get('company', '')))
-            
-            # Fecha formateada
-            fecha_item = QTableWidgetItem(
-                contact.get('created_at', '').strftime('%Y-%m-%d %H:%M') 
-                if contact.get('created_at') else ''
-            )
-            self.contacts_table.setItem(row, 5, fecha_item)
-            
-            # Alinear texto al centro verticalmente
-            for col in range(1, 6):
-                item = self.contacts_table.item(row, col)
-                if item:
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft)
-        
-        # Restaurar estado de ordenamiento
-        if current_sort_column >= 0:
-            self.contacts_table.sortItems(current_sort_column, current_sort_order)
-    
     def get_selected_contact_ids(self):
         """Obtener IDs de contactos seleccionados"""
-        selected_ids = []
-        
-        for row in range(self.contacts_table.rowCount()):
-            checkbox_item = self.contacts_table.item(row, 0)
-            if checkbox_item and checkbox_item.checkState() == Qt.CheckState.Checked:
-                selected_ids.append(checkbox_item.data(Qt.ItemDataRole.UserRole))
-        
-        return selected_ids
+        return sorted(self.table_model.selected_ids)
     
     def import_contacts(self):
-        """Importar contactos desde Excel"""
+        """Importar contactos desde Excel o CSV"""
         file_path, _ = QFileDialog.getOpenFileName(
             self,
-            "Seleccionar archivo Excel",
+            "Seleccionar archivo de contactos",
             "",
-            "Excel Files (*.xlsx *.xls)"
+            "Excel o CSV (*.xlsx *.xls *.csv)"
         )
         
         if not file_path:
@@ -341,77 +544,84 @@ class ContactsWindow(QWidget):
                 QMessageBox.critical(self, "Error", validation['error'])
                 return
             
-            # Mostrar diálogo de importación
-            import_dialog = ImportDialog(file_path, self.excel_handler, self)
+            # El diálogo lee, valida y guarda los contactos por bloques
+            import_dialog = ImportDialog(file_path, self.excel_handler, self,
+                                         contact_model=self.contact_model,
+                                         total_rows=validation.get('rows'))
             if import_dialog.exec():
-                contacts = import_dialog.get_contacts()
-                errors = import_dialog.get_errors()
+                result = import_dialog.get_result()
+                saved = result['saved']
+                errors = result['errors']
+                error_count = result['error_count']
                 
-                if contacts:
-                    # Guardar contactos
-                    progress = QProgressDialog("Guardando contactos...", "Cancelar", 0, len(contacts), self)
-                    progress.setWindowModality(Qt.WindowModality.WindowModal)
-                    progress.show()
-                    
-                    user = auth_manager.get_current_user()
-                    saved = self.contact_model.create_contacts(contacts, user['id'])
-                    
-                    progress.close()
-                    
-                    # Mostrar resultado
-                    message = f"Se importaron {saved} contactos exitosamente."
-                    if errors:
-                        message += f"\n\nSe encontraron {len(errors)} errores:\n"
-                        message += "\n".join(errors[:5])
-                        if len(errors) > 5:
-                            message += f"\n... y {len(errors) - 5} errores más"
-                    
-                    QMessageBox.information(self, "Importación Completa", message)
-                    
-                    # Actualizar tabla
-                    self.load_contacts()
-                    self.contacts_updated.emit()
-                    
-                    # Registrar actividad
-                    if self.activity_logger:
-                        self.activity_logger.log_import(file_path, saved, len(errors))
-                else:
-                    QMessageBox.warning(self, "Sin contactos", "No se encontraron contactos para importar.")
+                # Mostrar resultado
+                message = (f"Se importaron {saved} contactos exitosamente "
+                           f"({result['inserted']} nuevos, {result['updated']} actualizados).")
+                if result['cancelled']:
+                    message = f"Importación cancelada. Se importaron {saved} contactos."
+                if result['failed']:
+                    message += f"\n{result['failed']} contactos no se pudieron guardar."
+                if error_count:
+                    message += f"\n\nSe encontraron {error_count} errores:\n"
+                    message += "\n".join(errors[:5])
+                    if error_count > 5:
+                        message += f"\n... y {error_count - 5} errores más"
+                    if result['report_path']:
+                        message += f"\n\nReporte completo: {result['report_path']}"
+                
+                QMessageBox.information(self, "Importación Completa", message)
+                
+                # Actualizar tabla
+                self.load_contacts()
+                self.contacts_updated.emit()
+                
+                # Registrar actividad
+                if self.activity_logger:
+                    self.activity_logger.log_import(file_path, saved, error_count)
                 
         except Exception as e:
             logger.error(f"Error importando contactos: {e}")
             QMessageBox.critical(self, "Error", f"Error importando contactos: {str(e)}")
     
     def export_contacts(self):
-        """Exportar contactos a Excel"""
+        """Exportar contactos (marcados, resultados de la búsqueda o todos)"""
+        selection, count = self.get_bulk_selection()
+        if not count:
+            QMessageBox.warning(self, "Aviso", "No hay contactos para exportar")
+            return
+        if not self.confirm_bulk_scope("Exportar", selection, count):
+            return
+        
         file_path, _ = QFileDialog.getSaveFileName(
             self,
-            "Guardar archivo Excel",
+            "Guardar archivo de contactos",
             "contactos.xlsx",
-            "Excel Files (*.xlsx)"
+            "Excel Files (*.xlsx);;CSV (*.csv)"
         )
         
         if not file_path:
             return
         
-        try:
-            contacts = self.contact_model.get_contacts()
-            if self.excel_handler.export_contacts_to_excel(contacts, file_path):
-                QMessageBox.information(
-                    self,
-                    "Exportación Exitosa",
-                    f"Se exportaron {len(contacts)} contactos a:\n{file_path}"
-                )
-                
-                if self.activity_logger:
-                    self.activity_logger.log('EXPORT_CONTACTS', 
-                                           f"Exportados {len(contacts)} contactos")
-            else:
-                QMessageBox.critical(self, "Error", "Error exportando contactos")
-                
-        except Exception as e:
-            logger.error(f"Error exportando contactos: {e}")
-            QMessageBox.critical(self, "Error", f"Error exportando contactos: {str(e)}")
+        self.run_bulk_operation("Exportando contactos", selection, count,
+                                self.contacts_exported, operation='export',
+                                excel_handler=self.excel_handler, output_path=file_path)
+    
+    def contacts_exported(self, result: Dict):
+        """Resultado de la exportación"""
+        if result['error']:
+            QMessageBox.critical(self, "Error", f"Error exportando contactos: {result['error']}")
+        elif result['cancelled']:
+            QMessageBox.information(self, "Exportación Cancelada", "No se generó el archivo.")
+        else:
+            QMessageBox.information(
+                self,
+                "Exportación Exitosa",
+                f"Se exportaron {result['affected']} contactos a:\n{result['output_path']}"
+            )
+            
+            if self.activity_logger:
+                self.activity_logger.log('EXPORT_CONTACTS', 
+                                       f"Exportados {result['affected']} contactos")
     
     def add_contact(self):
         """Agregar nuevo contacto"""
@@ -437,85 +647,519 @@ class ContactsWindow(QWidget):
                 QMessageBox.critical(self, "Error", f"Error agregando contacto: {str(e)}")
     
     def delete_selected(self):
-        """Eliminar contactos seleccionados"""
-        selected_ids = self.get_selected_contact_ids()
+        """Eliminar contactos seleccionados (o todos los resultados de la búsqueda)"""
+        selection, count = self.get_bulk_selection()
         
-        if not selected_ids:
+        if not selection or not count:
             QMessageBox.warning(self, "Aviso", "No hay contactos seleccionados")
             return
         
         reply = QMessageBox.question(
             self,
             "Confirmar Eliminación",
-            f"¿Está seguro de eliminar {len(selected_ids)} contacto(s)?",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            f"¿Está seguro de eliminar {self.describe_bulk_scope(selection, count)}?\n"
+            "También se eliminarán sus mensajes.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            try:
-                for contact_id in selected_ids:
-                    self.contact_model.delete_contact(contact_id)
-                
-                QMessageBox.information(
-                    self,
-                    "Éxito",
-                    f"Se eliminaron {len(selected_ids)} contacto(s)"
-                )
-                
-                self.load_contacts()
-                self.contacts_updated.emit()
-                
-                if self.activity_logger:
-                    self.activity_logger.log('DELETE_CONTACTS', 
-                                           f"Eliminados {len(selected_ids)} contactos")
-                
-            except Exception as e:
-                logger.error(f"Error eliminando contactos: {e}")
-                QMessageBox.critical(self, "Error", f"Error eliminando contactos: {str(e)}")
+            self.run_bulk_operation("Eliminando contactos", selection, count,
+                                    self.contacts_deleted, operation='delete')
+    
+    def contacts_deleted(self, result: Dict):
+        """Resultado de la eliminación"""
+        deleted = result['affected']
+        if result['error']:
+            QMessageBox.critical(self, "Error", f"Error eliminando contactos: {result['error']}")
+        else:
+            message = f"Se eliminaron {deleted} contacto(s)"
+            if result['cancelled']:
+                message = f"Eliminación cancelada. Se eliminaron {deleted} contacto(s)"
+            QMessageBox.information(self, "Éxito", message)
+        
+        # Los bloques se procesan en orden de id: quitar de la selección los ya procesados
+        contact_ids = self.bulk_selection.get('contact_ids')
+        if contact_ids is not None:
+            self.table_model.clear_selection(contact_ids[:result['processed']])
+        self.load_contacts()
+        self.contacts_updated.emit()
+        
+        if self.activity_logger and deleted:
+            self.activity_logger.log('DELETE_CONTACTS', 
+                                   f"Eliminados {deleted} contactos")
+    
+    def tag_contacts(self):
+        """Etiquetar contactos con un dato adicional (extra_data)"""
+        selection, count = self.get_bulk_selection()
+        if not count:
+            QMessageBox.warning(self, "Aviso", "No hay contactos para etiquetar")
+            return
+        if not self.confirm_bulk_scope("Etiquetar", selection, count):
+            return
+        
+        key, ok = QInputDialog.getText(self, "Etiquetar Contactos",
+                                       f"Campo de la etiqueta ({count} contactos):")
+        if not ok or not key.strip():
+            return
+        try:
+            key = validate_extra_key(key.strip())
+        except ValueError as e:
+            QMessageBox.warning(self, "Aviso", str(e))
+            return
+        
+        value, ok = QInputDialog.getText(self, "Etiquetar Contactos",
+                                         f"Valor de '{key}' (vacío para quitar la etiqueta):")
+        if not ok:
+            return
+        
+        self.run_bulk_operation("Etiquetando contactos", selection, count,
+                                self.contacts_tagged, operation='update',
+                                fields={f"{EXTRA_FIELD_PREFIX}{key}": value.strip() or None})
+    
+    def contacts_tagged(self, result: Dict):
+        """Resultado del etiquetado o de la asignación a un segmento"""
+        if result['error']:
+            QMessageBox.critical(self, "Error", f"Error actualizando contactos: {result['error']}")
+            return
+        
+        message = f"Se actualizaron {result['affected']} contacto(s)"
+        if result['cancelled']:
+            message = f"Operación cancelada. {message}"
+        QMessageBox.information(self, "Éxito", message)
+        
+        self.load_contacts()
+        self.contacts_updated.emit()
+        
+        if self.activity_logger:
+            fields = ', '.join(f"{field}={value}" for field, value in result['fields'].items())
+            self.activity_logger.log('UPDATE_CONTACTS', 
+                                   f"Actualizados {result['affected']} contactos: {fields}")
+    
+    def add_to_segment(self):
+        """Agregar contactos a un segmento asignándoles los valores que filtra"""
+        selection, count = self.get_bulk_selection()
+        if not count:
+            QMessageBox.warning(self, "Aviso", "No hay contactos para agregar")
+            return
+        
+        try:
+            segments = SegmentModel(self.contact_model.db).get_segments()
+        except Exception as e:
+            logger.error(f"Error cargando segmentos: {e}")
+            QMessageBox.critical(self, "Error", f"Error cargando segmentos: {str(e)}")
+            return
+        if not segments:
+            QMessageBox.warning(self, "Aviso", "No hay segmentos creados")
+            return
+        
+        names = [segment['name'] for segment in segments]
+        name, ok = QInputDialog.getItem(self, "Agregar a Segmento",
+                                        f"Segmento ({count} contactos):", names, 0, False)
+        if not ok:
+            return
+        segment = segments[names.index(name)]
+        
+        try:
+            fields = segment_assignments(segment['filters'])
+        except ValueError as e:
+            QMessageBox.warning(self, "Aviso", str(e))
+            return
+        if not fields:
+            QMessageBox.information(self, "Segmento",
+                                    f"El segmento '{name}' ya incluye a todos los contactos.")
+            return
+        
+        changes = "\n".join(f"  {field} = {value}" for field, value in fields.items())
+        reply = QMessageBox.question(
+            self,
+            "Agregar a Segmento",
+            f"Se asignará a {self.describe_bulk_scope(selection, count)}:\n{changes}",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.run_bulk_operation("Agregando contactos al segmento", selection, count,
+                                    self.contacts_tagged, operation='update', fields=fields)
+    
+    def get_bulk_selection(self) -> Tuple[Dict, int]:
+        """Contactos de una operación masiva y su cantidad.
+        
+        Son los marcados; si no hay ninguno, los resultados de la búsqueda o
+        todos los contactos ({}), que se confirman con confirm_bulk_scope.
+        """
+        if self.table_model.selected_ids:
+            contact_ids = sorted(self.table_model.selected_ids)
+            return {'contact_ids': contact_ids}, len(contact_ids)
+        if self.table_model.search:
+            return {'search': self.table_model.search}, self.total_contacts
+        return {}, self.total_contacts
+    
+    def describe_bulk_scope(self, selection: Dict, count: int) -> str:
+        """Texto con el alcance de una operación masiva para las confirmaciones"""
+        if 'contact_ids' in selection:
+            return f"los {count} contacto(s) marcados"
+        if 'search' in selection:
+            return f"los {count} resultados de la búsqueda '{selection['search']}'"
+        return f"TODOS los contactos ({count})"
+    
+    def confirm_bulk_scope(self, action: str, selection: Dict, count: int) -> bool:
+        """Confirmar una operación masiva sin contactos marcados.
+        
+        Sin marcas la operación alcanza a la búsqueda o a todos los contactos,
+        así que se pide confirmación nombrando el alcance.
+        """
+        if 'contact_ids' in selection:
+            return True
+        reply = QMessageBox.question(
+            self,
+            "Confirmar Alcance",
+            f"No hay contactos marcados.\n"
+            f"¿{action} {self.describe_bulk_scope(selection, count)}?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        return reply == QMessageBox.StandardButton.Yes
+    
+    def run_bulk_operation(self, title: str, selection: Dict, count: int, on_finished, **kwargs):
+        """Ejecutar una operación masiva en segundo plano con diálogo de progreso"""
+        if self.bulk_worker is not None:
+            QMessageBox.warning(self, "Aviso", "Ya hay una operación en curso")
+            return
+        
+        self.bulk_selection = selection
+        self.bulk_progress = QProgressDialog(f"{title}...", "Cancelar", 0, count, self)
+        self.bulk_progress.setWindowTitle(title)
+        self.bulk_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.bulk_progress.setMinimumDuration(300)
+        self.bulk_progress.setAutoReset(False)
+        
+        self.bulk_worker = ContactBulkWorker(self.contact_model, selection=selection,
+                                             parent=self, **kwargs)
+        self.bulk_progress.canceled.connect(self.bulk_worker.cancel)
+        self.bulk_worker.progress.connect(self.update_bulk_progress)
+        self.bulk_worker.operation_finished.connect(self.bulk_operation_finished)
+        self.bulk_on_finished = on_finished
+        self.bulk_worker.start()
+    
+    def update_bulk_progress(self, processed: int, total: int):
+        """Actualizar el diálogo de progreso de la operación masiva"""
+        if self.bulk_progress is not None:
+            self.bulk_progress.setMaximum(max(total, 1))
+            self.bulk_progress.setValue(min(processed, max(total, 1)))
+    
+    def bulk_operation_finished(self, result: Dict):
+        """Cerrar el progreso y mostrar el resultado de la operación masiva"""
+        self.bulk_worker.wait()
+        self.bulk_worker = None
+        if self.bulk_progress is not None:
+            self.bulk_progress.close()
+            self.bulk_progress = None
+        self.bulk_on_finished(result)
     
     def filter_contacts(self, text: str):
-        """Filtrar contactos en la tabla"""
-        for row in range(self.contacts_table.rowCount()):
-            match = False
-            for col in range(1, self.contacts_table.columnCount()):
-                item = self.contacts_table.item(row, col)
-                if item and text.lower() in item.text().lower():
-                    match = True
-                    break
-            
-            self.contacts_table.setRowHidden(row, not match)
+        """Reiniciar la espera de la búsqueda con cada tecla"""
+        self.search_timer.start()
+    
+    def apply_search(self):
+        """Buscar en el servidor con los índices de contactos"""
+        text = self.search_input.text().strip()
+        if text == self.table_model.search:
+            return
+        try:
+            self.table_model.set_search(text)
+            self.total_contacts = self.contact_model.get_contact_count(text)
+            self.update_info()
+        except Exception as e:
+            logger.error(f"Error buscando contactos: {e}")
     
     def update_info(self):
         """Actualizar información de contactos"""
-        total = self.contact_model.get_contact_count()
-        visible = sum(1 for row in range(self.contacts_table.rowCount()) 
-                     if not self.contacts_table.isRowHidden(row))
+        loaded = self.table_model.rowCount()
+        selected = len(self.table_model.selected_ids)
         
-        self.info_label.setText(f"Total contactos: {total} | Mostrando: {visible}")
+        label = "Resultados" if self.table_model.search else "Total contactos"
+        self.info_label.setText(
+            f"{label}: {self.total_contacts} | Cargados: {loaded} | "
+            f"Seleccionados: {selected}"
+        )
     
     def set_activity_logger(self, logger):
         """Configurar logger de actividades"""
         self.activity_logger = logger
 
 
+class ContactBulkWorker(QThread):
+    """Operación masiva sobre contactos en segundo plano.
+    
+    Recorre la selección (ids, búsqueda o todos los contactos) en bloques
+    de CONTACT_BULK_CHUNK_SIZE ids; cada bloque se procesa en su propia
+    transacción. Al cancelar se detiene después del bloque en curso y los
+    bloques ya procesados quedan aplicados (una exportación cancelada no
+    deja archivo).
+    """
+    
+    # Contactos procesados, total de la selección
+    progress = pyqtSignal(int, int)
+    operation_finished = pyqtSignal(dict)
+    
+    OPERATIONS = ('delete', 'update', 'export')
+    
+    def __init__(self, contact_model: ContactModel, operation: str, selection: Dict = None,
+                 fields: Dict = None, excel_handler: ExcelHandler = None,
+                 output_path: str = None, parent=None):
+        super().__init__(parent)
+        if operation not in self.OPERATIONS:
+            raise ValueError(f"Operación no soportada: '{operation}'")
+        self.contact_model = contact_model
+        self.operation = operation
+        self.selection = selection or {}
+        self.fields = fields or {}
+        self.excel_handler = excel_handler
+        self.output_path = output_path
+        self.cancelled = False
+        
+        self.total = 0
+        self.processed = 0
+        self.affected = 0
+    
+    def cancel(self):
+        """Pedir la cancelación (se detiene al terminar el bloque en curso)"""
+        self.cancelled = True
+    
+    def run(self):
+        error = None
+        try:
+            self.total = self.contact_model.count_selection(**self.selection)
+            self.progress.emit(0, self.total)
+            chunks = self.contact_model.iter_id_chunks(**self.selection)
+            
+            if self.operation == 'export':
+                self.affected = self.excel_handler.export_contact_chunks(
+                    self._export_chunks(chunks), self.output_path
+                )
+                if self.cancelled and os.path.exists(self.output_path):
+                    os.remove(self.output_path)
+            else:
+                for chunk in chunks:
+                    if self.cancelled:
+                        break
+                    if self.operation == 'delete':
+                        self.affected += self.contact_model.delete_contacts(chunk)
+                    else:
+                        self.affected += self.contact_model.update_fields(chunk, self.fields)
+                    self._advance(len(chunk))
+        except Exception as e:
+            logger.error(f"Error en operación masiva '{self.operation}': {e}")
+            error = str(e)
+        
+        self.operation_finished.emit({
+            'operation': self.operation,
+            'total': self.total,
+            'processed': self.processed,
+            'affected': self.affected,
+            'fields': self.fields,
+            'output_path': self.output_path,
+            'cancelled': self.cancelled,
+            'error': error
+        })
+    
+    def _export_chunks(self, chunks):
+        """Contactos de cada bloque de ids para la exportación"""
+        for chunk in chunks:
+            if self.cancelled:
+                return
+            yield self.contact_model.get_contacts_by_ids(chunk)
+            self._advance(len(chunk))
+    
+    def _advance(self, count: int):
+        self.processed += count
+        self.progress.emit(self.processed, self.total)
+
+
+class ContactImportWorker(QThread):
+    """Importación de contactos en segundo plano.
+    
+    Un hilo lector recorre el archivo y valida los bloques mientras este
+    hilo guarda el bloque anterior, así la lectura se solapa con las
+    escrituras en MySQL. Cada bloque se guarda en su propia transacción: si
+    uno falla, se registra en el reporte de errores y se sigue con el
+    siguiente. Todos los errores se escriben en un archivo de reporte.
+    """
+    
+    # Filas procesadas, total de filas (0 si no se conoce), contactos guardados
+    progress = pyqtSignal(int, int, int)
+    import_finished = pyqtSignal(dict)
+    
+    MAX_REPORTED_ERRORS = 1000
+    READ_AHEAD_CHUNKS = 2
+    
+    def __init__(self, excel_handler: ExcelHandler, contact_model: ContactModel,
+                 file_path: str, phone_column: int, column_mapping: Dict[str, int],
+                 user_id: int, total_rows: int = None, parent=None):
+        super().__init__(parent)
+        self.excel_handler = excel_handler
+        self.contact_model = contact_model
+        self.file_path = file_path
+        self.phone_column = phone_column
+        self.column_mapping = column_mapping
+        self.user_id = user_id
+        self.total_rows = total_rows or 0
+        self.cancelled = False
+        self._stop = threading.Event()
+        
+        self.saved = 0
+        self.inserted = 0
+        self.updated = 0
+        self.valid = 0
+        self.failed = 0
+        self.errors = []
+        self.error_count = 0
+        self.report_path = None
+        self._report = None
+    
+    def cancel(self):
+        """Pedir la cancelación (se detiene al terminar el bloque en curso)"""
+        self.cancelled = True
+        self._stop.set()
+    
+    def _read_chunks(self, chunks: queue.Queue):
+        """Hilo lector: validar bloques y dejarlos en la cola"""
+        try:
+            for item in self.excel_handler.iter_contacts(
+                self.file_path, self.phone_column, self.column_mapping
+            ):
+                if not self._offer(chunks, ('chunk', item)):
+                    return
+            self._offer(chunks, ('done', None))
+        except Exception as e:
+            logger.error(f"Error leyendo {self.file_path}: {e}")
+            self._offer(chunks, ('error', e))
+    
+    def _offer(self, chunks: queue.Queue, item) -> bool:
+        """Dejar un elemento en la cola; False si la importación se detuvo"""
+        while not self._stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def run(self):
+        chunks = queue.Queue(maxsize=self.READ_AHEAD_CHUNKS)
+        reader = threading.Thread(target=self._read_chunks, args=(chunks,),
+                                  name="import-reader", daemon=True)
+        reader.start()
+        rows = 0
+        
+        try:
+            while not self._stop.is_set():
+                try:
+                    kind, item = chunks.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind == 'done':
+                    break
+                if kind == 'error':
+                    self.add_errors([f"Importación interrumpida: {item}"])
+                    break
+                
+                contacts, errors, rows_read = item
+                self.add_errors(errors)
+                if contacts:
+                    try:
+                        saved = self.contact_model.upsert_contacts(contacts, self.user_id)
+                        self.inserted += saved['inserted']
+                        self.updated += saved['updated']
+                        self.saved = self.inserted + self.updated
+                        self.valid += len(contacts)
+                    except Exception as e:
+                        logger.error(f"Error guardando bloque de contactos: {e}")
+                        self.failed += len(contacts)
+                        self.add_errors([
+                            f"Filas {rows + 1}-{rows + rows_read}: "
+                            f"error guardando {len(contacts)} contactos - {str(e)}"
+                        ])
+                
+                rows += rows_read
+                self.progress.emit(rows, self.total_rows, self.saved)
+        finally:
+            # Detener al lector si todavía está leyendo
+            self._stop.set()
+            reader.join(timeout=5)
+            if self._report:
+                self._report.close()
+        
+        if self.cancelled:
+            logger.info(f"Importación cancelada tras {rows} filas")
+        
+        self.import_finished.emit(self.get_result(rows))
+    
+    def add_errors(self, errors: List[str]):
+        """Registrar errores: los primeros en memoria, todos en el reporte"""
+        if not errors:
+            return
+        self.error_count += len(errors)
+        free = self.MAX_REPORTED_ERRORS - len(self.errors)
+        if free > 0:
+            self.errors.extend(errors[:free])
+        
+        try:
+            if self._report is None:
+                Config.init_folders()
+                self.report_path = os.path.join(
+                    Config.LOG_FOLDER,
+                    f"import_errors_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                )
+                self._report = open(self.report_path, 'w', encoding='utf-8')
+                self._report.write(f"Archivo: {self.file_path}\n")
+            self._report.write("\n".join(errors) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudo escribir el reporte de errores: {e}")
+    
+    def get_result(self, rows: int = 0) -> Dict:
+        """Resultado de la importación"""
+        return {
+            'rows': rows,
+            'saved': self.saved,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'valid': self.valid,
+            'failed': self.failed,
+            'errors': self.errors,
+            'error_count': self.error_count,
+            'report_path': self.report_path,
+            'cancelled': self.cancelled
+        }
+
+
 class ImportDialog(QDialog):
-    """Diálogo para importar contactos desde Excel"""
+    """Diálogo para importar contactos desde Excel o CSV.
     
-    def __init__(self, file_path: str, excel_handler: ExcelHandler, parent=None):
+    La vista previa usa solo las primeras filas; la importación la hace un
+    ContactImportWorker por bloques, sin cargar el archivo completo ni
+    bloquear la interfaz.
+    """
+    
+    def __init__(self, file_path: str, excel_handler: ExcelHandler, parent=None,
+                 contact_model: ContactModel = None, total_rows: int = None):
         super().__init__(parent)
         self.file_path = file_path
         self.excel_handler = excel_handler
+        self.contact_model = contact_model or ContactModel()
+        self.total_rows = total_rows
         self.df = None
         self.columns = []
-        self.contacts = []
-        self.errors = []
+        self.worker = None
+        self.result = None
         
         self.init_ui()
         self.load_file()
     
     def init_ui(self):
         """Inicializar interfaz"""
-        self.setWindowTitle("Importar Contactos desde Excel")
+        self.setWindowTitle("Importar Contactos")
         self.setMinimumSize(800, 600)
         
         layout = QVBoxLayout()
@@ -572,12 +1216,17 @@ class ImportDialog(QDialog):
         self.import_info.setMaximumHeight(100)
         layout.addWidget(self.import_info)
         
+        # Progreso de la importación
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
         # Botones
         buttons_layout = QHBoxLayout()
         
-        cancel_btn = QPushButton("Cancelar")
-        cancel_btn.clicked.connect(self.reject)
-        buttons_layout.addWidget(cancel_btn)
+        self.cancel_btn = QPushButton("Cancelar")
+        self.cancel_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.cancel_btn)
         
         self.import_btn = QPushButton("Importar Contactos")
         self.import_btn.setEnabled(False)
@@ -605,9 +1254,11 @@ class ImportDialog(QDialog):
         self.setLayout(layout)
     
     def load_file(self):
-        """Cargar archivo Excel"""
+        """Cargar las primeras filas del archivo"""
         try:
-            self.df, self.columns = self.excel_handler.read_excel_file(self.file_path)
+            self.df, self.columns = self.excel_handler.read_preview(self.file_path)
+            if self.total_rows is None:
+                self.total_rows = self.excel_handler.count_rows(self.file_path)
             
             # Llenar combo de teléfono
             self.phone_combo.clear()
@@ -634,7 +1285,7 @@ class ImportDialog(QDialog):
             # Actualizar información
             self.file_label.setText(
                 f"Archivo: {self.file_path} - "
-                f"{len(self.df)} filas, {len(self.columns)} columnas"
+                f"{self.describe_rows()}, {len(self.columns)} columnas"
             )
             
             self.preview_data()
@@ -700,7 +1351,7 @@ class ImportDialog(QDialog):
     
     def update_import_info(self):
         """Actualizar información de importación"""
-        info = f"Total de filas: {len(self.df)}\n"
+        info = f"Total de filas: {self.describe_rows()}\n"
         info += f"Columna de teléfono: {self.columns[self.phone_combo.currentIndex()]}\n"
         
         mapped_fields = []
@@ -714,8 +1365,14 @@ class ImportDialog(QDialog):
         
         self.import_info.setText(info)
     
+    def describe_rows(self) -> str:
+        """Texto con el número de filas del archivo"""
+        if self.total_rows:
+            return f"{self.total_rows:,} filas"
+        return f"{len(self.df)}+ filas"
+    
     def process_import(self):
-        """Procesar importación"""
+        """Iniciar la importación en segundo plano"""
         try:
             # Obtener configuración
             phone_col = self.phone_combo.currentIndex()
@@ -726,38 +1383,74 @@ class ImportDialog(QDialog):
                 if combo.currentIndex() > 0:
                     column_mapping[field] = combo.currentIndex() - 1  # Restar 1 por "-- No asignar --"
             
-            # Extraer contactos
-            self.contacts, self.errors = self.excel_handler.extract_contacts(
-                self.df, phone_col, column_mapping
+            user = auth_manager.get_current_user()
+            self.worker = ContactImportWorker(
+                self.excel_handler, self.contact_model, self.file_path,
+                phone_col, column_mapping, user['id'], self.total_rows, self
             )
-            
-            if self.contacts:
-                QMessageBox.information(
-                    self,
-                    "Vista Previa de Importación",
-                    f"Se encontraron {len(self.contacts)} contactos válidos.\n"
-                    f"Errores: {len(self.errors)}\n\n"
-                    "Presione OK para continuar con la importación."
-                )
-                self.accept()
-            else:
-                QMessageBox.warning(
-                    self,
-                    "Sin Contactos Válidos",
-                    "No se encontraron contactos válidos para importar.\n\n"
-                    "Verifique que la columna de teléfono sea correcta."
-                )
+            self.worker.progress.connect(self.update_progress)
+            self.worker.import_finished.connect(self.import_finished)
+            self.set_importing(True)
+            self.worker.start()
                 
         except Exception as e:
+            self.set_importing(False)
             QMessageBox.critical(self, "Error", f"Error procesando datos: {str(e)}")
     
-    def get_contacts(self):
-        """Obtener contactos procesados"""
-        return self.contacts
+    def import_finished(self, result: Dict):
+        """Recibir el resultado del worker"""
+        self.result = result
+        self.worker = None
+        self.set_importing(False)
+        
+        if result['valid'] or result['failed'] or result['cancelled']:
+            self.accept()
+        else:
+            QMessageBox.warning(
+                self,
+                "Sin Contactos Válidos",
+                "No se encontraron contactos válidos para importar.\n\n"
+                "Verifique que la columna de teléfono sea correcta."
+            )
+    
+    def set_importing(self, importing: bool):
+        """Bloquear la configuración mientras se importa"""
+        self.import_btn.setEnabled(not importing)
+        self.phone_combo.setEnabled(not importing)
+        for combo in self.column_mappings.values():
+            combo.setEnabled(not importing)
+        self.progress_bar.setVisible(importing)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText("Detener importación" if importing else "Cancelar")
+    
+    def update_progress(self, rows: int, total: int, saved: int):
+        """Actualizar la barra de progreso"""
+        if total:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(min(rows, total))
+        else:
+            self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat(f"{rows:,} filas procesadas - {saved:,} contactos guardados")
+    
+    def reject(self):
+        """Cancelar la importación en curso o cerrar el diálogo"""
+        if self.worker is not None:
+            # El diálogo se cierra cuando el worker termine el bloque en curso
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            return
+        super().reject()
+    
+    def get_result(self) -> Dict:
+        """Obtener el resultado de la importación"""
+        return self.result or {
+            'rows': 0, 'saved': 0, 'inserted': 0, 'updated': 0, 'valid': 0, 'failed': 0, 'errors': [],
+            'error_count': 0, 'report_path': None, 'cancelled': False
+        }
     
     def get_errors(self):
         """Obtener errores de importación"""
-        return self.errors
+        return self.get_result()['errors']
 
 
 class ContactDialog(QDialog):
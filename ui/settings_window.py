@@ -208,11 +208,21 @@ class SettingsWindow(QDialog):
         mps_layout.addWidget(QLabel("Mensajes por segundo:"))
         self.messages_per_second_input = QSpinBox()
         self.messages_per_second_input.setMinimum(1)
-        self.messages_per_second_input.setMaximum(10)
+        self.messages_per_second_input.setMaximum(100)
         self.messages_per_second_input.setValue(1)
         mps_layout.addWidget(self.messages_per_second_input)
         limits_layout.addLayout(mps_layout)
         
+        # Envíos simultáneos
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Envíos simultáneos:"))
+        self.dispatch_workers_input = QSpinBox()
+        self.dispatch_workers_input.setMinimum(1)
+        self.dispatch_workers_input.setMaximum(64)
+        self.dispatch_workers_input.setValue(4)
+        workers_layout.addWidget(self.dispatch_workers_input)
+        limits_layout.addLayout(workers_layout)
+        
         # Reintentos
         retry_layout = QHBoxLayout()
         retry_layout.addWidget(QLabel("Máximo de reintentos:"))
@@ -284,6 +294,7 @@ class SettingsWindow(QDialog):
         
         # Aplicación
         self.messages_per_second_input.setValue(Config.MESSAGES_PER_SECOND)
+        self.dispatch_workers_input.setValue(Config.DISPATCH_WORKERS)
         self.max_retries_input.setValue(Config.MAX_RETRY_ATTEMPTS)
         self.retry_delay_input.setValue(Config.RETRY_DELAY_MINUTES)
         self.country_code_input.setText(Config.DEFAULT_COUNTRY_CODE)
@@ -304,6 +315,10 @@ DB_PORT={self.db_port_input.value()}
 DB_USER={self.db_user_input.text()}
 DB_PASSWORD={self.db_password_input.text()}
 DB_NAME={self.db_name_input.text()}
+
+# Configuración de envíos
+MESSAGES_PER_SECOND={self.messages_per_second_input.value()}
+DISPATCH_WORKERS={self.dispatch_workers_input.value()}
 """
             
             env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')